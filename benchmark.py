@@ -0,0 +1,92 @@
+"""
+Headless stress benchmark for AI Hand Builder
+Generates a procedural city of a chosen size (no camera, window or OpenGL needed) and times
+the scene store, scene files and spatial indexes on it
+
+    python benchmark.py --objects 1000000 --seed 7
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+import config
+import scene_io
+from scene_store import SceneStore, ZONES
+from city_generator import generate_city, blocks_for, asset_counts
+from occupancy import OccupancyGrid
+from broad_phase import BroadPhase
+from picking import BVH
+from snapping import MagneticSnap
+
+
+GRID_SIZE = 2.0
+QUERIES = 1000
+
+
+def timed(label, function, *args):
+    """Run function(*args), print how long it took and return its result"""
+    started = time.perf_counter()
+    result = function(*args)
+    print(f"⏱️ {label:<28} {(time.perf_counter() - started) * 1000:10.1f} ms")
+    return result
+
+
+def run(blocks, seed, density, cars, people, skip_occupancy=False):
+    """Generate one city and time every stage on it"""
+    zone = ZONES[0]
+    city = timed("generate city", generate_city, config.ZONES[zone]['position'], blocks, seed, zone,
+                 density, cars, people, GRID_SIZE)
+    count = len(city['positions'])
+    print(f"🏙️ {blocks} x {blocks} blocks, {count} objects: "
+          + ", ".join(f"{name} {n}" for name, n in asset_counts(city).items()))
+
+    scene = SceneStore()
+    ids = timed("store add_many", lambda: scene.add_many(**city))
+    print(f"💾 Store: {scene.nbytes() / 1e6:.1f} MB")
+    timed("zone stats", scene.zone_stats, zone)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.ahbs')
+        timed("save scene", scene_io.save_scene, path, scene)
+        print(f"💾 Scene file: {os.path.getsize(path) / 1e6:.1f} MB")
+        loaded = SceneStore()
+        timed("load scene", scene_io.load_scene, path, loaded)
+
+    positions = scene.positions[ids]
+    centers, half = scene.boxes(ids)
+    broad_phase, bvh, magnet = BroadPhase(), BVH(), MagneticSnap()
+    timed("broad phase build", broad_phase.build, ids, centers, half)
+    timed("BVH build", bvh.build, ids, centers - half, centers + half)
+    timed("magnetic snap build", magnet.build, ids, centers, half)
+    if not skip_occupancy:
+        occupancy = OccupancyGrid(GRID_SIZE)
+        snapped = scene.snapped[ids]
+        timed("occupancy build", occupancy.build, ids[snapped], centers[snapped], half[snapped] * 2)
+
+    # Queries at random object positions, as the app issues them per placement or click
+    rng = np.random.default_rng(seed)
+    probes = positions[rng.integers(0, count, QUERIES)].tolist()
+    timed(f"{QUERIES} overlap queries", lambda: [broad_phase.query(p, (0.5, 0.5, 0.5)) for p in probes])
+    timed(f"{QUERIES} ray picks", lambda: [bvh.raycast((p[0], p[1] + 50, p[2]), (0, -1, 0)) for p in probes])
+    timed(f"{QUERIES} snap lookups", lambda: [magnet.nearest(p, config.MAGNET_SNAP_RADIUS) for p in probes])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time AI Hand Builder's scene pipeline on a generated city")
+    parser.add_argument('--objects', type=int, default=100000, help="approximate object count")
+    parser.add_argument('--blocks', type=int, help="blocks per side (overrides --objects)")
+    parser.add_argument('--seed', type=int, default=config.CITY_SEED)
+    parser.add_argument('--density', type=float, default=config.CITY_DENSITY)
+    parser.add_argument('--cars', type=float, default=config.CITY_CARS_PER_ROAD_TILE)
+    parser.add_argument('--people', type=float, default=config.CITY_PEOPLE_PER_BLOCK)
+    parser.add_argument('--skip-occupancy', action='store_true', help="skip the (pure Python) cell hash")
+    args = parser.parse_args()
+    blocks = args.blocks or blocks_for(args.objects, args.density, args.cars, args.people)
+    run(blocks, args.seed, args.density, args.cars, args.people, args.skip_occupancy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Broad-phase overlap detection for AI Hand Builder
+Sweep-and-prune over axis-aligned boxes for free (non-snapped) placement
+"""
+
+import numpy as np
+
+
+# Boxes that merely touch are not overlapping
+EPSILON = 1e-4
+
+# Most candidate pairs one batch query tests at a time
+PAIR_CHUNK = 1 << 20
+
+
+class BroadPhase:
+    def __init__(self):
+        """Empty set of boxes kept sorted by their lower x bound"""
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.lows = np.zeros((0, 3), dtype=np.float32)
+        self.highs = np.zeros((0, 3), dtype=np.float32)
+        # Widest box along x bounds how far back a sweep has to look
+        self.max_width = 0.0
+
+    def insert(self, object_id, center, half_extents):
+        """Add a box centered at `center`"""
+        center = np.asarray(center, dtype=np.float32)
+        half = np.asarray(half_extents, dtype=np.float32)
+        low, high = center - half, center + half
+        index = int(np.searchsorted(self.lows[:, 0], low[0]))
+        self.ids = np.insert(self.ids, index, object_id)
+        self.lows = np.insert(self.lows, index, low, axis=0)
+        self.highs = np.insert(self.highs, index, high, axis=0)
+        self.max_width = max(self.max_width, float(high[0] - low[0]))
+
+    def insert_many(self, object_ids, centers, half_extents):
+        """Add many boxes with one sorted merge"""
+        centers = np.asarray(centers, dtype=np.float32)
+        half = np.asarray(half_extents, dtype=np.float32)
+        lows, highs = centers - half, centers + half
+        order = np.argsort(lows[:, 0], kind='stable')
+        lows, highs = lows[order], highs[order]
+        at = np.searchsorted(self.lows[:, 0], lows[:, 0])
+        self.ids = np.insert(self.ids, at, np.asarray(object_ids, dtype=np.int64)[order])
+        self.lows = np.insert(self.lows, at, lows, axis=0)
+        self.highs = np.insert(self.highs, at, highs, axis=0)
+        if len(order):
+            self.max_width = max(self.max_width, float((highs[:, 0] - lows[:, 0]).max()))
+
+    def build(self, object_ids, centers, half_extents):
+        """Replace the contents with many boxes at once"""
+        centers = np.asarray(centers, dtype=np.float32)
+        half = np.asarray(half_extents, dtype=np.float32)
+        lows, highs = centers - half, centers + half
+        order = np.argsort(lows[:, 0], kind='stable')
+        self.ids = np.asarray(object_ids, dtype=np.int64)[order]
+        self.lows = lows[order]
+        self.highs = highs[order]
+        self.max_width = float((highs[:, 0] - lows[:, 0]).max()) if len(order) else 0.0
+
+    def remove(self, object_id):
+        """Remove a box; False if it was not present"""
+        index = np.flatnonzero(self.ids == object_id)
+        if len(index) == 0:
+            return False
+        self.ids = np.delete(self.ids, index)
+        self.lows = np.delete(self.lows, index, axis=0)
+        self.highs = np.delete(self.highs, index, axis=0)
+        return True
+
+    def remove_many(self, object_ids):
+        """Remove many boxes with one pass over the sorted arrays"""
+        keep = ~np.isin(self.ids, np.asarray(object_ids, dtype=np.int64))
+        self.ids = self.ids[keep]
+        self.lows = self.lows[keep]
+        self.highs = self.highs[keep]
+
+    def clear(self):
+        """Remove every box"""
+        self.__init__()
+
+    def _window(self, low, high):
+        """Rows whose boxes overlap [low, high]"""
+        # Sweep: only boxes starting within max_width before the query can reach it on x
+        start = int(np.searchsorted(self.lows[:, 0], low[0] - self.max_width, side='left'))
+        stop = int(np.searchsorted(self.lows[:, 0], high[0] - EPSILON, side='right'))
+        if start >= stop:
+            return np.zeros(0, dtype=np.int64)
+        # Prune: exact interval test on all three axes for the candidates
+        hit = np.all((self.lows[start:stop] < high - EPSILON) &
+                     (self.highs[start:stop] > low + EPSILON), axis=1)
+        return start + np.flatnonzero(hit)
+
+    def query(self, center, half_extents):
+        """Ids of boxes overlapping a box centered at `center`"""
+        center = np.asarray(center, dtype=np.float32)
+        half = np.asarray(half_extents, dtype=np.float32)
+        return self.ids[self._window(center - half, center + half)].tolist()
+
+    def overlapping_many(self, centers, half_extents):
+        """Mask of the boxes centered at `centers` that overlap any stored box"""
+        centers = np.asarray(centers, dtype=np.float32)
+        half = np.asarray(half_extents, dtype=np.float32)
+        lows, highs = centers - half, centers + half
+        starts = np.searchsorted(self.lows[:, 0], lows[:, 0] - self.max_width, side='left')
+        stops = np.searchsorted(self.lows[:, 0], highs[:, 0] - EPSILON, side='right')
+        counts = np.maximum(stops - starts, 0)
+        mask = np.zeros(len(centers), dtype=bool)
+        # Same sweep window as _window() per box, tested in chunks of at most PAIR_CHUNK pairs
+        ends = np.cumsum(counts)
+        first = 0
+        while first < len(centers):
+            base = ends[first] - counts[first]
+            last = max(int(np.searchsorted(ends, base + PAIR_CHUNK, side='right')), first + 1)
+            queries = np.repeat(np.arange(first, last), counts[first:last])
+            # Each pair's row is its box's window start plus its place inside that window
+            within = np.arange(len(queries)) - np.repeat(ends[first:last] - counts[first:last] - base, counts[first:last])
+            rows = starts[queries] + within
+            hit = np.all((self.lows[rows] < highs[queries] - EPSILON) &
+                         (self.highs[rows] > lows[queries] + EPSILON), axis=1)
+            mask[queries[hit]] = True
+            first = last
+        return mask
+
+    def push_out(self, center, half_extents, iterations=8):
+        """
+        Move a box out of every overlap along the shallowest axes
+        Returns the new center, or None if it is still blocked after `iterations` pushes
+        """
+        center = np.asarray(center, dtype=np.float32).copy()
+        half = np.asarray(half_extents, dtype=np.float32)
+        for _ in range(iterations):
+            low, high = center - half, center + half
+            rows = self._window(low, high)
+            if len(rows) == 0:
+                return center.tolist()
+
+            # Distance to move in +axis / -axis to clear each overlapping box
+            up = self.highs[rows] - low
+            down = high - self.lows[rows]
+            down[:, 1] = np.inf  # Never push into the ground
+            moves = np.where(up <= down, up, -down)
+            depth = np.minimum(up, down)
+
+            # Resolve the deepest overlap along its shallowest axis first
+            row = int(np.argmax(depth.min(axis=1)))
+            axis = int(np.argmin(depth[row]))
+            center[axis] += moves[row, axis] + np.sign(moves[row, axis]) * EPSILON * 2
+        return center.tolist() if len(self._window(center - half, center + half)) == 0 else None
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,41 @@
+"""
+Bulk placement for AI Hand Builder
+Grid positions along a line, across a rectangle or through a box between two anchors
+"""
+
+import numpy as np
+
+
+SHAPES = ('line', 'rect', 'box')
+
+
+def _axis(start, end, step):
+    """Positions from start towards end, `step` apart, never past the end anchor"""
+    count = int(abs(end - start) / step + 1e-6) + 1
+    return start + np.arange(count) * (step if end >= start else -step)
+
+
+def fill_positions(shape, start, end, steps):
+    """
+    Positions (n, 3) that tile `shape` between two anchors with the given per-axis steps
+    line: every step along the segment; rect: the x/z rectangle at the start height; box: all levels
+    """
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    steps = np.asarray(steps, dtype=np.float64)
+
+    if shape == 'line':
+        delta = end - start
+        # Whole steps that fit on each axis; like _axis(), never one past the end anchor
+        reach = np.floor(np.abs(delta) / steps + 1e-6)
+        count = int(reach.max()) + 1
+        samples = np.linspace(0, 1, count)[:, None] * np.abs(delta) / steps
+        # Snap the samples onto the step grid; steep lines repeat cells, keep each once
+        points = start + np.sign(delta) * np.minimum(np.round(samples), reach) * steps
+        _, first = np.unique(points, axis=0, return_index=True)
+        return points[np.sort(first)]
+
+    xs = _axis(start[0], end[0], steps[0])
+    zs = _axis(start[2], end[2], steps[2])
+    ys = _axis(start[1], end[1], steps[1]) if shape == 'box' else start[1:2]
+    return np.stack(np.meshgrid(xs, ys, zs, indexing='ij'), axis=-1).reshape(-1, 3)
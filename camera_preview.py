@@ -0,0 +1,131 @@
+"""
+Camera preview for AI Hand Builder
+Long-lived BGR texture streamed through double-buffered pixel buffer objects,
+with hand landmarks drawn over it as GL geometry
+"""
+
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+
+class CameraPreview:
+    def __init__(self, resources):
+        """Create an empty preview; GL objects are allocated on the first frame"""
+        self.resources = resources
+        self.texture = None
+        self.width = 0
+        self.height = 0
+        self.pbos = []
+        self.pbo_index = 0
+        self.uploaded_frame_id = None
+
+    def _allocate(self, width, height):
+        """(Re)create the texture and PBOs for frames of the given size"""
+        self.release()
+        self.width = width
+        self.height = height
+
+        self.texture = self.resources.acquire((self, 'texture'), 'texture', lambda: glGenTextures(1),
+                                              width * height * 3)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        # Scaling to the preview rectangle is left to the sampler
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB8, width, height, 0, GL_BGR, GL_UNSIGNED_BYTE, None)
+
+        try:
+            self.pbos = [self.resources.acquire((self, 'pbo', index), 'buffer', lambda: int(glGenBuffers(1)),
+                                                width * height * 3) for index in range(2)]
+            for pbo in self.pbos:
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+                glBufferData(GL_PIXEL_UNPACK_BUFFER, width * height * 3, None, GL_STREAM_DRAW)
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        except Exception as e:
+            print(f"⚠️ Pixel buffer objects unavailable, uploading directly: {e}")
+            for index in range(2):
+                self.resources.release((self, 'pbo', index))
+            self.pbos = []
+        self.pbo_index = 0
+        self.uploaded_frame_id = None
+
+    def _fill_pbo(self, pbo, data):
+        """Orphan the PBO storage and copy a frame into it"""
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, data.nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_PIXEL_UNPACK_BUFFER, 0, data.nbytes, data)
+
+    def update(self, frame, frame_id):
+        """Upload a BGR camera frame unless it was already uploaded"""
+        if frame_id == self.uploaded_frame_id:
+            return
+        height, width = frame.shape[:2]
+        if self.texture is None or (width, height) != (self.width, self.height):
+            self._allocate(width, height)
+
+        data = np.ascontiguousarray(frame)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+
+        if self.pbos:
+            # Alternate buffers so filling never waits on the copy still reading the other one
+            self.pbo_index = 1 - self.pbo_index
+            self._fill_pbo(self.pbos[self.pbo_index], data)
+
+            # The texture copies from the buffer just filled (DMA, no CPU stall), so it shows this
+            # frame - the one the hand landmarks drawn over it were found in
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height,
+                            GL_BGR, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        else:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height,
+                            GL_BGR, GL_UNSIGNED_BYTE, data)
+
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        self.uploaded_frame_id = frame_id
+
+    def draw(self, x, y, width, height):
+        """Draw the preview texture into a screen rectangle (2D projection)"""
+        if self.texture is None:
+            return
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glColor4f(1, 1, 1, 1)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0); glVertex2f(x, y)
+        glTexCoord2f(1, 0); glVertex2f(x + width, y)
+        glTexCoord2f(1, 1); glVertex2f(x + width, y + height)
+        glTexCoord2f(0, 1); glVertex2f(x, y + height)
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
+
+    def draw_landmarks(self, hands, connections, x, y, width, height):
+        """Draw hand skeletons (normalized landmark arrays) over the preview rectangle"""
+        if not hands:
+            return
+        glEnableClientState(GL_VERTEX_ARRAY)
+        for landmarks in hands:
+            points = np.empty((len(landmarks), 2), dtype=np.float32)
+            points[:, 0] = x + landmarks[:, 0] * width
+            points[:, 1] = y + landmarks[:, 1] * height
+            glVertexPointer(2, GL_FLOAT, 0, points)
+
+            # Connections (yellow) then joints (green), matching the old OpenCV drawing
+            glColor4f(1.0, 1.0, 0.0, 1.0)
+            glLineWidth(2)
+            glDrawElements(GL_LINES, connections.size, GL_UNSIGNED_INT, connections)
+            glColor4f(0.0, 1.0, 0.0, 1.0)
+            glPointSize(5)
+            glDrawArrays(GL_POINTS, 0, len(points))
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def release(self):
+        """Delete the texture and pixel buffers"""
+        for index in range(len(self.pbos)):
+            self.resources.release((self, 'pbo', index))
+        self.pbos = []
+        if self.texture is not None:
+            self.resources.release((self, 'texture'))
+            self.texture = None
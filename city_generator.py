@@ -0,0 +1,160 @@
+"""
+Procedural city generator for AI Hand Builder
+Seeded, reproducible road grids with lots, parks, street furniture, cars and people,
+produced as coded column arrays ready for SceneStore.add_many()
+"""
+
+import numpy as np
+
+import config
+from scene_store import TYPE_CITY, ASSET_CODES, ZONE_CODES, MODE_CODES
+
+
+# Block layout in grid cells: a road line every BLOCK_CELLS, road tiles ROAD_TILE_CELLS long
+# between intersections, a sidewalk ring, and 2 x 2 lots split by a one-cell alley cross
+BLOCK_CELLS = 10
+ROAD_TILES = (2, 5, 8)
+ROAD_TILE_CELLS = 3
+SIDEWALK = (1, 9)
+LOTS = ((3, 3), (3, 7), (7, 3), (7, 7))
+ALLEY = 5
+LIGHTS = ((1, 1), (1, 5), (1, 9), (5, 1), (5, 9), (9, 1), (9, 5), (9, 9))
+ALLEY_TREES = ((5, 3), (5, 7), (3, 5), (7, 5))
+PARK_TREES = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+# Built lots by distance from the city center (0 = center, 1 = edge)
+BUILDINGS = ('skyscraper', 'apartment', 'shop', 'house')
+CENTER_WEIGHTS = np.array([0.6, 0.3, 0.1, 0.0])
+EDGE_WEIGHTS = np.array([0.0, 0.15, 0.15, 0.7])
+
+
+class _Batch:
+    """Objects collected per asset before they are coded into columns"""
+
+    def __init__(self):
+        self.parts = []
+
+    def add(self, asset, cells, sizes=None, snapped=True):
+        """Objects of one asset at (n, 2) x/z cells; sizes default to the configured asset size"""
+        cells = np.asarray(cells, dtype=np.float64).reshape(-1, 2)
+        if sizes is None:
+            sizes = np.tile(np.asarray(config.CITY_ASSETS[asset]['size'], dtype=np.float64), (len(cells), 1))
+        self.parts.append((asset, cells, np.asarray(sizes, dtype=np.float64), snapped))
+
+
+def _block_cells(blocks, offsets):
+    """Cells at the given (x, z) offsets inside every block, as (blocks^2 * len(offsets), 2)"""
+    starts = np.arange(blocks) * BLOCK_CELLS
+    bx, bz = np.meshgrid(starts, starts, indexing='ij')
+    corners = np.stack([bx.ravel(), bz.ravel()], axis=1)
+    return (corners[:, None, :] + np.asarray(offsets)[None, :, :]).reshape(-1, 2)
+
+
+def generate_city(center, blocks, seed, zone, density=None, cars=None, people=None, grid_size=2.0):
+    """
+    A city of blocks x blocks blocks centered on `center`, as a dict of SceneStore columns
+    density: share of lots built on (the rest become parks); cars: chance per road tile;
+    people: average pedestrians per block. The same arguments always give the same city
+    """
+    density = config.CITY_DENSITY if density is None else density
+    cars = config.CITY_CARS_PER_ROAD_TILE if cars is None else cars
+    people = config.CITY_PEOPLE_PER_BLOCK if people is None else people
+    rng = np.random.default_rng(seed)
+    span = blocks * BLOCK_CELLS
+    batch = _Batch()
+
+    # Roads: intersections on every line crossing, tiles stretched to whole cells so they abut
+    lines = np.arange(blocks + 1) * BLOCK_CELLS
+    lx, lz = np.meshgrid(lines, lines, indexing='ij')
+    batch.add('road', np.stack([lx.ravel(), lz.ravel()], axis=1),
+              np.tile([grid_size, 0.1, grid_size], (lx.size, 1)))
+    along = (np.arange(blocks)[:, None] * BLOCK_CELLS + np.asarray(ROAD_TILES)[None, :]).ravel()
+    tx, tz = np.meshgrid(along, lines, indexing='ij')
+    x_tiles = np.stack([tx.ravel(), tz.ravel()], axis=1)
+    z_tiles = x_tiles[:, ::-1]
+    tile_length = ROAD_TILE_CELLS * grid_size
+    batch.add('road', x_tiles, np.tile([tile_length, 0.1, grid_size], (len(x_tiles), 1)))
+    batch.add('road', z_tiles, np.tile([grid_size, 0.1, tile_length], (len(z_tiles), 1)))
+
+    # Lots: built with probability `density`, taller and denser towards the center
+    lots = _block_cells(blocks, LOTS)
+    distance = np.hypot(*(lots - span / 2).T) / max(span / 2 * np.sqrt(2), 1)
+    weights = CENTER_WEIGHTS[None, :] * (1 - distance[:, None]) + EDGE_WEIGHTS[None, :] * distance[:, None]
+    weights /= weights.sum(axis=1, keepdims=True)
+    choice = (rng.random(len(lots))[:, None] > np.cumsum(weights, axis=1)).sum(axis=1)
+    built = rng.random(len(lots)) < density
+    for code, asset in enumerate(BUILDINGS):
+        cells = lots[built & (choice == code)]
+        sizes = np.tile(np.asarray(config.CITY_ASSETS[asset]['size'], dtype=np.float64), (len(cells), 1))
+        if asset == 'skyscraper':
+            sizes[:, 1] *= rng.uniform(1.0, 2.5, len(cells))
+        batch.add(asset, cells, sizes)
+    parks = lots[~built]
+    batch.add('fountain', parks)
+    batch.add('tree', (parks[:, None, :] + np.asarray(PARK_TREES)[None, :, :]).reshape(-1, 2))
+
+    # Street furniture along the sidewalks and the alley cross
+    batch.add('streetlight', _block_cells(blocks, LIGHTS))
+    alley_trees = _block_cells(blocks, ALLEY_TREES)
+    batch.add('tree', alley_trees[rng.random(len(alley_trees)) < density])
+    batch.add('bench', _block_cells(blocks, [(ALLEY, ALLEY)]))
+
+    # Cars on road tiles, turned along the road (free placement); traffic.py keeps them to a lane
+    car_w, car_h, car_d = config.CITY_ASSETS['car']['size']
+    for tiles, size in ((x_tiles, (car_d, car_h, car_w)), (z_tiles, (car_w, car_h, car_d))):
+        cells = tiles[rng.random(len(tiles)) < cars]
+        batch.add('car', cells, np.tile(size, (len(cells), 1)), snapped=False)
+
+    # People at random points on each block's sidewalk ring (free placement)
+    count = rng.poisson(people, blocks * blocks)
+    block = np.repeat(np.arange(blocks * blocks), count)
+    side = rng.integers(0, 4, len(block))
+    along = rng.uniform(SIDEWALK[0], SIDEWALK[1], len(block))
+    edge = np.where(side % 2, SIDEWALK[1], SIDEWALK[0]).astype(np.float64)
+    walkers = np.where((side < 2)[:, None], np.stack([along, edge], 1), np.stack([edge, along], 1))
+    walkers += np.stack([block // blocks, block % blocks], axis=1) * BLOCK_CELLS
+    batch.add('person', walkers, snapped=False)
+
+    return _columns(batch, center, span, zone, grid_size)
+
+
+def _columns(batch, center, span, zone, grid_size):
+    """Code a batch into SceneStore.add_many() columns, cells centered on `center`"""
+    origin = np.array([center[0], center[2]], dtype=np.float64) - (span // 2) * grid_size
+    positions, sizes, colors, assets, snapped = [], [], [], [], []
+    for asset, cells, asset_sizes, asset_snapped in batch.parts:
+        xz = origin + cells * grid_size
+        count = len(cells)
+        positions.append(np.column_stack([xz[:, 0], np.full(count, center[1]), xz[:, 1]]))
+        sizes.append(asset_sizes)
+        colors.append(np.tile(config.CITY_ASSETS[asset]['color'], (count, 1)))
+        assets.append(np.full(count, ASSET_CODES[TYPE_CITY][asset], dtype=np.uint8))
+        snapped.append(np.full(count, asset_snapped, dtype=bool))
+
+    count = sum(len(column) for column in assets)
+    return {
+        'positions': np.concatenate(positions).astype(np.float32),
+        'sizes': np.concatenate(sizes).astype(np.float32),
+        'colors': np.concatenate(colors).astype(np.float32),
+        'types': np.full(count, TYPE_CITY, dtype=np.uint8),
+        'assets': np.concatenate(assets),
+        'zones': np.full(count, ZONE_CODES[zone], dtype=np.uint8),
+        'modes': np.full(count, MODE_CODES['city'], dtype=np.uint8),
+        'snapped': np.concatenate(snapped)
+    }
+
+
+def blocks_for(objects, density=None, cars=None, people=None):
+    """Blocks per side for a city of roughly `objects` objects (for stress scenes)"""
+    density = config.CITY_DENSITY if density is None else density
+    cars = config.CITY_CARS_PER_ROAD_TILE if cars is None else cars
+    people = config.CITY_PEOPLE_PER_BLOCK if people is None else people
+    # Per block: 7 road pieces, 8 lights, a bench, lots or parks, alley trees, cars, people
+    per_block = 7 + 8 + 1 + 4 * (density + 5 * (1 - density)) + 4 * density + 6 * cars + people
+    return max(1, int(round(np.sqrt(objects / per_block))))
+
+
+def asset_counts(city):
+    """Objects per city asset name in generated columns"""
+    counts = np.bincount(city['assets'], minlength=len(ASSET_CODES[TYPE_CITY]))
+    return {name: int(counts[code]) for name, code in ASSET_CODES[TYPE_CITY].items() if name and counts[code]}
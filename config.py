@@ -43,31 +43,32 @@ BUILD_MODES = {
 }
 
 # Building Parts Configuration
+# 'anchor': 'base' marks parts drawn upwards from their position; the rest are centered on it
 BUILDING_PARTS = {
-    'wall': {'size': (3, 2, 0.3), 'color': (0.76, 0.60, 0.42), 'name': 'Wall'},
-    'window': {'size': (1.5, 1.5, 0.2), 'color': (0.53, 0.81, 0.92), 'name': 'Window'},
-    'door': {'size': (1.2, 2, 0.2), 'color': (0.55, 0.27, 0.07), 'name': 'Door'},
-    'roof': {'size': (4, 0.3, 4), 'color': (0.86, 0.08, 0.24), 'name': 'Roof'},
+    'wall': {'size': (3, 2, 0.3), 'color': (0.76, 0.60, 0.42), 'anchor': 'base', 'name': 'Wall'},
+    'window': {'size': (1.5, 1.5, 0.2), 'color': (0.53, 0.81, 0.92), 'anchor': 'base', 'name': 'Window'},
+    'door': {'size': (1.2, 2, 0.2), 'color': (0.55, 0.27, 0.07), 'anchor': 'base', 'name': 'Door'},
+    'roof': {'size': (4, 0.3, 4), 'color': (0.86, 0.08, 0.24), 'anchor': 'base', 'name': 'Roof'},
     'floor': {'size': (4, 0.2, 4), 'color': (0.41, 0.41, 0.41), 'name': 'Floor'},
-    'column': {'size': (0.4, 3, 0.4), 'color': (0.83, 0.83, 0.83), 'name': 'Column'},
-    'stairs': {'size': (2, 1, 3), 'color': (0.66, 0.66, 0.66), 'name': 'Stairs'},
-    'balcony': {'size': (3, 0.2, 1.5), 'color': (0.44, 0.50, 0.56), 'name': 'Balcony'}
+    'column': {'size': (0.4, 3, 0.4), 'color': (0.83, 0.83, 0.83), 'anchor': 'base', 'name': 'Column'},
+    'stairs': {'size': (2, 1, 3), 'color': (0.66, 0.66, 0.66), 'anchor': 'base', 'name': 'Stairs'},
+    'balcony': {'size': (3, 0.2, 1.5), 'color': (0.44, 0.50, 0.56), 'anchor': 'base', 'name': 'Balcony'}
 }
 
-# City Builder Assets
+# City Builder Assets ('anchor' as for building parts)
 CITY_ASSETS = {
-    'road': {'size': (5, 0.1, 2), 'color': (0.2, 0.2, 0.2), 'name': 'Road'},
+    'road': {'size': (5, 0.1, 2), 'color': (0.2, 0.2, 0.2), 'anchor': 'base', 'name': 'Road'},
     'apartment': {'size': (3, 5, 3), 'color': (0.7, 0.7, 0.7), 'name': 'Apartment'},
     'house': {'size': (2.5, 2.5, 2.5), 'color': (0.9, 0.75, 0.5), 'name': 'House'},
-    'skyscraper': {'size': (4, 8, 4), 'color': (0.3, 0.4, 0.5), 'name': 'Skyscraper'},
+    'skyscraper': {'size': (4, 8, 4), 'color': (0.3, 0.4, 0.5), 'anchor': 'base', 'name': 'Skyscraper'},
     'shop': {'size': (2, 2, 2), 'color': (0.85, 0.45, 0.3), 'name': 'Shop'},
-    'streetlight': {'size': (0.2, 3, 0.2), 'color': (0.9, 0.9, 0.1), 'name': 'Street Light'},
-    'bench': {'size': (1.5, 0.5, 0.6), 'color': (0.4, 0.3, 0.2), 'name': 'Bench'},
-    'tree': {'size': (1, 3, 1), 'color': (0.13, 0.55, 0.13), 'name': 'Tree'},
-    'grass': {'size': (3, 0.05, 3), 'color': (0.2, 0.8, 0.2), 'name': 'Grass Patch'},
-    'fountain': {'size': (2, 1.5, 2), 'color': (0.4, 0.6, 0.9), 'name': 'Fountain'},
-    'car': {'size': (1.8, 1, 4), 'color': (0.8, 0.1, 0.1), 'name': 'Car'},
-    'person': {'size': (0.5, 1.7, 0.4), 'color': (0.9, 0.7, 0.5), 'name': 'Person'},
+    'streetlight': {'size': (0.2, 3, 0.2), 'color': (0.9, 0.9, 0.1), 'anchor': 'base', 'name': 'Street Light'},
+    'bench': {'size': (1.5, 0.5, 0.6), 'color': (0.4, 0.3, 0.2), 'anchor': 'base', 'name': 'Bench'},
+    'tree': {'size': (1, 3, 1), 'color': (0.13, 0.55, 0.13), 'anchor': 'base', 'name': 'Tree'},
+    'grass': {'size': (3, 0.05, 3), 'color': (0.2, 0.8, 0.2), 'anchor': 'base', 'name': 'Grass Patch'},
+    'fountain': {'size': (2, 1.5, 2), 'color': (0.4, 0.6, 0.9), 'anchor': 'base', 'name': 'Fountain'},
+    'car': {'size': (1.8, 1, 4), 'color': (0.8, 0.1, 0.1), 'anchor': 'base', 'name': 'Car'},
+    'person': {'size': (0.5, 1.7, 0.4), 'color': (0.9, 0.7, 0.5), 'anchor': 'base', 'name': 'Person'},
     'sun': {'size': (3, 3, 3), 'color': (1.0, 0.9, 0.2), 'name': 'Sun'}
 }
 
@@ -84,6 +85,19 @@ ZONES = {
     'zone9': {'position': (-25, 0, -25), 'name': 'SW Mountain'}
 }
 
+# Zone colors used by the 3D floors and the zone selector
+ZONE_COLORS = {
+    'zone1': (0.3, 0.5, 0.9),   # Blue - Central Plaza
+    'zone2': (0.9, 0.5, 0.3),   # Orange - East District
+    'zone3': (0.5, 0.3, 0.9),   # Purple - West District
+    'zone4': (0.3, 0.9, 0.3),   # Green - North Park
+    'zone5': (0.9, 0.9, 0.3),   # Yellow - South Beach
+    'zone6': (0.9, 0.3, 0.3),   # Red - NE Industrial
+    'zone7': (0.3, 0.9, 0.9),   # Cyan - NW Residential
+    'zone8': (0.5, 0.9, 0.5),   # Light Green - SE Harbor
+    'zone9': (0.7, 0.5, 0.3)    # Brown - SW Mountain
+}
+
 # Solar System Objects
 SOLAR_OBJECTS = {
     'sun': {'radius': 3, 'color': (0.99, 0.72, 0.07), 'name': 'Sun'},
@@ -111,3 +125,69 @@ UI_SUCCESS_COLOR = (34, 197, 94)
 GOOD_LIGHTING_THRESHOLD = 100  # Average brightness
 POOR_LIGHTING_THRESHOLD = 50
 CONFIDENCE_WARNING_THRESHOLD = 0.6
+
+# Level of Detail (quadric assets)
+LOD_PIXEL_THRESHOLDS = (48, 16, 6)  # Projected radius (px) needed for levels 0, 1, 2
+LOD_MIN_SLICES = 4                  # Coarsest tessellation around the axis
+
+# GPU Resources
+GPU_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024  # Cached textures/display lists are evicted LRU beyond this
+
+# Sun Lighting (shader path)
+SUN_LIGHT_RADIUS = 40.0   # World units a placed sun reaches
+LIGHT_TILE_SIZE = 12.5    # World-space culling tile (half a zone)
+LIGHTS_PER_TILE = 8       # Nearest suns shaded per tile
+
+# Grid Occupancy
+OCCUPIED_CELL_POLICY = 'reject'  # 'reject' or 'replace' when placing into an occupied cell
+FREE_OVERLAP_POLICY = 'push'     # 'push', 'reject' or 'allow' for overlapping free placements
+
+# Magnetic Snapping
+MAGNET_SNAP_RADIUS = 1.5  # World units from the cursor to a face attachment point
+
+# Scene Files
+SCENE_FILE = 'scene.ahbs'  # F5 saves here, F9 loads it
+
+# Crash Recovery Journal
+JOURNAL_DIR = 'recovery'     # Snapshot + operation log of the current scene
+JOURNAL_COMPACT_OPS = 2000   # Operations between snapshots (keeps replay short)
+
+# Zone Streaming
+ZONE_STREAM_DIR = 'recovery/zones'   # Per-zone scene files of zones streamed out of memory
+STREAM_LOAD_DISTANCE = 30.0          # Zones this close to the camera are loaded in the background
+STREAM_EVICT_DISTANCE = 60.0         # Zones farther than this are written out and evicted
+STREAM_BUDGET_OBJECTS = 500000       # Farthest zones are evicted while more objects than this are resident
+STREAM_COMPACT_DELAY = 5.0           # Seconds without merges before a snapshot absorbs streamed-in zones
+
+# Undo History
+HISTORY_LIMIT = 200  # Undo steps kept (removed objects hold their slots until dropped)
+
+# Bulk Fill
+BULK_FILL_MAX = 100000  # Most objects one line/rect/box fill may place
+BULK_REINDEX = 512      # Batches larger than this go into the indexes as one block instead of one by one
+
+# Prefabs
+PREFAB_DIR = 'prefabs'  # One scene file per captured prefab
+PREFAB_SLOTS = 32       # Prefabs that can be defined at once
+
+# City Generator
+CITY_SEED = 2024                 # Base seed; each zone adds its own index so zones differ but repeat
+CITY_BLOCKS = 1                  # Blocks per side generated into a zone by K (one block fits a zone)
+CITY_DENSITY = 0.8               # Share of lots built on; the rest become parks
+CITY_CARS_PER_ROAD_TILE = 0.3    # Chance of a car on each road tile
+CITY_PEOPLE_PER_BLOCK = 6        # Average pedestrians per block
+
+# Traffic Simulation
+TRAFFIC_TICK = 1 / 30        # Fixed simulation step (s), independent of the frame rate
+TRAFFIC_MAX_STEPS = 5        # Steps per frame at most; a slow frame slows the traffic instead of piling up
+TRAFFIC_TURN_CHANCE = 0.3    # Chance of turning at a junction where going straight on is possible
+CAR_SPEED = 4.0              # World units per second
+PERSON_SPEED = 1.2           # World units per second
+
+# Orbital Mechanics (Solar mode)
+ORBIT_TICK = 1 / 120          # Fixed integration step (simulated seconds)
+ORBIT_MAX_STEPS = 240         # Steps per frame at most; beyond this the simulation falls behind real time
+ORBIT_TIME_SCALE = 1.0        # Simulated seconds per real second ([ and ] halve / double it)
+ORBIT_GM = 40.0               # Gravity of a standard sun (a body 10 units out circles in ~31 s)
+ORBIT_SOFTENING = 0.5         # Keeps gravity finite for bodies placed inside a sun
+COMET_SPEED_FACTOR = 0.55     # Share of circular speed comets start with (long ellipses)
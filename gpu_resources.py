@@ -0,0 +1,148 @@
+"""
+GPU resource manager for AI Hand Builder
+One registry for textures, buffers, framebuffers, display lists and shader programs,
+with reference counts, byte accounting and LRU eviction of cached resources under a VRAM budget
+"""
+
+from collections import OrderedDict
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+
+DELETERS = {
+    'texture': lambda handle: glDeleteTextures([handle]),
+    'buffer': lambda handle: glDeleteBuffers(1, [handle]),
+    'framebuffer': lambda handle: glDeleteFramebuffers(1, [handle]),
+    'display_list': lambda handle: glDeleteLists(handle, 1),
+    'program': lambda handle: glDeleteProgram(handle),
+    'quadric': lambda handle: gluDeleteQuadric(handle)
+}
+
+# Entry fields
+KIND, HANDLE, NBYTES, REFS, KEEP, ON_EVICT = range(6)
+
+
+class GPUResources:
+    def __init__(self, budget_bytes):
+        """Empty registry; unreferenced cached resources are evicted beyond `budget_bytes`"""
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        # key -> [kind, handle, nbytes, refs, keep, on_evict], least recently used first
+        self.entries = OrderedDict()
+        self.created = 0
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _create(self, key, kind, create, nbytes, keep, on_evict):
+        """Run `create` and register its handle (nothing is registered if it raises)"""
+        handle = create()
+        self.misses += 1
+        self.created += 1
+        entry = [kind, handle, nbytes, 0, keep, on_evict]
+        self.entries[key] = entry
+        self.used_bytes += nbytes
+        return entry
+
+    def acquire(self, key, kind, create, nbytes=0, keep=False):
+        """
+        Handle of a resource, created with create() on first use; pair with release(key)
+        With keep=True the resource stays cached (evictable) after its last release
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self._create(key, kind, create, nbytes, keep, None)
+        else:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        entry[REFS] += 1
+        self._evict()
+        return entry[HANDLE]
+
+    def cache(self, key, kind, create, nbytes=0, on_evict=None):
+        """Handle of an unowned cached resource; on_evict() runs if it is evicted later"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[HANDLE]
+        entry = self._create(key, kind, create, nbytes, True, on_evict)
+        self._evict(keep=key)
+        return entry[HANDLE]
+
+    def get(self, key):
+        """Handle of a registered resource (marking it recently used), or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[HANDLE]
+
+    def release(self, key):
+        """Drop one reference; the last release deletes the resource unless it was kept"""
+        entry = self.entries.get(key)
+        if entry is None or entry[REFS] == 0:
+            return
+        entry[REFS] -= 1
+        if entry[REFS] == 0:
+            if entry[KEEP]:
+                self._evict()
+            else:
+                self._delete(key)
+
+    def discard(self, key):
+        """Delete an unreferenced cached resource now (e.g. once what it was built from changed)"""
+        entry = self.entries.get(key)
+        if entry is not None and entry[REFS] == 0:
+            self._delete(key)
+
+    def _delete(self, key):
+        """Delete a resource's GL object and forget it"""
+        entry = self.entries.pop(key)
+        DELETERS[entry[KIND]](entry[HANDLE])
+        self.used_bytes -= entry[NBYTES]
+        return entry
+
+    def _evict(self, keep=None):
+        """Delete least recently used unreferenced resources until the budget is met"""
+        if self.used_bytes <= self.budget_bytes:
+            return
+        for key in list(self.entries):
+            if self.used_bytes <= self.budget_bytes:
+                break
+            entry = self.entries[key]
+            if entry[REFS] or key == keep:
+                continue
+            self._delete(key)
+            self.evictions += 1
+            if entry[ON_EVICT] is not None:
+                entry[ON_EVICT]()
+
+    def stats(self):
+        """Live resources per kind plus budget, cache and eviction counters"""
+        kinds = {}
+        referenced = 0
+        for kind, _, nbytes, refs, _, _ in self.entries.values():
+            count, total = kinds.get(kind, (0, 0))
+            kinds[kind] = (count + 1, total + nbytes)
+            referenced += refs > 0
+        return {
+            'kinds': kinds,
+            'live': len(self.entries),
+            'referenced': referenced,
+            'used_bytes': self.used_bytes,
+            'budget_bytes': self.budget_bytes,
+            'created': self.created,
+            'evictions': self.evictions,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def release_all(self):
+        """Delete every resource (at shutdown); reports any still referenced"""
+        leaked = [key for key, entry in self.entries.items() if entry[REFS]]
+        if leaked:
+            print(f"⚠️ {len(leaked)} GPU resources still referenced at shutdown")
+        for key in list(self.entries):
+            self._delete(key)
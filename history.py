@@ -0,0 +1,154 @@
+"""
+Undo history for AI Hand Builder
+Steps hold compact operations (object ids, old/new placements), never scene copies.
+Removed objects keep their store slots while a step can still bring them back;
+objects streamed out to disk are referred to by placeholder ids until they stream back in
+"""
+
+import numpy as np
+
+
+class History:
+    def __init__(self, limit):
+        """Empty history keeping at most `limit` undo steps"""
+        self.limit = limit
+        self.undo_steps = []
+        self.redo_steps = []
+        self.group = None
+        # Key (e.g. a zone) -> placeholder ids (negative) of objects stashed under it, in stash order
+        self.stashed = {}
+        self.next_placeholder = 0
+
+    def begin(self):
+        """Start collecting operations into one step (e.g. replace = remove + add)"""
+        self.group = []
+
+    def end(self, scene):
+        """Finish the current step"""
+        step, self.group = self.group, None
+        if step:
+            self._push(scene, step)
+
+    def record(self, scene, op):
+        """
+        Record one operation:
+        ('add', ids), ('remove', ids) or ('move', id, (position, zone, snapped) before, after)
+        """
+        if op[0] != 'move' and len(op[1]) == 0:
+            return
+        if self.group is not None:
+            self.group.append(op)
+        else:
+            self._push(scene, [op])
+
+    def _push(self, scene, step):
+        """Add a new step; it invalidates everything that could be redone"""
+        for redo_step in self.redo_steps:
+            self._release(scene, redo_step, 'add')
+        self.redo_steps = []
+        self.undo_steps.append(step)
+        if len(self.undo_steps) > self.limit:
+            self._release(scene, self.undo_steps.pop(0), 'remove')
+
+    def _release(self, scene, step, kind):
+        """Free the slots of objects that a discarded step was keeping removed"""
+        if scene is None:
+            return
+        for op in step:
+            if op[0] == kind:
+                scene.release_slots(op[1][op[1] >= 0])
+
+    def undo(self):
+        """Step to revert (apply its operations inverted, last first), or None"""
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        return step
+
+    def redo(self):
+        """Step to re-apply, or None"""
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return step
+
+    def _remap(self, old_ids, new_ids):
+        """Point every step's operations at new ids for objects that changed ids"""
+        if len(old_ids) == 0:
+            return
+        order = np.argsort(old_ids)
+        old_sorted, new_sorted = old_ids[order], new_ids[order]
+
+        def convert(ids):
+            at = np.searchsorted(old_sorted, ids).clip(0, len(old_sorted) - 1)
+            return np.where(old_sorted[at] == ids, new_sorted[at], ids)
+
+        for step in self.undo_steps + self.redo_steps:
+            for index, op in enumerate(step):
+                if op[0] == 'move':
+                    step[index] = ('move', int(convert(np.array([op[1]]))[0])) + op[2:]
+                else:
+                    step[index] = (op[0], convert(op[1]))
+
+    def stash(self, key, ids):
+        """Objects left the store under `key` (e.g. a zone streamed out); steps keep placeholders for them"""
+        ids = np.asarray(ids, dtype=np.int64)
+        placeholders = np.arange(self.next_placeholder - len(ids), self.next_placeholder, dtype=np.int64)
+        self.next_placeholder -= len(ids)
+        self.stashed[key] = placeholders
+        self._remap(ids, placeholders)
+
+    def unstash(self, key, ids):
+        """Objects stashed under `key` are back with new ids, given in the order they were stashed"""
+        placeholders = self.stashed.pop(key, None)
+        if placeholders is None:
+            return
+        if len(placeholders) == len(ids):
+            self._remap(placeholders, np.asarray(ids, dtype=np.int64))
+        else:
+            self._forget(placeholders)
+
+    def drop(self, key):
+        """Objects stashed under `key` are gone for good; steps forget them"""
+        placeholders = self.stashed.pop(key, None)
+        if placeholders is not None:
+            self._forget(placeholders)
+
+    def _forget(self, placeholders):
+        """Take placeholder ids out of every step, dropping operations and steps left empty"""
+        for steps in (self.undo_steps, self.redo_steps):
+            for step in steps:
+                kept = []
+                for op in step:
+                    if op[0] == 'move':
+                        if op[1] not in placeholders:
+                            kept.append(op)
+                    else:
+                        ids = op[1][~np.isin(op[1], placeholders)]
+                        if len(ids):
+                            kept.append((op[0], ids))
+                step[:] = kept
+            steps[:] = [step for step in steps if step]
+
+    def waiting_for(self, step):
+        """Keys whose stashed objects a step refers to (it cannot apply until they are back)"""
+        keys = []
+        for op in step:
+            ids = np.atleast_1d(op[1])
+            if (ids < 0).any():
+                keys.extend(key for key, placeholders in self.stashed.items()
+                            if key not in keys and np.isin(ids, placeholders).any())
+        return keys
+
+    def clear(self, scene=None):
+        """Forget every step (the scene was replaced); frees kept slots in `scene`"""
+        for step in self.undo_steps:
+            self._release(scene, step, 'remove')
+        for step in self.redo_steps:
+            self._release(scene, step, 'add')
+        self.undo_steps = []
+        self.redo_steps = []
+        self.group = None
+        self.stashed = {}
@@ -0,0 +1,284 @@
+"""
+Operation journal for AI Hand Builder
+Scene mutations are appended to a log by a background writer thread; startup recovers
+from the newest snapshot plus its journal, and compaction starts a new generation
+"""
+
+import glob
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+import numpy as np
+
+import scene_io
+from scene_store import SceneStore, ZONES
+
+
+# Frame: payload length, CRC-32 of the payload (a torn tail write fails the check)
+FRAME = struct.Struct('<II')
+
+OP_BEGIN, OP_ADD, OP_REMOVE, OP_MOVE, OP_CLEAR, OP_EVICT, OP_MERGE = range(7)
+ADD = struct.Struct('<BI3f3f3f4B?')   # op, id, position, size, color, type, asset, zone, mode, snapped
+REMOVE = struct.Struct('<BI')         # op, id
+MOVE = struct.Struct('<BI3fB?')       # op, id, position, zone, snapped
+CLEAR = struct.Struct('<B')           # op
+EVICT = struct.Struct('<BB')          # op, zone
+MERGE = struct.Struct('<BB')          # op, zone, then the merged objects' session ids
+
+
+def _frame(payload):
+    """Wrap a record payload in a length + checksum frame"""
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_frames(path):
+    """Yield record payloads up to the first damaged or truncated frame"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, checksum = FRAME.unpack_from(data, offset)
+        payload = data[offset + FRAME.size:offset + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        yield payload
+        offset += FRAME.size + length
+
+
+class Journal:
+    def __init__(self, directory, compact_after):
+        """Journal in `directory`; a new snapshot is taken every `compact_after` operations"""
+        self.directory = directory
+        self.compact_after = compact_after
+        self.generation = 0
+        self.operations = 0
+        self.queue = queue.Queue()
+        self.thread = None
+        self.file = None
+        # Disk tasks waiting for the next snapshot (e.g. deleting zone files that merge records read)
+        self.snapshot_tasks = []
+
+    def _path(self, kind, generation):
+        """Path of a generation's snapshot or journal file"""
+        extension = 'ahbs' if kind == 'snapshot' else 'log'
+        return os.path.join(self.directory, f"{kind}-{generation:06d}.{extension}")
+
+    def _generations(self, kind):
+        """Generations that have a file of the given kind, oldest first"""
+        paths = glob.glob(os.path.join(self.directory, f"{kind}-*"))
+        return sorted(int(os.path.basename(path).split('-')[1].split('.')[0]) for path in paths
+                      if not path.endswith('.tmp'))
+
+    def recover(self, zone_path):
+        """
+        Rebuild the scene from the newest snapshot and its journal; None if there is nothing
+        `zone_path(zone)` names the zone file a merge record reads its objects from
+        """
+        snapshots = self._generations('snapshot')
+        if not snapshots:
+            return None
+        self.generation = snapshots[-1]
+        scene = SceneStore()
+        file_ids = scene_io.load_scene(self._path('snapshot', self.generation), scene)
+
+        journal_path = self._path('journal', self.generation)
+        if not os.path.exists(journal_path):
+            return scene
+        id_map = {}
+        maps = None
+        for payload in _read_frames(journal_path):
+            op = payload[0]
+            if op == OP_BEGIN:
+                table_length = struct.unpack_from('<I', payload, 1)[0]
+                tables = json.loads(payload[5:5 + table_length].decode('utf-8'))
+                maps = scene_io.code_maps(tables)
+                session_ids = np.frombuffer(payload[5 + table_length:], dtype='<i8')
+                id_map = dict(zip(session_ids.tolist(), file_ids.tolist()))
+            elif maps is None:
+                break   # A journal always starts with its BEGIN record
+            elif op == OP_ADD:
+                _, object_id, *values = ADD.unpack(payload)
+                type_map, zone_map, mode_map, asset_map = maps
+                file_type, file_asset, file_zone, file_mode, snapped = values[9:]
+                new_ids = scene.add_many(
+                    [values[0:3]], [values[3:6]], [values[6:9]],
+                    [type_map[file_type]], [asset_map[file_type, file_asset]],
+                    [zone_map[file_zone]], [mode_map[file_mode]], [snapped]
+                )
+                id_map[object_id] = int(new_ids[0])
+            elif op == OP_REMOVE:
+                _, object_id = REMOVE.unpack(payload)
+                if object_id in id_map:
+                    scene.remove(id_map.pop(object_id))
+            elif op == OP_MOVE:
+                _, object_id, x, y, z, file_zone, snapped = MOVE.unpack(payload)
+                if object_id in id_map:
+                    scene.move(id_map[object_id], (x, y, z), ZONES[maps[1][file_zone]], snapped)
+            elif op == OP_CLEAR:
+                scene.clear()
+                id_map = {}
+            elif op == OP_EVICT:
+                # The zone's objects were written to its zone file before this record
+                _, file_zone = EVICT.unpack(payload)
+                scene.remove_many(scene.zone_object_ids(ZONES[maps[1][file_zone]]))
+            elif op == OP_MERGE:
+                # The zone file is only deleted once a snapshot holds its objects
+                _, file_zone = MERGE.unpack_from(payload)
+                session_ids = np.frombuffer(payload[MERGE.size:], dtype='<i8')
+                new_ids = scene_io.load_scene(zone_path(ZONES[maps[1][file_zone]]), scene)
+                id_map.update(zip(session_ids.tolist(), new_ids.tolist()))
+        return scene
+
+    def start(self, scene):
+        """Begin journaling from the scene's current state (written as a new snapshot)"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+        self.compact(scene)
+
+    def compact(self, scene):
+        """Queue a snapshot of the scene; later operations go to a fresh journal"""
+        self.generation += 1
+        self.operations = 0
+        generation, copy = self.generation, scene.copy()
+        tasks, self.snapshot_tasks = self.snapshot_tasks, []
+
+        def write():
+            self._write_snapshot(generation, copy)
+            # Skipped if the snapshot failed: what they delete is still needed
+            for task in tasks:
+                task()
+        self.run_in_order(write)
+
+    def after_snapshot(self, task):
+        """Run a disk task once the next snapshot is written"""
+        self.snapshot_tasks.append(task)
+
+    def run_in_order(self, task):
+        """Run a disk task on the writer thread, after every record queued before it"""
+        self.queue.put(task)
+
+    def _append(self, payload, scene):
+        """Queue one record and compact once the journal grows long"""
+        self.queue.put(_frame(payload))
+        self.operations += 1
+        if self.operations >= self.compact_after:
+            self.compact(scene)
+
+    def added(self, scene, object_id):
+        """Record a newly added object"""
+        self._append(ADD.pack(
+            OP_ADD, object_id,
+            *scene.positions[object_id].tolist(), *scene.sizes[object_id].tolist(),
+            *scene.colors[object_id].tolist(),
+            int(scene.types[object_id]), int(scene.assets[object_id]),
+            int(scene.zones[object_id]), int(scene.modes[object_id]),
+            bool(scene.snapped[object_id])
+        ), scene)
+
+    def removed(self, scene, object_id):
+        """Record a removed object"""
+        self._append(REMOVE.pack(OP_REMOVE, object_id), scene)
+
+    def added_many(self, scene, ids):
+        """Record objects added (or restored) together; a large batch is snapshotted instead"""
+        if self.operations + len(ids) >= self.compact_after:
+            self.compact(scene)
+            return
+        for object_id in ids.tolist():
+            self.added(scene, object_id)
+
+    def removed_many(self, scene, ids):
+        """Record objects removed together; a large batch is snapshotted instead"""
+        if self.operations + len(ids) >= self.compact_after:
+            self.compact(scene)
+            return
+        for object_id in ids.tolist():
+            self.removed(scene, object_id)
+
+    def moved(self, scene, object_id):
+        """Record an object's new position and zone"""
+        self._append(MOVE.pack(OP_MOVE, object_id, *scene.positions[object_id].tolist(),
+                               int(scene.zones[object_id]), bool(scene.snapped[object_id])), scene)
+
+    def cleared(self, scene):
+        """Record that the whole scene was cleared"""
+        self._append(CLEAR.pack(OP_CLEAR), scene)
+
+    def evicted(self, scene, zone):
+        """Record that a zone's objects moved out to its zone file"""
+        self._append(EVICT.pack(OP_EVICT, scene.zone_code(zone)), scene)
+
+    def merged(self, scene, zone, ids):
+        """Record that a zone's file was read back into the scene as the given ids"""
+        self._append(MERGE.pack(OP_MERGE, scene.zone_code(zone)) + np.asarray(ids).astype('<i8').tobytes(), scene)
+
+    def _write_snapshot(self, generation, scene):
+        """Write a snapshot and start its journal, then drop older generations"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        session_ids = scene_io.save_scene(self._path('snapshot', generation), scene)
+
+        tables = json.dumps(scene_io.name_tables(), separators=(',', ':')).encode('utf-8')
+        self.file = open(self._path('journal', generation), 'wb')
+        self.file.write(_frame(bytes([OP_BEGIN]) + struct.pack('<I', len(tables)) + tables
+                               + session_ids.astype('<i8').tobytes()))
+        self.file.flush()
+
+        for kind in ('snapshot', 'journal'):
+            for old in self._generations(kind):
+                if old < generation:
+                    os.remove(self._path(kind, old))
+
+    def _write_loop(self):
+        """Writer thread: drain queued records in batches, one flush and fsync per batch"""
+        running = True
+        while running:
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch = []
+            for item in items:
+                if item is None:
+                    running = False
+                elif callable(item):
+                    # Records queued before the task must reach disk before it runs
+                    self._flush(batch)
+                    batch = []
+                    try:
+                        item()
+                    except (OSError, ValueError) as e:
+                        print(f"⚠️ Journal task failed: {e}")
+                else:
+                    batch.append(item)
+            self._flush(batch)
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _flush(self, batch):
+        """Append a batch of framed records to the current journal file"""
+        if not batch or self.file is None:
+            return
+        try:
+            self.file.write(b''.join(batch))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            print(f"⚠️ Journal write failed: {e}")
+
+    def close(self):
+        """Flush everything queued and stop the writer thread"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
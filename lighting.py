@@ -0,0 +1,291 @@
+"""
+Sun lighting for AI Hand Builder
+Per-pixel shader lighting with a light buffer and world-space tile culling,
+so any number of placed suns can light the scene at roughly constant cost
+"""
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+
+import config
+
+
+VERTEX_SHADER = """#version 120
+uniform mat4 view_inverse;
+uniform bool instanced;
+attribute vec4 instance;        // x, y, z, yaw in degrees (one per instance)
+attribute vec3 instance_color;  // replaces the vertex color where its alpha is 1
+varying vec3 eye_pos;
+varying vec3 eye_normal;
+varying vec3 world_pos;
+varying vec3 world_normal;
+
+void main() {
+    vec4 vertex = gl_Vertex;
+    vec3 normal = gl_Normal;
+    gl_FrontColor = gl_Color;
+    if (instanced) {
+        // Same as glTranslatef(x, y, z); glRotatef(yaw, 0, 1, 0)
+        float yaw = radians(instance.w);
+        mat2 turn = mat2(cos(yaw), -sin(yaw), sin(yaw), cos(yaw));
+        vertex.xz = turn * vertex.xz;
+        vertex.xyz += instance.xyz;
+        normal.xz = turn * normal.xz;
+        gl_FrontColor = vec4(mix(gl_Color.rgb, instance_color, gl_Color.a), 1.0);
+    }
+    vec4 eye = gl_ModelViewMatrix * vertex;
+    eye_pos = eye.xyz;
+    eye_normal = normalize(gl_NormalMatrix * normal);
+    world_pos = (view_inverse * eye).xyz;
+    world_normal = mat3(view_inverse) * eye_normal;
+    gl_Position = gl_ProjectionMatrix * eye;
+}
+"""
+
+FRAGMENT_SHADER = """#version 120
+#define MAX_LIGHTS_PER_TILE %(max_per_tile)d
+#define LIGHT_ROW %(light_row)d.0
+uniform sampler2D light_data;   // xyz = position, w = radius
+uniform sampler2D tile_lights;  // light index + 1 per slot, 0 = empty
+uniform vec2 light_size;
+uniform vec2 grid_origin;
+uniform vec2 grid_dims;
+uniform float tile_size;
+uniform bool lit;
+varying vec3 eye_pos;
+varying vec3 eye_normal;
+varying vec3 world_pos;
+varying vec3 world_normal;
+
+void main() {
+    vec4 base = gl_Color;
+    if (!lit) {
+        gl_FragColor = base;
+        return;
+    }
+
+    // Camera light (LIGHT0) as set up by the fixed-function pipeline
+    vec3 n = normalize(eye_normal);
+    vec3 l0 = normalize(gl_LightSource[0].position.xyz - eye_pos);
+    vec3 light = gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb
+               + gl_LightSource[0].diffuse.rgb * max(dot(n, l0), 0.0);
+
+    // Suns affecting this fragment's tile
+    vec2 tile = floor((world_pos.xz - grid_origin) / tile_size);
+    if (all(greaterThanEqual(tile, vec2(0.0))) && all(lessThan(tile, grid_dims))) {
+        vec3 wn = normalize(world_normal);
+        for (int i = 0; i < MAX_LIGHTS_PER_TILE; i++) {
+            vec2 slot = vec2((tile.x * float(MAX_LIGHTS_PER_TILE) + float(i) + 0.5)
+                             / (grid_dims.x * float(MAX_LIGHTS_PER_TILE)),
+                             (tile.y + 0.5) / grid_dims.y);
+            float index = texture2D(tile_lights, slot).r - 1.0;
+            if (index < 0.0) {
+                break;
+            }
+            vec2 texel = vec2(mod(index, LIGHT_ROW) + 0.5, floor(index / LIGHT_ROW) + 0.5);
+            vec4 sun = texture2D(light_data, texel / light_size);
+            vec3 to_sun = sun.xyz - world_pos;
+            float dist = length(to_sun);
+            float falloff = clamp(1.0 - dist / sun.w, 0.0, 1.0);
+            falloff *= falloff;
+            light += falloff * (vec3(0.3, 0.25, 0.1)
+                                + vec3(1.0, 0.9, 0.5) * max(dot(wn, to_sun / max(dist, 0.001)), 0.0));
+        }
+    }
+
+    gl_FragColor = vec4(gl_FrontMaterial.emission.rgb + base.rgb * light, base.a);
+}
+"""
+
+# Lights per row of the light data texture
+LIGHT_ROW = 1024
+
+
+def _float_texture(data):
+    """Create a nearest-sampled RGBA32F texture from an (h, w, 4) array"""
+    texture = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F, data.shape[1], data.shape[0], 0,
+                 GL_RGBA, GL_FLOAT, np.ascontiguousarray(data, dtype=np.float32))
+    return texture
+
+
+def build_light_tiles(positions, radius, tile_size, max_per_tile):
+    """
+    Assign lights to world-space XZ tiles
+    Returns: (origin, dims, slots) where slots[tz, tx * max_per_tile + k] = light index + 1
+    """
+    xz = positions[:, [0, 2]]
+    origin = xz.min(axis=0) - radius
+    dims = np.maximum(np.ceil((xz.max(axis=0) + radius - origin) / tile_size), 1).astype(int)
+    slots = np.zeros((dims[1], dims[0] * max_per_tile), dtype=np.float32)
+
+    # (light, tile) pairs over the tiles each light's radius can reach, all lights at once
+    first = np.clip(np.floor((xz - radius - origin) / tile_size).astype(int), 0, dims - 1)
+    spans = np.clip(np.floor((xz + radius - origin) / tile_size).astype(int), 0, dims - 1) - first + 1
+    counts = spans[:, 0] * spans[:, 1]
+    lights = np.repeat(np.arange(len(xz)), counts)
+    local = np.arange(len(lights)) - np.repeat(np.cumsum(counts) - counts, counts)
+    tiles = first[lights] + np.stack([local % spans[lights, 0], local // spans[lights, 0]], axis=1)
+    lo = origin + tiles * tile_size
+    # Distance from each light to the tile rectangle
+    nearest = np.clip(xz[lights], lo, lo + tile_size)
+    reach = np.hypot(*(xz[lights] - nearest).T)
+    lights, tiles, lo = lights[reach < radius], tiles[reach < radius], lo[reach < radius]
+
+    # Nearest lights to the tile center win when a tile is crowded
+    center_distance = np.hypot(*(xz[lights] - (lo + tile_size / 2)).T)
+    tile_index = tiles[:, 1] * dims[0] + tiles[:, 0]
+    order = np.lexsort((center_distance, tile_index))
+    lights, tiles, tile_index = lights[order], tiles[order], tile_index[order]
+    rank = np.arange(len(order)) - np.searchsorted(tile_index, tile_index)
+    chosen = rank < max_per_tile
+    slots[tiles[chosen, 1], tiles[chosen, 0] * max_per_tile + rank[chosen]] = lights[chosen] + 1
+    return origin, dims, slots
+
+
+class SunLighting:
+    def __init__(self, resources):
+        """Shader lighting state; the program is compiled on first use"""
+        self.resources = resources
+        self.program = None
+        self.supported = True
+        self.positions = np.zeros((0, 3), dtype=np.float32)
+        self.dirty = True
+        self.light_texture = None
+        self.tile_texture = None
+        self.grid_origin = (0.0, 0.0)
+        self.grid_dims = (0, 0)
+        self.light_size = (1, 1)
+        self.uploads = 0
+        self.active = False
+
+    def set_lights(self, positions):
+        """Replace the sun positions; uploaded on the next begin() only if they changed"""
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        if positions.shape == self.positions.shape and np.array_equal(positions, self.positions):
+            return
+        self.positions = positions
+        self.dirty = True
+
+    def _compile(self):
+        """Compile the lighting program; disables the shader path on failure"""
+        try:
+            self.program = self.resources.acquire((self, 'program'), 'program', lambda: shaders.compileProgram(
+                shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(FRAGMENT_SHADER % {
+                    'max_per_tile': config.LIGHTS_PER_TILE,
+                    'light_row': LIGHT_ROW
+                }, GL_FRAGMENT_SHADER)
+            ))
+        except Exception as e:
+            print(f"⚠️ Shader lighting unavailable, using fixed-function lights: {e}")
+            self.program = None
+            self.supported = False
+
+    def _upload(self):
+        """Upload the light buffer and tile assignment textures"""
+        self._delete_textures()
+        count = len(self.positions)
+        if count:
+            rows = (count + LIGHT_ROW - 1) // LIGHT_ROW
+            width = min(count, LIGHT_ROW)
+            data = np.zeros((rows * width, 4), dtype=np.float32)
+            data[:count, :3] = self.positions
+            data[:count, 3] = config.SUN_LIGHT_RADIUS
+            self.light_texture = self.resources.acquire((self, 'lights'), 'texture',
+                                                        lambda: _float_texture(data.reshape(rows, width, 4)),
+                                                        data.nbytes)
+            self.light_size = (width, rows)
+
+            origin, dims, slots = build_light_tiles(
+                self.positions, config.SUN_LIGHT_RADIUS,
+                config.LIGHT_TILE_SIZE, config.LIGHTS_PER_TILE
+            )
+            tile_data = np.zeros(slots.shape + (4,), dtype=np.float32)
+            tile_data[..., 0] = slots
+            self.tile_texture = self.resources.acquire((self, 'tiles'), 'texture',
+                                                       lambda: _float_texture(tile_data), tile_data.nbytes)
+            self.grid_origin = tuple(origin)
+            self.grid_dims = tuple(dims)
+        else:
+            self.grid_dims = (0, 0)
+        self.dirty = False
+        self.uploads += 1
+
+    def begin(self):
+        """Bind the lighting program for lit scene geometry; False if unavailable"""
+        if not self.supported:
+            return False
+        if self.program is None:
+            self._compile()
+            if self.program is None:
+                return False
+        if self.dirty:
+            self._upload()
+
+        # Camera-to-world transform for world-space light positions
+        view = np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float32).reshape(4, 4).T
+        view_inverse = np.linalg.inv(view)
+
+        glUseProgram(self.program)
+        glUniformMatrix4fv(glGetUniformLocation(self.program, 'view_inverse'), 1, GL_TRUE, view_inverse)
+        glUniform2f(glGetUniformLocation(self.program, 'grid_origin'), *self.grid_origin)
+        glUniform2f(glGetUniformLocation(self.program, 'grid_dims'), *self.grid_dims)
+        glUniform2f(glGetUniformLocation(self.program, 'light_size'), *self.light_size)
+        glUniform1f(glGetUniformLocation(self.program, 'tile_size'), config.LIGHT_TILE_SIZE)
+        glUniform1i(glGetUniformLocation(self.program, 'lit'), 1)
+        glUniform1i(glGetUniformLocation(self.program, 'instanced'), 0)
+
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, self.light_texture or 0)
+        glActiveTexture(GL_TEXTURE2)
+        glBindTexture(GL_TEXTURE_2D, self.tile_texture or 0)
+        glActiveTexture(GL_TEXTURE0)
+        glUniform1i(glGetUniformLocation(self.program, 'light_data'), 1)
+        glUniform1i(glGetUniformLocation(self.program, 'tile_lights'), 2)
+        self.active = True
+        return True
+
+    def set_lit(self, lit):
+        """Switch lighting on/off for geometry drawn while the program is bound"""
+        if self.active:
+            glUniform1i(glGetUniformLocation(self.program, 'lit'), 1 if lit else 0)
+
+    def instance_attributes(self):
+        """Locations of the (instance, instance_color) attributes while bound, or None without instancing"""
+        if not self.active or not (bool(glDrawArraysInstanced) and bool(glVertexAttribDivisor)):
+            return None
+        locations = (glGetAttribLocation(self.program, 'instance'), glGetAttribLocation(self.program, 'instance_color'))
+        return None if min(locations) < 0 else locations
+
+    def set_instanced(self, instanced):
+        """Switch the per-instance transform on/off for geometry drawn while the program is bound"""
+        if self.active:
+            glUniform1i(glGetUniformLocation(self.program, 'instanced'), 1 if instanced else 0)
+
+    def end(self):
+        """Unbind the lighting program"""
+        glUseProgram(0)
+        self.active = False
+
+    def _delete_textures(self):
+        """Delete the light buffer and tile textures"""
+        if self.light_texture is not None:
+            self.resources.release((self, 'lights'))
+            self.light_texture = None
+        if self.tile_texture is not None:
+            self.resources.release((self, 'tiles'))
+            self.tile_texture = None
+
+    def release(self):
+        """Delete the program and light textures"""
+        self._delete_textures()
+        if self.program is not None:
+            self.resources.release((self, 'program'))
+            self.program = None
@@ -14,6 +14,8 @@ import sys
 import time
 from auth_manager import AuthManager
 import config
+from gpu_resources import GPUResources
+from render_cache import QuadricLOD
 
 # Import mediapipe with error handling
 try:
@@ -72,6 +74,8 @@ class HandBuilder3D:
         
         # Initialize OpenGL
         self._init_opengl()
+        self.gpu_resources = GPUResources(config.GPU_MEMORY_BUDGET_BYTES)
+        self.lod = QuadricLOD(self.gpu_resources, self.screen_height)
         
         # State variables
         self.cursor_pos = [0, 0, 0]
@@ -120,6 +124,8 @@ class HandBuilder3D:
         glEnable(GL_LIGHTING)
         glEnable(GL_LIGHT0)
         glEnable(GL_COLOR_MATERIAL)
+        # Scaled unit quadrics need their normals renormalized for lighting
+        glEnable(GL_NORMALIZE)
         glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
         
         # Lighting
@@ -447,10 +453,8 @@ class HandBuilder3D:
         glEnd()
     
     def draw_sphere(self, radius):
-        """Draw a solid sphere using GLU"""
-        quadric = gluNewQuadric()
-        gluSphere(quadric, radius, 32, 32)
-        gluDeleteQuadric(quadric)
+        """Draw a solid sphere using GLU (tessellation picked by distance)"""
+        self.lod.sphere(radius, 32, 32)
     
     def draw_blocks(self):
         """Draw all placed blocks"""
@@ -462,6 +466,7 @@ class HandBuilder3D:
             glRotatef(block['rotation'][2], 0, 0, 1)
             
             glColor3fv(block['color'])
+            self.lod.focus(block['position'])
             
             if block['type'] == 'cube':
                 size = block['size'][0] if len(block['size']) == 3 else block['size'][0]
@@ -492,8 +497,10 @@ class HandBuilder3D:
             cam_y = config.CAMERA_HEIGHT + math.sin(self.camera_rotation_x) * 5
             
             gluLookAt(cam_x, cam_y, cam_z, 0, 0, 0, 0, 1, 0)
+            self.lod.set_eye((cam_x, cam_y, cam_z))
         else:
             gluLookAt(0, config.CAMERA_HEIGHT, config.CAMERA_DISTANCE, 0, 0, 0, 0, 1, 0)
+            self.lod.set_eye((0, config.CAMERA_HEIGHT, config.CAMERA_DISTANCE))
         
         # Draw scene
         self.draw_grid()
@@ -859,6 +866,8 @@ class HandBuilder3D:
     
     def cleanup(self):
         """Cleanup resources"""
+        self.lod.release()
+        self.gpu_resources.release_all()
         self.cap.release()
         self.hands.close()
         pygame.quit()
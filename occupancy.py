@@ -0,0 +1,147 @@
+"""
+Grid occupancy for AI Hand Builder
+Spatial hash of snapped placement cells so placement, collision and removal are O(1)
+"""
+
+import math
+import numpy as np
+
+
+def _offsets(counts):
+    """Cell offsets of a footprint: centered on the box in x/z, stacked upwards from its bottom level"""
+    nx, ny, nz = counts
+    return [(dx, dy, dz)
+            for dx in range(-((nx - 1) // 2), nx // 2 + 1)
+            for dy in range(ny)
+            for dz in range(-((nz - 1) // 2), nz // 2 + 1)]
+
+
+class OccupancyGrid:
+    def __init__(self, grid_size):
+        """Empty hash of (x, height level, z) cells, each `grid_size` units wide"""
+        self.grid_size = grid_size
+        self.cells = {}         # cell -> object id
+        self.object_cells = {}  # object id -> cells it covers
+        self.footprints = {}
+
+    def cell_at(self, position):
+        """Cell containing a world position"""
+        # Round half up: round() ties to even, which merges neighbours at odd zone offsets
+        return (math.floor(position[0] / self.grid_size + 0.5),
+                math.floor(position[1] / self.grid_size + 0.5),
+                math.floor(position[2] / self.grid_size + 0.5))
+
+    def footprint(self, extents):
+        """Cells covered along x, height and z by an object of the given extents"""
+        key = tuple(extents)
+        counts = self.footprints.get(key)
+        if counts is None:
+            # Small overhangs (e.g. a 2.1 wide part on a 2.0 grid) do not claim a neighbour
+            counts = tuple(max(1, math.ceil(extent / self.grid_size - 0.1)) for extent in extents)
+            self.footprints[key] = counts
+        return counts
+
+    def cells_for(self, center, extents):
+        """Cells a snapped object's box (as returned by SceneStore.boxes) would cover"""
+        ix, level, iz = self.cell_at((center[0], center[1] - extents[1] / 2, center[2]))
+        return [(ix + dx, level + dy, iz + dz) for dx, dy, dz in _offsets(self.footprint(extents))]
+
+    def cells_for_many(self, centers, extents):
+        """Cells of many same-sized snapped boxes, as an (n, cells, 3) array"""
+        bottoms = np.array(centers, dtype=np.float64)
+        bottoms[:, 1] -= extents[1] / 2
+        base = np.floor(bottoms / self.grid_size + 0.5).astype(np.int64)
+        offsets = np.array(self.cells_for((0, extents[1] / 2, 0), extents), dtype=np.int64)
+        return base[:, None, :] + offsets[None, :, :]
+
+    def occupant(self, position):
+        """Id of the object covering a position's cell, or None"""
+        return self.cells.get(self.cell_at(position))
+
+    def blockers(self, cells):
+        """Ids of objects covering any of the cells"""
+        return {self.cells[cell] for cell in cells if cell in self.cells}
+
+    def blocked(self, cells_many):
+        """Per object of a cells_for_many() array: does any of its cells hold an object?"""
+        occupied = self.cells
+        return np.array([any(cell in occupied for cell in map(tuple, cells))
+                         for cells in cells_many.tolist()], dtype=bool)
+
+    def build(self, object_ids, centers, extents):
+        """Replace the contents with many snapped boxes at once, grouped by footprint"""
+        self.clear()
+        object_ids = np.asarray(object_ids, dtype=np.int64)
+        if len(object_ids) == 0:
+            return
+        centers = np.asarray(centers, dtype=np.float64)
+        extents = np.asarray(extents, dtype=np.float64)
+        # footprint() and cell_at() of every box at once
+        counts = np.maximum(1, np.ceil(extents / self.grid_size - 0.1)).astype(np.int64)
+        bottoms = centers.copy()
+        bottoms[:, 1] -= extents[:, 1] / 2
+        base = np.floor(bottoms / self.grid_size + 0.5).astype(np.int64)
+
+        # One integer per footprint shape: far cheaper to group than rows of counts
+        radix = int(counts.max()) + 1
+        keys, group = np.unique((counts[:, 0] * radix + counts[:, 1]) * radix + counts[:, 2], return_inverse=True)
+        for index, key in enumerate(keys.tolist()):
+            rows = np.flatnonzero(group == index)
+            offsets = np.array(_offsets((key // (radix * radix), key // radix % radix, key % radix)), dtype=np.int64)
+            flat = (base[rows][:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+            # Tuples zipped from per-axis lists avoid building a list per cell
+            cells = list(zip(*flat.T.tolist()))
+            step = len(offsets)
+            self.cells.update(zip(cells, np.repeat(object_ids[rows], step).tolist()))
+            self.object_cells.update(zip(object_ids[rows].tolist(),
+                                         (cells[i:i + step] for i in range(0, len(cells), step))))
+
+    def insert_many(self, object_ids, cells_many):
+        """Claim cells for many objects (a cells_for_many() array or lists of cells)"""
+        for object_id, cells in zip(np.asarray(object_ids).tolist(), cells_many):
+            cells = [tuple(cell) for cell in (cells.tolist() if hasattr(cells, 'tolist') else cells)]
+            self.insert(object_id, cells)
+
+    def insert(self, object_id, cells):
+        """Claim cells for an object (callers resolve blockers first)"""
+        for cell in cells:
+            self.cells[cell] = object_id
+        self.object_cells[object_id] = cells
+
+    def remove(self, object_id):
+        """Release an object's cells; False if it was not in the grid"""
+        cells = self.object_cells.pop(object_id, None)
+        if cells is None:
+            return False
+        for cell in cells:
+            if self.cells.get(cell) == object_id:
+                del self.cells[cell]
+        return True
+
+    def query_region(self, low, high):
+        """Ids of objects covering any cell in the inclusive box [low, high]"""
+        volume = 1
+        for lo, hi in zip(low, high):
+            volume *= max(hi - lo + 1, 0)
+
+        if volume <= len(self.cells):
+            found = set()
+            for x in range(low[0], high[0] + 1):
+                for y in range(low[1], high[1] + 1):
+                    for z in range(low[2], high[2] + 1):
+                        object_id = self.cells.get((x, y, z))
+                        if object_id is not None:
+                            found.add(object_id)
+            return found
+
+        # Region larger than the occupied set: scan what is there instead
+        return {object_id for cell, object_id in self.cells.items()
+                if all(lo <= c <= hi for c, lo, hi in zip(cell, low, high))}
+
+    def clear(self):
+        """Release every cell"""
+        self.cells.clear()
+        self.object_cells.clear()
+
+    def __contains__(self, object_id):
+        return object_id in self.object_cells
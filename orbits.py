@@ -0,0 +1,147 @@
+"""
+Orbital mechanics for AI Hand Builder
+Placed planets, moons, asteroids and comets orbit the nearest placed sun. State lives in
+NumPy arrays advanced by a leapfrog (kick-drift-kick) integrator on a fixed timestep,
+independent of the frame rate, and frames read positions interpolated between steps
+"""
+
+import numpy as np
+
+import config
+from scene_store import TYPE_SPHERE, ASSET_CODES
+
+
+SUN = ASSET_CODES[TYPE_SPHERE]['sun']
+COMET = ASSET_CODES[TYPE_SPHERE]['comet']
+ASTEROID = ASSET_CODES[TYPE_SPHERE]['asteroid']
+
+
+class OrbitSim:
+    def __init__(self, seed=0):
+        """Empty simulation; call rebuild() with a scene"""
+        self.rng = np.random.default_rng(seed)
+        self.enabled = False
+        self.time_scale = config.ORBIT_TIME_SCALE
+        self.accumulator = 0.0
+        self.sim_time = 0.0
+        self.body_mask = np.zeros(0, dtype=bool)
+        self.sun_ids = np.zeros(0, dtype=np.int64)
+        self.sun_positions = np.zeros((0, 3))
+        self.sun_mu = np.zeros(0)
+        self._set_bodies(np.zeros(0, dtype=np.int64), np.zeros((0, 3)), np.zeros(0, dtype=np.int64))
+
+    def _set_bodies(self, ids, positions, centers):
+        """Reset per-body state arrays"""
+        self.ids = ids
+        self.centers = centers   # Index into the sun arrays
+        self.positions = positions.copy()
+        self.previous = positions.copy()
+        self.velocities = np.zeros_like(positions)
+        self.accelerations = np.zeros_like(positions)
+        self.instances = positions.astype(np.float32)
+
+    def rebuild(self, scene):
+        """Re-read suns and bodies after the scene changed; bodies still circling the same sun keep their state"""
+        old_ids, old_suns = self.ids, self.sun_ids_of_bodies()
+        old_state = self.positions, self.previous, self.velocities
+
+        spheres = scene.ids()
+        spheres = spheres[scene.types[spheres] == TYPE_SPHERE]
+        is_sun = scene.assets[spheres] == SUN
+        suns = spheres[is_sun]
+        self.sun_ids = suns
+        self.sun_positions = scene.positions[suns].astype(np.float64)
+        # Mass grows with volume: a sun twice the configured radius pulls eight times as hard
+        radius = scene.sizes[suns, 0].astype(np.float64) / config.SOLAR_OBJECTS['sun']['radius']
+        self.sun_mu = config.ORBIT_GM * radius ** 3
+
+        ids = spheres[~is_sun] if len(suns) else np.zeros(0, dtype=np.int64)
+        positions = scene.positions[ids].astype(np.float64)
+        centers = np.zeros(len(ids), dtype=np.int64)
+        if len(ids):
+            offsets = positions[:, None, :] - self.sun_positions[None, :, :]
+            centers = np.einsum('ijk,ijk->ij', offsets, offsets).argmin(axis=1)
+
+        self._set_bodies(ids, positions, centers)
+        fresh = np.ones(len(ids), dtype=bool)
+        if len(old_ids) and len(ids):
+            found = np.searchsorted(old_ids, ids).clip(0, len(old_ids) - 1)
+            kept = (old_ids[found] == ids) & (old_suns[found] == suns[centers])
+            for current, previous in zip((self.positions, self.previous, self.velocities), old_state):
+                current[kept] = previous[found[kept]]
+            fresh = ~kept
+        self.velocities[fresh] = self._launch(np.flatnonzero(fresh), scene.assets[ids[fresh]])
+        self.accelerations = self._acceleration(self.positions)
+
+        self.body_mask = np.zeros(scene.capacity, dtype=bool)
+        self.body_mask[ids] = True
+        self._write_instances(1.0)
+
+    def sun_ids_of_bodies(self):
+        """Object id of the sun each body circles"""
+        return self.sun_ids[self.centers]
+
+    def _launch(self, rows, assets):
+        """Starting velocities: circular orbits in the plane of the placement's offset and the horizon"""
+        offset = self.positions[rows] - self.sun_positions[self.centers[rows]]
+        distance = np.linalg.norm(offset, axis=1)
+        tangent = np.cross(np.array([0.0, 1.0, 0.0]), offset)
+        # Bodies placed straight above or below their sun circle around the x axis instead
+        flat = np.linalg.norm(tangent, axis=1) < 1e-9
+        tangent[flat] = np.cross(np.array([1.0, 0.0, 0.0]), offset[flat])
+        tangent /= np.maximum(np.linalg.norm(tangent, axis=1), 1e-9)[:, None]
+        speed = np.sqrt(self.sun_mu[self.centers[rows]] / np.maximum(distance, config.ORBIT_SOFTENING))
+        # Comets start at the far end of a long ellipse; asteroids get a slightly irregular orbit
+        speed = np.where(assets == COMET, speed * config.COMET_SPEED_FACTOR, speed)
+        jitter = self.rng.uniform(0.9, 1.1, len(rows))
+        speed = np.where(assets == ASTEROID, speed * jitter, speed)
+        return tangent * speed[:, None]
+
+    def _acceleration(self, positions):
+        """Gravity of each body's sun (softened so bodies placed inside a sun stay finite)"""
+        offset = positions - self.sun_positions[self.centers]
+        distance2 = np.einsum('ij,ij->i', offset, offset) + config.ORBIT_SOFTENING ** 2
+        return offset * (-self.sun_mu[self.centers] / (distance2 * np.sqrt(distance2)))[:, None]
+
+    def advance(self, elapsed):
+        """Run the fixed steps that fit in `elapsed` real seconds (scaled) and refresh the instances"""
+        if not self.enabled or len(self.ids) == 0:
+            return 0
+        tick = config.ORBIT_TICK
+        self.accumulator = min(self.accumulator + elapsed * self.time_scale, tick * config.ORBIT_MAX_STEPS)
+        steps = 0
+        while self.accumulator >= tick:
+            self.step(tick)
+            self.accumulator -= tick
+            steps += 1
+        self._write_instances(self.accumulator / tick)
+        return steps
+
+    def step(self, dt):
+        """One kick-drift-kick leapfrog step (symplectic: orbits do not spiral in or out)"""
+        self.previous[:] = self.positions
+        self.velocities += self.accelerations * (dt / 2)
+        self.positions += self.velocities * dt
+        self.accelerations = self._acceleration(self.positions)
+        self.velocities += self.accelerations * (dt / 2)
+        self.sim_time += dt
+
+    def energy(self):
+        """Total specific orbital energy (kinetic + potential); stays bounded under leapfrog"""
+        offset = self.positions - self.sun_positions[self.centers]
+        distance = np.sqrt(np.einsum('ij,ij->i', offset, offset) + config.ORBIT_SOFTENING ** 2)
+        kinetic = 0.5 * np.einsum('ij,ij->i', self.velocities, self.velocities)
+        return float((kinetic - self.sun_mu[self.centers] / distance).sum())
+
+    def _write_instances(self, alpha):
+        """Body positions interpolated `alpha` of the way into the next step"""
+        self.instances = (self.previous + (self.positions - self.previous) * alpha).astype(np.float32)
+
+    def is_body(self, ids):
+        """Mask of the given object ids that the simulation draws (instead of their placed position)"""
+        if not self.enabled:
+            return np.zeros(len(ids), dtype=bool)
+        mask = np.zeros(len(ids), dtype=bool)
+        inside = ids < len(self.body_mask)
+        mask[inside] = self.body_mask[ids[inside]]
+        return mask
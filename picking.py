@@ -0,0 +1,369 @@
+"""
+Ray picking for AI Hand Builder
+Dynamic bounding-volume hierarchy over placed objects, refit incrementally as they change
+"""
+
+import math
+import numpy as np
+
+
+def _spread_bits(values):
+    """Interleave two zero bits after each of the low 21 bits of uint64 values"""
+    values = values & np.uint64(0x1fffff)
+    for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def morton_order(points):
+    """Order of (n, 3) points along a Z-order curve, so neighbours in the order are close in space"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if len(points) == 0:
+        return np.zeros(0, dtype=np.int64)
+    low = points.min(axis=0)
+    span = max(float((points.max(axis=0) - low).max()), 1e-9)
+    cells = ((points - low) * ((1 << 21) - 1) / span).astype(np.uint64)
+    codes = (_spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << np.uint64(1))
+             | (_spread_bits(cells[:, 2]) << np.uint64(2)))
+    return np.argsort(codes, kind='stable')
+
+
+def _union(low_a, high_a, low_b, high_b):
+    """Box enclosing two boxes"""
+    return ((min(low_a[0], low_b[0]), min(low_a[1], low_b[1]), min(low_a[2], low_b[2])),
+            (max(high_a[0], high_b[0]), max(high_a[1], high_b[1]), max(high_a[2], high_b[2])))
+
+
+def _area(low, high):
+    """Surface area of a box (cost metric for tree quality)"""
+    dx, dy, dz = high[0] - low[0], high[1] - low[1], high[2] - low[2]
+    return 2 * (dx * dy + dy * dz + dz * dx)
+
+
+def _slab(low, high, origin, inverse):
+    """Entry distance of a ray into a box, or None if it misses"""
+    t_near, t_far = 0.0, math.inf
+    for axis in range(3):
+        t1 = (low[axis] - origin[axis]) * inverse[axis]
+        t2 = (high[axis] - origin[axis]) * inverse[axis]
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_near:
+            t_near = t1
+        if t2 < t_far:
+            t_far = t2
+        if t_near > t_far:
+            return None
+    return t_near
+
+
+class BVH:
+    def __init__(self):
+        """Empty tree; nodes live in parallel lists indexed by node number"""
+        self.lows = []
+        self.highs = []
+        self.parents = []
+        self.children = []   # (left, right) for internal nodes, None for leaves
+        self.objects = []    # Object id for leaves
+        self.heights = []    # 0 for leaves
+        self.free_nodes = []
+        self.leaf_of = {}    # Object id -> leaf node
+        self.root = None
+
+    def _new_node(self, low, high, object_id=None):
+        """Allocate a node, reusing freed slots"""
+        if self.free_nodes:
+            node = self.free_nodes.pop()
+            self.lows[node], self.highs[node] = low, high
+            self.parents[node], self.children[node], self.objects[node] = None, None, object_id
+            self.heights[node] = 0
+            return node
+        self.lows.append(low)
+        self.highs.append(high)
+        self.parents.append(None)
+        self.children.append(None)
+        self.objects.append(object_id)
+        self.heights.append(0)
+        return len(self.lows) - 1
+
+    def _fit(self, node):
+        """Recompute an internal node's box and height from its children"""
+        left, right = self.children[node]
+        self.lows[node], self.highs[node] = _union(
+            self.lows[left], self.highs[left], self.lows[right], self.highs[right])
+        self.heights[node] = 1 + max(self.heights[left], self.heights[right])
+
+    def _rotate(self, node):
+        """Swap a child with a grandchild across the node when that shrinks the tree"""
+        left, right = self.children[node]
+        best_area, best_swap = 0.0, None
+        # Moving `child` down into `sibling` in place of grandchild `moved`, which comes up
+        for child, sibling in ((left, right), (right, left)):
+            grandchildren = self.children[sibling]
+            if grandchildren is None:
+                continue
+            current = _area(self.lows[sibling], self.highs[sibling])
+            for moved, kept in (grandchildren, grandchildren[::-1]):
+                area = _area(*_union(self.lows[child], self.highs[child],
+                                     self.lows[kept], self.highs[kept]))
+                if current - area > best_area:
+                    best_area, best_swap = current - area, (child, sibling, moved)
+        if best_swap is None:
+            return
+
+        child, sibling, moved = best_swap
+        self.children[node] = (moved, sibling) if left == child else (sibling, moved)
+        self.parents[moved] = node
+        first, second = self.children[sibling]
+        self.children[sibling] = (child, second) if first == moved else (first, child)
+        self.parents[child] = sibling
+        self._fit(sibling)
+        self._fit(node)
+
+    def _refit(self, node):
+        """Recompute boxes from a node up to the root, improving the tree on the way"""
+        while node is not None:
+            self._fit(node)
+            self._rotate(node)
+            node = self.parents[node]
+
+    def insert(self, object_id, low, high):
+        """Add an object's box, choosing the sibling that grows the tree least"""
+        leaf = self._new_node(tuple(low), tuple(high), object_id)
+        self.leaf_of[object_id] = leaf
+        self._insert_node(leaf)
+
+    def insert_many(self, object_ids, lows, highs):
+        """Add many boxes as one subtree built from the batch alone (no rebuild of the rest)"""
+        if len(object_ids) == 0:
+            return
+        if len(object_ids) >= len(self):
+            # A batch at least as large as the tree costs no more to rebuild together with it
+            leaves = list(self.leaf_of.items())
+            object_ids = np.concatenate([np.asarray(object_ids, dtype=np.int64),
+                                         np.array([object_id for object_id, _ in leaves], dtype=np.int64)])
+            lows = np.concatenate([np.asarray(lows, dtype=np.float64).reshape(-1, 3),
+                                   np.array([self.lows[leaf] for _, leaf in leaves]).reshape(-1, 3)])
+            highs = np.concatenate([np.asarray(highs, dtype=np.float64).reshape(-1, 3),
+                                    np.array([self.highs[leaf] for _, leaf in leaves]).reshape(-1, 3)])
+            self.build(object_ids, lows, highs)
+            return
+        self._insert_node(self._build_subtree(object_ids, lows, highs))
+
+    def _insert_node(self, leaf):
+        """Hang a leaf (or a whole subtree) where it grows the tree least"""
+        low, high = self.lows[leaf], self.highs[leaf]
+        if self.root is None:
+            self.root = leaf
+            return
+
+        # Descend while pushing the leaf further down is cheaper than pairing it here
+        node = self.root
+        while self.children[node] is not None:
+            area = _area(self.lows[node], self.highs[node])
+            combined = _area(*_union(self.lows[node], self.highs[node], low, high))
+            pair_cost = 2 * combined
+            inherited = 2 * (combined - area)
+
+            costs = []
+            for child in self.children[node]:
+                enlarged = _area(*_union(self.lows[child], self.highs[child], low, high))
+                if self.children[child] is None:
+                    costs.append(enlarged + inherited)
+                else:
+                    costs.append(enlarged - _area(self.lows[child], self.highs[child]) + inherited)
+            if pair_cost < min(costs):
+                break
+            node = self.children[node][0 if costs[0] <= costs[1] else 1]
+
+        # New parent joins the chosen sibling and the leaf
+        old_parent = self.parents[node]
+        parent = self._new_node(*_union(self.lows[node], self.highs[node], low, high))
+        self.parents[parent] = old_parent
+        self.children[parent] = (node, leaf)
+        self.parents[node] = parent
+        self.parents[leaf] = parent
+        if old_parent is None:
+            self.root = parent
+        else:
+            left, right = self.children[old_parent]
+            self.children[old_parent] = (parent, right) if left == node else (left, parent)
+        self._refit(parent)
+
+    def build(self, object_ids, lows, highs):
+        """Replace the tree with one bulk-loaded from the arrays (for loads)"""
+        self.clear()
+        if len(object_ids):
+            self.root = self._build_subtree(object_ids, lows, highs)
+
+    def _build_subtree(self, object_ids, lows, highs):
+        """
+        Build a detached subtree over new leaves; returns its root node
+        Leaves are ordered along a Z-order curve and the order is halved level by level, all in NumPy
+        """
+        object_ids = np.asarray(object_ids, dtype=np.int64)
+        lows = np.asarray(lows, dtype=np.float64).reshape(-1, 3)
+        highs = np.asarray(highs, dtype=np.float64).reshape(-1, 3)
+        count = len(object_ids)
+        order = morton_order((lows + highs) / 2)
+        object_ids, lows, highs = object_ids[order], lows[order], highs[order]
+
+        # Local node numbers: leaves 0..count-1 in curve order, then internal nodes level by level
+        total = 2 * count - 1
+        parents = np.full(total, -1, dtype=np.int64)
+        lefts = np.zeros(count - 1, dtype=np.int64)
+        rights = np.zeros(count - 1, dtype=np.int64)
+        levels = []
+        nodes = np.array([count], dtype=np.int64)
+        starts, stops = np.array([0]), np.array([count])
+        following = count + 1
+        while count > 1 and len(nodes):
+            levels.append(nodes)
+            middles = starts + (stops - starts) // 2
+            first = np.concatenate([starts, middles])
+            last = np.concatenate([middles, stops])
+            leaf = last - first == 1
+            inner = np.flatnonzero(~leaf)
+            children = first.copy()
+            children[inner] = following + np.arange(len(inner))
+            following += len(inner)
+            lefts[nodes - count] = children[:len(nodes)]
+            rights[nodes - count] = children[len(nodes):]
+            parents[children] = np.concatenate([nodes, nodes])
+            nodes, starts, stops = children[inner], first[inner], last[inner]
+
+        # Boxes and heights from the deepest level up
+        node_lows = np.concatenate([lows, np.zeros((count - 1, 3))])
+        node_highs = np.concatenate([highs, np.zeros((count - 1, 3))])
+        heights = np.zeros(total, dtype=np.int64)
+        for nodes in reversed(levels):
+            left, right = lefts[nodes - count], rights[nodes - count]
+            node_lows[nodes] = np.minimum(node_lows[left], node_lows[right])
+            node_highs[nodes] = np.maximum(node_highs[left], node_highs[right])
+            heights[nodes] = 1 + np.maximum(heights[left], heights[right])
+
+        # Append to the node lists (freed slots are left for later single inserts)
+        base = len(self.lows)
+        # Tuples zipped from per-axis lists: far cheaper than tolist() on (n, 3), which builds a list per row
+        self.lows.extend(zip(*node_lows.T.tolist()))
+        self.highs.extend(zip(*node_highs.T.tolist()))
+        self.parents.extend(parent + base if parent >= 0 else None for parent in parents.tolist())
+        self.children.extend([None] * count)
+        self.children.extend(zip((lefts + base).tolist(), (rights + base).tolist()))
+        self.objects.extend(object_ids.tolist())
+        self.objects.extend([None] * (count - 1))
+        self.heights.extend(heights.tolist())
+        self.leaf_of.update(zip(object_ids.tolist(), range(base, base + count)))
+        return base + count if count > 1 else base
+
+    def remove(self, object_id):
+        """Remove an object's leaf; its sibling takes the parent's place"""
+        leaf = self.leaf_of.pop(object_id, None)
+        if leaf is None:
+            return False
+        self.free_nodes.append(leaf)
+        parent = self.parents[leaf]
+        if parent is None:
+            self.root = None
+            return True
+
+        left, right = self.children[parent]
+        sibling = right if left == leaf else left
+        grandparent = self.parents[parent]
+        self.parents[sibling] = grandparent
+        self.free_nodes.append(parent)
+        if grandparent is None:
+            self.root = sibling
+        else:
+            left, right = self.children[grandparent]
+            self.children[grandparent] = (sibling, right) if left == parent else (left, sibling)
+            self._refit(grandparent)
+        return True
+
+    def remove_many(self, object_ids):
+        """Remove many leaves, then refit the ancestors they touched once each, deepest first"""
+        touched = set()
+        freed = set()
+        for object_id in np.asarray(object_ids).tolist():
+            leaf = self.leaf_of.pop(object_id, None)
+            if leaf is None:
+                continue
+            self.free_nodes.append(leaf)
+            parent = self.parents[leaf]
+            if parent is None:
+                self.root = None
+                continue
+            left, right = self.children[parent]
+            sibling = right if left == leaf else left
+            grandparent = self.parents[parent]
+            self.parents[sibling] = grandparent
+            self.free_nodes.append(parent)
+            freed.add(parent)
+            if grandparent is None:
+                self.root = sibling
+            else:
+                left, right = self.children[grandparent]
+                self.children[grandparent] = (sibling, right) if left == parent else (left, sibling)
+                touched.add(grandparent)
+
+        # Every touched node that is still in the tree, and its ancestors, need new boxes
+        depth = {}
+        for node in touched - freed:
+            path = []
+            while node is not None and node not in depth:
+                path.append(node)
+                node = self.parents[node]
+            level = depth[node] if node is not None else -1
+            for node in reversed(path):
+                level += 1
+                depth[node] = level
+        for node in sorted(depth, key=depth.get, reverse=True):
+            self._fit(node)
+
+    def update(self, object_id, low, high):
+        """Move an object's box"""
+        self.remove(object_id)
+        self.insert(object_id, low, high)
+
+    def clear(self):
+        """Remove every object"""
+        self.__init__()
+
+    def raycast(self, origin, direction, max_distance=math.inf):
+        """Nearest object hit by a ray as (object_id, distance), or None"""
+        if self.root is None:
+            return None
+        # Axis-parallel rays use a huge reciprocal instead of inf to avoid 0 * inf
+        inverse = tuple(1.0 / d if d != 0 else 1e30 for d in direction)
+        best_id, best_t = None, max_distance
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            t = _slab(self.lows[node], self.highs[node], origin, inverse)
+            if t is None or t >= best_t:
+                continue
+            children = self.children[node]
+            if children is None:
+                best_id, best_t = self.objects[node], t
+                continue
+            # Visit the nearer child first so farther subtrees are pruned by best_t
+            left, right = children
+            t_left = _slab(self.lows[left], self.highs[left], origin, inverse)
+            t_right = _slab(self.lows[right], self.highs[right], origin, inverse)
+            if t_left is not None and t_right is not None and t_left < t_right:
+                stack.append(right)
+                stack.append(left)
+            else:
+                if t_left is not None:
+                    stack.append(left)
+                if t_right is not None:
+                    stack.append(right)
+
+        if best_id is None:
+            return None
+        return best_id, best_t
+
+    def __len__(self):
+        return len(self.leaf_of)
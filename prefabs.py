@@ -0,0 +1,97 @@
+"""
+Prefabs for AI Hand Builder
+Captured groups of parts stored once (as small scene files) and placed as single instances
+that replay one shared display list through their transform
+"""
+
+import os
+from OpenGL.GL import *
+
+import scene_io
+from scene_store import SceneStore, ASSETS, TYPE_PREFAB
+
+
+class PrefabLibrary:
+    def __init__(self, resources, directory):
+        """Load the prefabs saved in `directory`; each slot name is a prefab asset"""
+        self.resources = resources
+        self.directory = directory
+        self.parts = {}   # name -> SceneStore of parts around the group's box center
+        for name in ASSETS[TYPE_PREFAB][1:]:
+            path = self.path(name)
+            if os.path.exists(path):
+                parts = SceneStore()
+                try:
+                    scene_io.load_scene(path, parts)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Ignoring damaged prefab {path}: {e}")
+                    continue
+                self.parts[name] = parts
+
+    def path(self, name):
+        """Scene file holding a prefab's parts"""
+        return os.path.join(self.directory, f"{name}.ahbs")
+
+    def names(self):
+        """Names of the defined prefabs, in slot order"""
+        return [name for name in ASSETS[TYPE_PREFAB][1:] if name in self.parts]
+
+    def free_slot(self):
+        """Name of the first unused prefab slot, or None if every slot is in use"""
+        free = [name for name in ASSETS[TYPE_PREFAB][1:] if name not in self.parts]
+        return free[0] if free else None
+
+    def capture(self, scene, ids, name):
+        """Store copies of the given objects as prefab `name`, replacing it if defined (OSError if unsaved)"""
+        parts = scene.subset(ids)
+        local = parts.ids()
+        # Parts are kept relative to the center of the group's bounding box
+        centers, half = parts.boxes(local)
+        low = (centers - half).min(axis=0)
+        high = (centers + half).max(axis=0)
+        parts.positions[local] -= (low + high) / 2
+
+        os.makedirs(self.directory, exist_ok=True)
+        scene_io.save_scene(self.path(name), parts)
+        self.parts[name] = parts
+        # A replaced prefab recompiles its geometry on the next draw
+        self.resources.discard(('prefab', name))
+
+    def delete(self, name):
+        """Forget a prefab and remove its file, freeing the slot (OSError if the file stays)"""
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(path)
+        self.parts.pop(name, None)
+        self.resources.discard(('prefab', name))
+
+    def extents(self, name):
+        """Bounding box size of a prefab (the size of its instances)"""
+        parts = self.parts[name]
+        ids = parts.ids()
+        centers, half = parts.boxes(ids)
+        return ((centers + half).max(axis=0) - (centers - half).min(axis=0)).tolist()
+
+    def offset(self, name):
+        """Instance center relative to the placement point (which takes the lowest part's center)"""
+        parts = self.parts[name]
+        return [0.0, -float(parts.positions[parts.ids(), 1].min()), 0.0]
+
+    def draw(self, name, draw_objects):
+        """Replay a prefab's merged geometry (compiled with draw_objects(parts, ids) on first use)"""
+        parts = self.parts.get(name)
+        if parts is None:
+            return False
+        key = ('prefab', name)
+        display_list = self.resources.get(key)
+        if display_list is None:
+            def compile_parts():
+                display_list = glGenLists(1)
+                glNewList(display_list, GL_COMPILE)
+                draw_objects(parts, parts.ids())
+                glEndList()
+                return display_list
+            # Rough size: a few hundred bytes of vertex data per part
+            display_list = self.resources.cache(key, 'display_list', compile_parts, len(parts) * 512)
+        glCallList(display_list)
+        return True
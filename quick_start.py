@@ -9,7 +9,10 @@ import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import ctypes
 import math
+import os
+import threading
 import time
 
 # Import mediapipe with error handling
@@ -26,6 +29,35 @@ except Exception as e:
     mp = MPNamespace()
 
 import config
+from gpu_resources import GPUResources
+from render_cache import QuadricLOD, BakedGeometry
+from camera_preview import CameraPreview
+from text_cache import TextCache, GlyphAtlas
+from ui_layer import UILayer
+from lighting import SunLighting
+from scene_store import SceneStore, ASSETS, ASSET_CODES, TYPE_CODES, ZONE_CODES, MODE_CODES, TYPE_BUILDING, TYPE_CITY, TYPE_SPHERE, TYPE_PREFAB, object_extents, object_lift, object_box, anchored_boxes, zone_codes_at, ZONES
+from occupancy import OccupancyGrid
+from broad_phase import BroadPhase
+from picking import BVH
+from snapping import MagneticSnap
+import scene_io
+from journal import Journal
+from zone_streaming import ZoneStreamer, zone_path
+from history import History
+from bulk_ops import SHAPES, fill_positions
+from prefabs import PrefabLibrary
+from city_generator import generate_city
+from traffic import TrafficSim, AGENTS, MESH_FLOATS, MESH_NORMAL, MESH_COLOR, agent_mesh, place_mesh
+from road_network import RoadNetwork
+from orbits import OrbitSim
+
+
+# Spatial indexes in the order a background rebuild publishes them (cheapest and most needed first)
+INDEXES = ('broad_phase', 'occupancy', 'bvh', 'magnet')
+
+# City assets the traffic simulation reads (roads and its agents)
+TRAFFIC_ASSETS = np.array([ASSET_CODES[TYPE_CITY][name] for name in ('road',) + AGENTS])
+
 
 class QuickStart3D:
     def __init__(self):
@@ -39,6 +71,10 @@ class QuickStart3D:
             min_tracking_confidence=0.4,
             model_complexity=1
         )
+        # Skeleton edges as a flat index array for glDrawElements
+        self.hand_connections = np.array(sorted(self.mp_hands.HAND_CONNECTIONS), dtype=np.uint32).ravel()
+        self.hand_landmarks = []
+        self.preview_status = ("NO HAND DETECTED", (255, 0, 0), "Show your hand to camera", (255, 255, 255))
         
         # Camera
         self.cap = cv2.VideoCapture(0)
@@ -59,6 +95,32 @@ class QuickStart3D:
         pygame.display.set_caption("AI Hand Builder - Quick Start")
         
         self._init_opengl()
+        # Every GL object below is created, shared and freed through one resource manager
+        self.gpu_resources = GPUResources(config.GPU_MEMORY_BUDGET_BYTES)
+        self.lod = QuadricLOD(self.gpu_resources, self.screen_height)
+        self.grid_geometry = BakedGeometry(self.gpu_resources, self._bake_grid)
+        self.camera_preview = CameraPreview(self.gpu_resources)
+        self.frame_id = 0       # Bumped for each new camera frame (the preview uploads once per id)
+        self.frame_stamp = None
+        self.text_cache = TextCache(self.gpu_resources)
+        self.glyph_atlas = GlyphAtlas(self.gpu_resources)
+        self.ui_layer = UILayer(self.gpu_resources, self.screen_width, self.screen_height)
+        self.zone_selector_layer = UILayer(self.gpu_resources, self.screen_width, self.screen_height)
+        self.sun_lighting = SunLighting(self.gpu_resources)
+        self.prefabs = PrefabLibrary(self.gpu_resources, config.PREFAB_DIR)
+        self.active_prefab = None   # While set, placing puts down an instance of this prefab
+        self.traffic = TrafficSim(self.grid_size)   # Cars/people on placed roads, toggled with T
+        self.traffic_version = None
+        self.traffic_inputs_version = 0     # Bumped when roads, cars or people change
+        self.agent_meshes = {}              # Agent kind -> mesh vertex array
+        self.traffic_buffer_bytes = 0
+        self.orbits = OrbitSim()   # Solar bodies circling placed suns, toggled with V
+        self.orbits_version = None
+        self.simulation_clock = time.time()
+        self.road_network = RoadNetwork()   # Which placed roads touch; kept up to date per edit
+        self.road_network_stale = False     # Set by bulk loads; rebuilt on first use
+        self.route_start = None
+        self.route = []
         
         # State
         self.cursor_pos = [0, 0, 0]
@@ -66,6 +128,7 @@ class QuickStart3D:
         self.current_size = 1.0
         self.last_pinch_time = 0
         self.is_pinching = False
+        self.is_select_pinching = False
         
         # Camera rotation and zoom
         self.camera_rotation_y = 0
@@ -96,7 +159,27 @@ class QuickStart3D:
         self.max_height_level = 10  # Maximum 10 levels (20 units high)
         self.show_placement_grid = True  # Show the placement grid
         
-        self.blocks = []
+        self.scene = SceneStore()
+        self.occupancy = OccupancyGrid(self.grid_size)  # Snapped cells -> object ids
+        self.occupied_policy = config.OCCUPIED_CELL_POLICY
+        self.broad_phase = BroadPhase()  # Boxes of every object, for free placement overlaps
+        self.bvh = BVH()  # Same boxes in a tree, for ray picking
+        self.magnet = MagneticSnap()  # Face attachment points, for magnetic snapping
+        self.magnet_snap = False
+        self.fill_shape = 'line'
+        self.fill_anchor = None
+        self.index_build = None  # (thread, result, ready events) of a background rebuild after a load
+        self.index_dirty = {}    # Index name -> objects changed since its rebuild began, until it is swapped in
+        self.selected_id = None
+        self.camera_eye = (0.0, 5.0, 12.0)
+        self.camera_target = (0.0, 0.0, 0.0)
+        self.scene_version = 0  # Bumped on every scene change (for cached UI)
+        
+        # Live index of light-emitting objects (kept in sync by place_block/clear_scene)
+        self.sun_ids = []
+        self.lights_version = 0
+        self.pushed_lights_version = None
+        self.uploaded_lights_version = None
         self.show_grid = True
         
         # UI
@@ -113,6 +196,23 @@ class QuickStart3D:
         self.hovered_button = None
         self._build_ui_buttons()
         
+        # Recover the scene left by the last session (snapshot + journal replay), then keep journaling
+        self.journal = Journal(config.JOURNAL_DIR, config.JOURNAL_COMPACT_OPS)
+        try:
+            recovered = self.journal.recover(lambda zone: zone_path(config.ZONE_STREAM_DIR, zone))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not recover the last scene: {e}")
+            recovered = None
+        if recovered is not None and len(recovered):
+            self.scene = recovered
+            self._scene_replaced()
+            print(f"♻️ Recovered {len(recovered)} objects from the last session")
+        # Zones streamed out last session stay on disk until the camera comes near them
+        self.streamer = ZoneStreamer(config.ZONE_STREAM_DIR, self.journal)
+        self.streamer.reconcile(self.scene)
+        self.journal.start(self.scene)
+        self.history = History(config.HISTORY_LIMIT)
+        
         print("\n" + "="*60)
         print("🚀 AI Hand Builder - Quick Start Mode")
         print("="*60)
@@ -129,6 +229,8 @@ class QuickStart3D:
         glEnable(GL_LIGHTING)
         glEnable(GL_LIGHT0)
         glEnable(GL_COLOR_MATERIAL)
+        # Quadric lists are unit size and scaled when drawn; keep their normals unit length
+        glEnable(GL_NORMALIZE)
         glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
         glLightfv(GL_LIGHT0, GL_POSITION, (10, 20, 10, 1))
         glLightfv(GL_LIGHT0, GL_AMBIENT, (0.6, 0.6, 0.6, 1))
@@ -155,10 +257,18 @@ class QuickStart3D:
         return frame
     
     def process_hand_tracking(self, frame):
-        enhanced_frame = self.enhance_image(frame.copy())
+        # enhance_image returns new arrays, so the camera frame itself is never modified
+        enhanced_frame = self.enhance_image(frame)
         rgb_frame = cv2.cvtColor(enhanced_frame, cv2.COLOR_BGR2RGB)
         results = self.hands.process(rgb_frame)
-        display_frame = frame.copy()
+        
+        # Landmarks are kept as arrays and drawn over the preview texture by OpenGL
+        self.hand_landmarks = []
+        if results.multi_hand_landmarks:
+            self.hand_landmarks = [
+                np.array([(lm.x, lm.y) for lm in hand.landmark], dtype=np.float32)
+                for hand in results.multi_hand_landmarks
+            ]
         
         if results.multi_hand_landmarks:
             num_hands = len(results.multi_hand_landmarks)
@@ -188,30 +298,13 @@ class QuickStart3D:
                     self.target_camera_distance = max(5, min(25, self.target_camera_distance))
                 self.last_hand_distance = hand_distance
                 
-                for hand_landmarks in results.multi_hand_landmarks:
-                    self.mp_draw.draw_landmarks(
-                        display_frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS,
-                        self.mp_draw.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=4),
-                        self.mp_draw.DrawingSpec(color=(0, 255, 255), thickness=2)
-                    )
                 zoom_pct = int((25 - self.target_camera_distance) / 20 * 100)
-                cv2.putText(display_frame, "ROTATE & ZOOM MODE", (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(display_frame, f"Zoom: {zoom_pct}%", (10, 60), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+                self.preview_status = ("ROTATE & ZOOM MODE", (0, 255, 0), f"Zoom: {zoom_pct}%", (0, 255, 255))
             
             elif num_hands == 1:
                 self.is_rotating_camera = False
                 landmarks = results.multi_hand_landmarks[0]
-                self.mp_draw.draw_landmarks(
-                    display_frame, landmarks, self.mp_hands.HAND_CONNECTIONS,
-                    self.mp_draw.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=4),
-                    self.mp_draw.DrawingSpec(color=(0, 255, 255), thickness=2)
-                )
-                cv2.putText(display_frame, "HAND DETECTED", (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(display_frame, f"Conf: {self.detection_confidence:.2f}", (10, 60), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+                self.preview_status = ("HAND DETECTED", (0, 255, 0), f"Conf: {self.detection_confidence:.2f}", (0, 255, 255))
                 
                 index_tip = landmarks.landmark[8]
                 # Expanded movement range: X and Z axes cover full zone (±15 units)
@@ -241,19 +334,26 @@ class QuickStart3D:
                         self.is_pinching = True
                 else:
                     self.is_pinching = False
+                
+                # Thumb + middle finger pinch selects the object under the hand cursor
+                middle_tip = landmarks.landmark[12]
+                select_dist = math.hypot(middle_tip.x - thumb_x, middle_tip.y - thumb_y)
+                if select_dist < 0.05 and pinch_dist >= 0.05:
+                    if not self.is_select_pinching:
+                        self.select_with_ray(self._cursor_ray())
+                        self.is_select_pinching = True
+                else:
+                    self.is_select_pinching = False
         else:
             self.is_rotating_camera = False
             self.detection_confidence = 0
             self.last_hand_distance = None
-            cv2.putText(display_frame, "NO HAND DETECTED", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            cv2.putText(display_frame, "Show your hand to camera", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            self.preview_status = ("NO HAND DETECTED", (255, 0, 0), "Show your hand to camera", (255, 255, 255))
         
-        return display_frame
+        return frame
     
-    def place_block(self):
-        # Get snapped position if grid is enabled
+    def _cursor_world_position(self):
+        """Placement position under the cursor (snapped if enabled), in world space"""
         if self.snap_to_grid:
             snapped_x = round(self.cursor_pos[0] / self.grid_size) * self.grid_size
             snapped_z = round(self.cursor_pos[2] / self.grid_size) * self.grid_size
@@ -264,41 +364,71 @@ class QuickStart3D:
             snapped_y = self.cursor_pos[1]
         
         # Apply zone offset to placement position
-        adjusted_pos = [
+        position = [
             snapped_x + self.zone_offset[0],
             snapped_y + self.zone_offset[1],
             snapped_z + self.zone_offset[2]
         ]
-        block_data = {'position': adjusted_pos, 'mode': self.build_mode, 'rotation': [0, 0, 0], 'zone': self.current_zone}
         
-        if self.build_mode == 'free':
-            block_data['size'] = [self.current_size] * 3
-            block_data['color'] = self.current_color.copy()
-            block_data['type'] = 'cube'
-            block_data['asset_type'] = None
-        elif self.build_mode == 'building':
+        # Magnetic snap: put the new object flush against the nearest face of a placed one
+        if self.magnet_snap and self._indexes_ready('magnet'):
+            hit = self.magnet.nearest([self.cursor_pos[0] + self.zone_offset[0], snapped_y + self.zone_offset[1],
+                                       self.cursor_pos[2] + self.zone_offset[2]], config.MAGNET_SNAP_RADIUS)
+            if hit is not None:
+                point, normal = hit
+                size, _, block_type, asset = self._current_object()
+                extents = object_extents(block_type, size)
+                position = [p + n * e / 2 for p, n, e in zip(point, normal, extents)]
+                # That is where the box center goes; base-anchored parts sit half their height lower
+                position[1] -= object_lift(block_type, asset) * extents[1]
+        return position
+    
+    def _current_object(self):
+        """(size, color, type, asset) of what the current build mode places"""
+        if self.active_prefab is not None:
+            return self.prefabs.extents(self.active_prefab), (1, 1, 1), 'prefab', self.active_prefab
+        if self.build_mode == 'building':
             part = config.BUILDING_PARTS[self.selected_building_part]
-            block_data['size'] = list(part['size'])
-            block_data['color'] = list(part['color'])
-            block_data['type'] = 'building'
-            block_data['asset_type'] = self.selected_building_part
-        elif self.build_mode == 'city':
-            asset = config.CITY_ASSETS[self.selected_city_asset]
-            block_data['size'] = list(asset['size'])
-            block_data['color'] = list(asset['color'])
-            block_data['type'] = 'city'
-            block_data['asset_type'] = self.selected_city_asset
-        elif self.build_mode == 'solar':
+            return part['size'], part['color'], 'building', self.selected_building_part
+        if self.build_mode == 'city':
+            asset_data = config.CITY_ASSETS[self.selected_city_asset]
+            return asset_data['size'], asset_data['color'], 'city', self.selected_city_asset
+        if self.build_mode == 'solar':
             obj = config.SOLAR_OBJECTS[self.selected_solar_object]
-            block_data['size'] = [obj['radius']]
-            block_data['color'] = list(obj['color'])
-            block_data['type'] = 'sphere'
-            block_data['asset_type'] = None
-        
-        self.blocks.append(block_data)
+            return [obj['radius']] * 3, obj['color'], 'sphere', self.selected_solar_object
+        return [self.current_size] * 3, self.current_color, 'cube', None
+    
+    def place_block(self):
+        if not self._zone_ready():
+            return
+        adjusted_pos = self._cursor_world_position()
+        size, color, block_type, asset = self._current_object()
+        if block_type == 'prefab':
+            adjusted_pos = [p + o for p, o in zip(adjusted_pos, self.prefabs.offset(asset))]
+        
+        # Replaced blockers and the new object undo as one step
+        self.history.begin()
+        claimed = self._claim_space(adjusted_pos, block_type, asset, size)
+        if claimed is None:
+            self.history.end(self.scene)
+            return
+        adjusted_pos, cells = claimed
+        
+        object_id = self.scene.add(adjusted_pos, size, color, block_type, asset,
+                                   self.current_zone, self.build_mode, cells is not None)
+        self.scene_version += 1
+        self._index_object(object_id, cells)
+        self.journal.added(self.scene, object_id)
+        self.history.record(self.scene, ('add', np.array([object_id])))
+        self.history.end(self.scene)
+        if block_type == 'city' and asset == 'sun':
+            self.sun_ids.append(object_id)
+            self.lights_version += 1
         
         # Print placement message
-        if self.build_mode == 'building':
+        if block_type == 'prefab':
+            print(f"✅ Placed {asset} ({len(self.prefabs.parts[asset])} parts, one instance)")
+        elif self.build_mode == 'building':
             print(f"✅ Placed {config.BUILDING_PARTS[self.selected_building_part]['name']}")
         elif self.build_mode == 'city':
             asset_name = config.CITY_ASSETS[self.selected_city_asset]['name']
@@ -306,7 +436,811 @@ class QuickStart3D:
             if self.selected_city_asset == 'sun':
                 print("   ☀️ Sun will emit dynamic lighting!")
         else:
-            print(f"✅ Placed {block_data['type']}")
+            print(f"✅ Placed {block_type}")
+    
+    def _zone_ready(self, zones=None):
+        """False (with a message) while the current zone (or any of `zones`) is still streaming in"""
+        loading = [zone for zone in (zones or [self.current_zone]) if not self.streamer.is_resident(zone)]
+        if not loading:
+            return True
+        for zone in loading:
+            self.streamer.request(zone)
+        names = ', '.join(config.ZONES[zone]['name'] for zone in loading)
+        print(f"⏳ {names} {'is' if len(loading) == 1 else 'are'} still loading - try again in a moment")
+        return False
+    
+    def _claim_space(self, position, block_type, asset, size):
+        """Apply the overlap policies at a position; returns (position, cells) or None if rejected"""
+        center, extents = object_box(block_type, asset, position, size)
+        self._ensure_indexes('occupancy', 'broad_phase')
+        
+        # Snapped placements claim grid cells; an occupied cell is rejected or replaced
+        cells = None
+        if self.snap_to_grid:
+            cells = self.occupancy.cells_for(center, extents)
+            blockers = self.occupancy.blockers(cells)
+            if blockers:
+                if self.occupied_policy == 'reject':
+                    print("⛔ Cell occupied - erase it first (X) or switch to replace (O)")
+                    return None
+                for blocker in blockers:
+                    self.remove_object(blocker)
+        
+        # Free placements are checked against every object's box instead
+        half_extents = [extent / 2 for extent in extents]
+        if not self.snap_to_grid and config.FREE_OVERLAP_POLICY != 'allow':
+            if self.broad_phase.query(center, half_extents):
+                if config.FREE_OVERLAP_POLICY == 'push':
+                    pushed = self.broad_phase.push_out(center, half_extents)
+                    if pushed is not None:
+                        # Back from the box center to the object's own anchor
+                        position = [pushed[0], pushed[1] - (center[1] - position[1]), pushed[2]]
+                    center = pushed
+                if config.FREE_OVERLAP_POLICY == 'reject' or center is None:
+                    print("⛔ Overlaps another object - move the cursor and try again")
+                    return None
+        return position, cells
+    
+    def _index_object(self, object_id, cells):
+        """Register a stored object's cells and box with the spatial indexes"""
+        self._roads_added(np.array([object_id]))
+        self._refresh_traffic(np.array([object_id]))
+        self._mark_dirty([object_id])
+        live = self._live_indexes()
+        if cells is not None and 'occupancy' in live:
+            self.occupancy.insert(object_id, cells)
+        centers, half = self.scene.boxes([object_id])
+        center, half_extents = centers[0], half[0]
+        if 'broad_phase' in live:
+            self.broad_phase.insert(object_id, center, half_extents)
+        if 'bvh' in live:
+            self.bvh.insert(object_id, (center - half_extents).tolist(), (center + half_extents).tolist())
+        if 'magnet' in live:
+            self.magnet.add(object_id, center.tolist(), half_extents.tolist())
+    
+    def _unindex_object(self, object_id):
+        """Drop an object from the spatial indexes"""
+        self._roads_removed(np.array([object_id]))
+        self._refresh_traffic(np.array([object_id]))
+        self._mark_dirty([object_id])
+        self._drop_indexes(np.array([object_id]), self._live_indexes())
+    
+    def _index_stored(self, object_id):
+        """Register an object already in the store with the spatial indexes"""
+        centers, half = self.scene.boxes([object_id])
+        cells = self.occupancy.cells_for(centers[0].tolist(), (half[0] * 2).tolist()) if self.scene.snapped[object_id] else None
+        self._index_object(object_id, cells)
+    
+    def _index_many(self, ids, cells_many=None):
+        """Register many stored objects with the spatial indexes in one batch"""
+        self._roads_added(ids)
+        self._refresh_traffic(ids)
+        self._mark_dirty(ids.tolist())
+        self._insert_indexes(ids, cells_many, self._live_indexes())
+    
+    def _unindex_many(self, ids):
+        """Take many removed objects out of the road network and spatial indexes"""
+        if len(ids) <= config.BULK_REINDEX:
+            for object_id in ids.tolist():
+                self._unindex_object(object_id)
+            return
+        self._roads_removed(ids)
+        self._refresh_traffic(ids)
+        self._mark_dirty(ids.tolist())
+        self._drop_indexes(ids, self._live_indexes())
+    
+    def _live_indexes(self):
+        """Names of the spatial indexes that match the scene (not waiting for a background rebuild)"""
+        return [name for name in INDEXES if name not in self.index_dirty]
+    
+    def _mark_dirty(self, ids):
+        """Remember changed objects for the indexes still rebuilding; each replays them when swapped in"""
+        for dirty in self.index_dirty.values():
+            dirty.update(ids)
+    
+    def _insert_indexes(self, ids, cells_many=None, names=INDEXES):
+        """Add stored objects' cells and boxes to the named spatial indexes"""
+        centers, half = self.scene.boxes(ids)
+        if 'occupancy' in names:
+            if cells_many is None:
+                snapped = self.scene.snapped[ids]
+                cells_many = [self.occupancy.cells_for(center, extents) for center, extents
+                              in zip(centers[snapped].tolist(), (half[snapped] * 2).tolist())]
+                self.occupancy.insert_many(ids[snapped], cells_many)
+            else:
+                self.occupancy.insert_many(ids, cells_many)
+        if 'broad_phase' in names:
+            self.broad_phase.insert_many(ids, centers, half)
+        
+        if len(ids) > config.BULK_REINDEX:
+            # The batch is indexed on its own (a BVH subtree, a snap segment); the rest stays as it is
+            if 'bvh' in names:
+                self.bvh.insert_many(ids, centers - half, centers + half)
+            if 'magnet' in names:
+                self.magnet.add_many(ids, centers, half)
+            return
+        for object_id, low, high, center, object_half in zip(
+                ids.tolist(), (centers - half).tolist(), (centers + half).tolist(),
+                centers.tolist(), half.tolist()):
+            if 'bvh' in names:
+                self.bvh.insert(object_id, low, high)
+            if 'magnet' in names:
+                self.magnet.add(object_id, center, object_half)
+    
+    def _drop_indexes(self, ids, names=INDEXES):
+        """Take many objects out of the named spatial indexes"""
+        for object_id in ids.tolist():
+            if 'occupancy' in names:
+                self.occupancy.remove(object_id)
+            if 'magnet' in names:
+                self.magnet.remove(object_id)
+        if 'broad_phase' in names:
+            self.broad_phase.remove_many(ids)
+        if 'bvh' in names:
+            self.bvh.remove_many(ids)
+    
+    def _road_ids(self, ids):
+        """The road tiles among the given object ids"""
+        roads = self.scene.types[ids] == TYPE_CITY
+        roads &= self.scene.assets[ids] == ASSET_CODES[TYPE_CITY]['road']
+        return ids[roads]
+    
+    def _roads_added(self, ids):
+        """Connect newly placed (or restored) road tiles into the road network"""
+        if self.road_network_stale:
+            return
+        roads = self._road_ids(ids)
+        centers, half = self.scene.boxes(roads)
+        for road_id, center, extents in zip(roads.tolist(), centers.tolist(), (half * 2).tolist()):
+            cells = {(x, z) for x, _, z in self.occupancy.cells_for(center, extents)}
+            self.road_network.add(road_id, cells, (center[0], center[2]))
+    
+    def _roads_removed(self, ids):
+        """Take removed road tiles out of the road network"""
+        if self.road_network_stale:
+            return
+        for road_id in self._road_ids(ids).tolist():
+            self.road_network.remove(road_id)
+    
+    def _ensure_road_network(self):
+        """Rebuild the road network from the scene store after a load"""
+        if not self.road_network_stale:
+            return
+        self.road_network.clear()
+        self.road_network_stale = False
+        self._roads_added(self.scene.ids())
+    
+    def _build_index(self, name, ids, centers, half, snapped):
+        """A fresh spatial index over objects given as arrays"""
+        if name == 'occupancy':
+            index = OccupancyGrid(self.grid_size)
+            index.build(ids[snapped], centers[snapped], half[snapped] * 2)
+        elif name == 'broad_phase':
+            index = BroadPhase()
+            index.build(ids, centers, half)
+        elif name == 'bvh':
+            index = BVH()
+            index.build(ids, centers - half, centers + half)
+        else:
+            index = MagneticSnap()
+            index.build(ids, centers, half)
+        return index
+    
+    def _start_index_build(self):
+        """Rebuild every spatial index from a copy of the store's columns on a background thread"""
+        ids = self.scene.ids()
+        centers, half = self.scene.boxes(ids)
+        snapped = self.scene.snapped[ids]
+        result = {}
+        ready = {name: threading.Event() for name in INDEXES}
+        
+        def build():
+            try:
+                # Each index is published as soon as it is built, so edits wait only for the ones they use
+                for name in INDEXES:
+                    result[name] = self._build_index(name, ids, centers, half, snapped)
+                    ready[name].set()
+            finally:
+                for event in ready.values():
+                    event.set()
+        thread = threading.Thread(target=build, daemon=True)
+        # The old indexes describe the previous scene; let their memory go while the new ones build
+        self.occupancy = OccupancyGrid(self.grid_size)
+        self.broad_phase, self.bvh, self.magnet = BroadPhase(), BVH(), MagneticSnap()
+        # Objects changed from here on are replayed into each index when it is swapped in
+        self.index_build = (thread, result, ready)
+        self.index_dirty = {name: set() for name in INDEXES}
+        thread.start()
+    
+    def _swap_index(self, name):
+        """Swap in one finished index and bring the objects changed meanwhile up to date"""
+        index = self.index_build[1].get(name)
+        if index is None:
+            # The thread failed (its error was printed); build here instead
+            ids = self.scene.ids()
+            centers, half = self.scene.boxes(ids)
+            index = self._build_index(name, ids, centers, half, self.scene.snapped[ids])
+        setattr(self, name, index)
+        dirty = np.array(sorted(self.index_dirty.pop(name)), dtype=np.int64)
+        self._drop_indexes(dirty, (name,))
+        self._insert_indexes(dirty[self.scene.alive[dirty]], names=(name,))
+        if not self.index_dirty:
+            self.index_build = None
+    
+    def _indexes_ready(self, *names):
+        """True once the named spatial indexes (default all) match the scene; swaps in finished ones without waiting"""
+        for name in list(self.index_dirty):
+            if self.index_build[2][name].is_set():
+                self._swap_index(name)
+        return not any(name in self.index_dirty for name in names or INDEXES)
+    
+    def _ensure_indexes(self, *names):
+        """Wait for the named spatial indexes (default all), which rebuild in the background after a load"""
+        for name in names or INDEXES:
+            if name in self.index_dirty:
+                self.index_build[2][name].wait()
+                self._swap_index(name)
+    
+    def save_scene(self, path=config.SCENE_FILE):
+        """Write the scene to a binary scene file"""
+        if self.streamer.on_disk:
+            # Streamed-out zones are merged in from their files on the background writer
+            self.streamer.save_all(self.scene, path)
+            print(f"💾 Saving to {path} in the background...")
+            return
+        start = time.time()
+        try:
+            count = len(scene_io.save_scene(path, self.scene))
+        except OSError as e:
+            print(f"❌ Could not save {path}: {e}")
+            return
+        print(f"💾 Saved {count} objects to {path} ({(time.time() - start) * 1000:.0f} ms)")
+    
+    def load_scene(self, path=config.SCENE_FILE):
+        """Replace the scene (streamed-out zones included) with a binary scene file; clears the undo history"""
+        if not os.path.exists(path):
+            print(f"⚠️ No saved scene at {path}")
+            return
+        start = time.time()
+        # Load into a fresh store so a bad file leaves the current scene untouched
+        scene = SceneStore()
+        try:
+            ids = scene_io.load_scene(path, scene)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not load {path}: {e}")
+            return
+        self.history.clear()
+        self.scene = scene
+        self._scene_replaced()
+        self.streamer.discard_all()
+        self.journal.compact(self.scene)
+        print(f"📂 Loaded {len(ids)} objects from {path} ({(time.time() - start) * 1000:.0f} ms)")
+    
+    def _scene_replaced(self):
+        """Refresh derived state after the whole scene changed at once"""
+        self.selected_id = None
+        self.sun_ids = self.scene.ids_of('city', 'sun').tolist()
+        self.scene_version += 1
+        self.lights_version += 1
+        self.traffic_inputs_version += 1
+        self._start_index_build()
+        self.road_network_stale = True
+        self.route_start = None
+        self.route = []
+    
+    def stream_zones(self):
+        """Merge zones that finished loading and evict the ones far from the camera"""
+        merged = self.streamer.poll(self.scene)
+        evicted = self.streamer.update(self.scene, (self.camera_eye[0], self.camera_eye[2]), self.current_zone)
+        # Only the streamed objects are (un)indexed; undo steps keep placeholders for them while they are on disk
+        for zone, ids in merged:
+            self.history.unstash(zone, ids)
+            self._index_many(ids)
+            self._refresh_suns(ids)
+        for zone, ids in evicted:
+            self.history.stash(zone, ids)
+            self._unindex_many(ids)
+            self._refresh_suns(ids)
+        if merged or evicted:
+            if self.selected_id is not None and not self.scene.alive[self.selected_id]:
+                self.selected_id = None
+            self.scene_version += 1
+    
+    def update_simulations(self):
+        """Advance traffic and orbits by the real time since the last frame (each on its own fixed step)"""
+        now = time.time()
+        elapsed, self.simulation_clock = now - self.simulation_clock, now
+        if self.traffic.enabled:
+            # Only edits to roads, cars or people change what the simulation reads
+            if self.traffic_version != self.traffic_inputs_version:
+                self.traffic.rebuild(self.scene)
+                self.traffic_version = self.traffic_inputs_version
+            self.traffic.advance(elapsed)
+        if self.orbits.enabled:
+            if self.orbits_version != self.scene_version:
+                self.orbits.rebuild(self.scene)
+                self.orbits_version = self.scene_version
+            self.orbits.advance(elapsed)
+    
+    def toggle_traffic(self):
+        """Start or stop cars and people moving; stopped agents go back to where they were placed"""
+        self.traffic.enabled = not self.traffic.enabled
+        self.traffic_version = None
+        if self.traffic.enabled:
+            self.update_simulations()
+            cars, people = self.traffic.counts()
+            print(f"🚦 Traffic: ON ({cars} cars on roads, {people} people on sidewalks)")
+        else:
+            print("🚦 Traffic: OFF")
+    
+    def toggle_orbits(self):
+        """Start or stop solar bodies orbiting; stopped bodies go back to where they were placed"""
+        self.orbits.enabled = not self.orbits.enabled
+        self.orbits_version = None
+        if self.orbits.enabled:
+            self.update_simulations()
+            if not len(self.orbits.sun_ids):
+                print("🪐 Orbits: ON - place a sun in Solar mode for bodies to circle")
+            else:
+                print(f"🪐 Orbits: ON ({len(self.orbits.ids)} bodies around {len(self.orbits.sun_ids)} suns)")
+        else:
+            print("🪐 Orbits: OFF")
+    
+    def scale_orbit_time(self, factor):
+        """Speed up or slow down simulated time (the frame rate is unaffected)"""
+        self.orbits.time_scale = min(max(self.orbits.time_scale * factor, 1 / 16), 64)
+        print(f"⏩ Orbit Time: {self.orbits.time_scale:g}x")
+    
+    def remove_object(self, object_id):
+        """Remove one placed object (undoably) and drop it from every index"""
+        if not self.scene.alive[object_id]:
+            return False
+        ids = np.array([object_id])
+        self._remove_objects(ids)
+        self.journal.removed(self.scene, object_id)
+        self.history.record(self.scene, ('remove', ids))
+        return True
+    
+    def _remove_objects(self, ids):
+        """Remove objects from the store and indexes, keeping their slots for undo"""
+        self.scene.remove_many(ids, retain=True)
+        self._unindex_many(ids)
+        if self.selected_id is not None and not self.scene.alive[self.selected_id]:
+            self.selected_id = None
+        self.scene_version += 1
+        self._refresh_suns(ids)
+    
+    def _restore_objects(self, ids):
+        """Bring removed objects back into the store and indexes"""
+        self.scene.restore(ids)
+        self._index_many(ids)
+        self.scene_version += 1
+        self._refresh_suns(ids)
+    
+    def _refresh_suns(self, ids):
+        """Update the sun index if any of the changed objects is a sun"""
+        suns = self.scene.types[ids] == TYPE_CITY
+        suns &= self.scene.assets[ids] == ASSET_CODES[TYPE_CITY]['sun']
+        if suns.any():
+            self.sun_ids = self.scene.ids_of('city', 'sun').tolist()
+            self.lights_version += 1
+    
+    def _refresh_traffic(self, ids):
+        """Mark the traffic simulation for a rebuild if any of the changed objects is a road, car or person"""
+        traffic = self.scene.types[ids] == TYPE_CITY
+        traffic &= np.isin(self.scene.assets[ids], TRAFFIC_ASSETS)
+        if traffic.any():
+            self.traffic_inputs_version += 1
+    
+    def _place_stored(self, object_id, position, zone, snapped):
+        """Move a stored object to a placement and re-index it"""
+        self._unindex_object(object_id)
+        self.scene.move(object_id, position, zone, snapped)
+        self._index_stored(object_id)
+        self.journal.moved(self.scene, object_id)
+        self.scene_version += 1
+        if object_id in self.sun_ids:
+            self.lights_version += 1
+    
+    def _apply(self, op, forward):
+        """Apply a history operation (forward = redo) with incremental index updates"""
+        if op[0] == 'move':
+            _, object_id, before, after = op
+            self._place_stored(object_id, *(after if forward else before))
+            return
+        ids = op[1]
+        if (op[0] == 'add') == forward:
+            self._restore_objects(ids)
+            self.journal.added_many(self.scene, ids)
+        else:
+            self._remove_objects(ids)
+            self.journal.removed_many(self.scene, ids)
+    
+    def _step_ready(self, steps):
+        """False (with a message) while the next step needs objects of zones that are streamed out"""
+        zones = self.history.waiting_for(steps[-1]) if steps else []
+        if not zones:
+            return True
+        for zone in zones:
+            self.streamer.request(zone)
+        names = ", ".join(config.ZONES[zone]['name'] for zone in zones)
+        print(f"⏳ {names} is still loading - try again in a moment")
+        return False
+    
+    def undo(self):
+        """Revert the last step"""
+        if not self._step_ready(self.history.undo_steps):
+            return
+        step = self.history.undo()
+        if step is None:
+            print("↩️ Nothing to undo")
+            return
+        for op in reversed(step):
+            self._apply(op, False)
+        print(f"↩️ Undo ({len(self.history.undo_steps)} more)")
+    
+    def redo(self):
+        """Re-apply the last undone step"""
+        if not self._step_ready(self.history.redo_steps):
+            return
+        step = self.history.redo()
+        if step is None:
+            print("↪️ Nothing to redo")
+            return
+        for op in step:
+            self._apply(op, True)
+        print(f"↪️ Redo ({len(self.history.redo_steps)} more)")
+    
+    def _grid_anchor(self):
+        """Grid cell under the cursor at the placement height, in world space"""
+        return [round(self.cursor_pos[0] / self.grid_size) * self.grid_size + self.zone_offset[0],
+                self.placement_height * self.grid_size + self.zone_offset[1],
+                round(self.cursor_pos[2] / self.grid_size) * self.grid_size + self.zone_offset[2]]
+    
+    def set_fill_anchor(self):
+        """First press marks one corner; the second fills from it to the cursor"""
+        if self.fill_anchor is None:
+            self.fill_anchor = self._grid_anchor()
+            print(f"📌 Fill anchor set - move the cursor and press B again to fill a {self.fill_shape}")
+            return
+        anchor, self.fill_anchor = self.fill_anchor, None
+        self.fill_region(anchor, self._grid_anchor())
+    
+    def fill_region(self, start, end):
+        """Place the current part/asset along a line or across a rectangle or box in one batch"""
+        if not self._zone_ready():
+            return
+        started = time.time()
+        size, color, block_type, asset = self._current_object()
+        extents = object_extents(block_type, size)
+        # One object per footprint so neighbours tile without overlapping
+        steps = np.array(self.occupancy.footprint(extents)) * self.grid_size
+        positions = fill_positions(self.fill_shape, start, end, steps)
+        if block_type == 'prefab':
+            positions += self.prefabs.offset(asset)
+        if len(positions) > config.BULK_FILL_MAX:
+            print(f"⛔ Fill of {len(positions)} objects is over the {config.BULK_FILL_MAX} limit")
+            return
+        # Each object goes to the zone it lands in, so a fill may reach into zones that are still on disk
+        if not self._zone_ready([ZONES[code] for code in np.unique(zone_codes_at(positions)).tolist()]):
+            return
+        
+        self._ensure_indexes('occupancy', 'broad_phase')
+        centers = positions.copy()
+        centers[:, 1] += object_lift(block_type, asset) * extents[1]
+        cells_many = self.occupancy.cells_for_many(centers, extents)
+        blocked = self.occupancy.blocked(cells_many)
+        self.history.begin()
+        if blocked.any():
+            if self.occupied_policy == 'reject':
+                positions, centers, cells_many = positions[~blocked], centers[~blocked], cells_many[~blocked]
+            else:
+                blockers = set()
+                for cells in cells_many[blocked].tolist():
+                    blockers.update(self.occupancy.blockers(map(tuple, cells)))
+                blockers = np.array(sorted(blockers), dtype=np.int64)
+                self._remove_objects(blockers)
+                self.journal.removed_many(self.scene, blockers)
+                self.history.record(self.scene, ('remove', blockers))
+        # Free-placed objects hold no cells; like a single placement, a fill must not overlap their boxes
+        overlapping = np.zeros(len(positions), dtype=bool)
+        if config.FREE_OVERLAP_POLICY != 'allow':
+            overlapping = self.broad_phase.overlapping_many(centers, np.tile(np.asarray(extents) / 2, (len(centers), 1)))
+            positions, cells_many = positions[~overlapping], cells_many[~overlapping]
+        
+        count = len(positions)
+        type_code = TYPE_CODES[block_type]
+        ids = self.scene.add_many(
+            positions, np.tile(np.asarray(size, dtype=np.float32), (count, 1)),
+            np.tile(np.asarray(color, dtype=np.float32), (count, 1)),
+            np.full(count, type_code, dtype=np.uint8),
+            np.full(count, ASSET_CODES[type_code][asset or ''], dtype=np.uint8),
+            zone_codes_at(positions),
+            np.full(count, MODE_CODES[self.build_mode], dtype=np.uint8),
+            np.ones(count, dtype=bool)
+        )
+        self._index_many(ids, cells_many)
+        self.journal.added_many(self.scene, ids)
+        self.history.record(self.scene, ('add', ids))
+        self.history.end(self.scene)
+        self.scene_version += 1
+        self._refresh_suns(ids)
+        skipped = f", {int(blocked.sum())} occupied cells skipped" if self.occupied_policy == 'reject' and blocked.any() else ""
+        if overlapping.any():
+            skipped += f", {int(overlapping.sum())} overlapping objects skipped"
+        print(f"🧱 Filled {self.fill_shape} with {count} {asset or block_type} "
+              f"({(time.time() - started) * 1000:.0f} ms{skipped})")
+    
+    def capture_prefab(self, replace=False):
+        """Save the objects between the fill anchor and the cursor as a new prefab (or over the active one)"""
+        if self.fill_anchor is None:
+            print("📌 Mark one corner with B first, then press P at the opposite corner")
+            return
+        anchor, self.fill_anchor = self.fill_anchor, None
+        if replace and not self._prefab_unplaced():
+            return
+        corner = self._grid_anchor()
+        low = np.minimum(anchor, corner) - self.grid_size / 2
+        high = np.maximum(anchor, corner) + self.grid_size / 2
+        
+        # Every height inside the x/z rectangle; instances are not nested into prefabs
+        ids = self.scene.ids()
+        positions = self.scene.positions[ids]
+        inside = ((positions[:, 0] >= low[0]) & (positions[:, 0] <= high[0]) &
+                  (positions[:, 2] >= low[2]) & (positions[:, 2] <= high[2]) &
+                  (self.scene.types[ids] != TYPE_PREFAB))
+        ids = ids[inside]
+        if len(ids) == 0:
+            print("🫥 No parts inside the marked area")
+            return
+        name = self.active_prefab if replace else self.prefabs.free_slot()
+        if name is None:
+            print(f"⛔ All {config.PREFAB_SLOTS} prefab slots are in use - Ctrl+Shift+P deletes the active one")
+            return
+        try:
+            self.prefabs.capture(self.scene, ids, name)
+        except OSError as e:
+            print(f"❌ Could not save {self.prefabs.path(name)}: {e}")
+            return
+        self.active_prefab = name
+        print(f"🧩 Captured {len(ids)} parts as {name} - pinch to place it (Shift+P to switch)")
+    
+    def _prefab_unplaced(self):
+        """Whether the active prefab may be replaced or deleted (it has no instances in the scene)"""
+        if self.active_prefab is None:
+            print("🧩 Pick a prefab with Shift+P first")
+            return False
+        placed = len(self.scene.ids_of('prefab', self.active_prefab))
+        if placed:
+            print(f"⛔ {self.active_prefab} is placed {placed} times - remove those instances first")
+            return False
+        return True
+    
+    def delete_prefab(self):
+        """Delete the active prefab and free its slot"""
+        if not self._prefab_unplaced():
+            return
+        name = self.active_prefab
+        try:
+            self.prefabs.delete(name)
+        except OSError as e:
+            print(f"❌ Could not delete {self.prefabs.path(name)}: {e}")
+            return
+        self.active_prefab = None
+        print(f"🗑️ Deleted prefab {name}")
+    
+    def cycle_prefab(self):
+        """Switch the placed object between the defined prefabs and the normal build mode"""
+        names = [None] + self.prefabs.names()
+        self.active_prefab = names[(names.index(self.active_prefab) + 1) % len(names)]
+        print(f"🧩 Prefab: {self.active_prefab or 'OFF'}")
+    
+    def generate_city_zone(self):
+        """Fill the current zone with its seeded procedural city (one undo step)"""
+        if not self._zone_ready():
+            return
+        started = time.time()
+        city = generate_city(config.ZONES[self.current_zone]['position'], config.CITY_BLOCKS,
+                             config.CITY_SEED + ZONE_CODES[self.current_zone], self.current_zone,
+                             grid_size=self.grid_size)
+        
+        # Snapped pieces of one size share a cell pattern, so occupied cells are checked per size
+        self._ensure_indexes('occupancy', 'broad_phase')
+        centers, half = anchored_boxes(city['positions'], city['sizes'], city['types'], city['assets'])
+        snapped = np.flatnonzero(city['snapped'])
+        sizes, group = np.unique(city['sizes'][snapped], axis=0, return_inverse=True)
+        group = group.ravel()
+        blocked = np.zeros(len(city['snapped']), dtype=bool)
+        blockers = set()
+        for index, size in enumerate(sizes.tolist()):
+            rows = snapped[group == index]
+            cells_many = self.occupancy.cells_for_many(centers[rows], size)
+            hit = self.occupancy.blocked(cells_many)
+            blocked[rows[hit]] = True
+            for cells in cells_many[hit].tolist():
+                blockers.update(self.occupancy.blockers(map(tuple, cells)))
+        
+        # Cars and people are free props; they are dropped where they would overlap something
+        # that stays (e.g. the props of a city already generated here)
+        kept = set() if self.occupied_policy == 'reject' else blockers
+        if config.FREE_OVERLAP_POLICY != 'allow':
+            for row in np.flatnonzero(~city['snapped']).tolist():
+                if set(self.broad_phase.query(centers[row], half[row])) - kept:
+                    blocked[row] = True
+        
+        self.history.begin()
+        if self.occupied_policy == 'replace' and blockers:
+            blockers = np.array(sorted(blockers), dtype=np.int64)
+            self._remove_objects(blockers)
+            self.journal.removed_many(self.scene, blockers)
+            self.history.record(self.scene, ('remove', blockers))
+            blocked &= ~city['snapped']
+        skipped = int(blocked.sum())
+        if skipped:
+            city = {name: column[~blocked] for name, column in city.items()}
+        
+        ids = self.scene.add_many(**city)
+        self._index_many(ids)
+        self.journal.added_many(self.scene, ids)
+        self.history.record(self.scene, ('add', ids))
+        self.history.end(self.scene)
+        self.scene_version += 1
+        skipped = f", {skipped} occupied spots skipped" if skipped else ""
+        print(f"🏙️ Generated {len(ids)} city objects in {config.ZONES[self.current_zone]['name']} "
+              f"({(time.time() - started) * 1000:.0f} ms{skipped})")
+    
+    def plan_route(self):
+        """First press picks the road under the cursor; the second shows the shortest route to the next"""
+        self._ensure_road_network()
+        road_id = self.road_network.road_at(self.occupancy.cell_at(self._cursor_world_position())[::2])
+        if road_id is None:
+            print("🫥 No road under the cursor")
+            return
+        if self.route_start is None or self.route_start not in self.road_network:
+            self.route_start, self.route = road_id, []
+            print(f"🛣️ Route start set - move to another road and press R again "
+                  f"({self.road_network.component_count()} separate road networks)")
+            return
+        start, self.route_start = self.route_start, None
+        started = time.time()
+        path = self.road_network.shortest_path(start, road_id)
+        if path is None:
+            self.route = []
+            print("⛔ Those roads are not connected")
+            return
+        self.route = path
+        length = sum(math.dist(self.road_network.centers[a], self.road_network.centers[b])
+                     for a, b in zip(path, path[1:]))
+        print(f"🛣️ Route: {len(path)} road tiles, {length:.0f} m ({(time.time() - started) * 1000:.1f} ms)")
+    
+    def erase_at_cursor(self):
+        """Remove the object occupying the grid cell under the cursor"""
+        self._ensure_indexes('occupancy')
+        object_id = self.occupancy.occupant(self._cursor_world_position())
+        if object_id is None:
+            print("🫥 Nothing to erase here")
+            return
+        name = self.scene.asset_name(object_id) or self.scene.get(object_id)['type']
+        self.remove_object(object_id)
+        print(f"🧽 Erased {name}")
+    
+    def _screen_ray(self, pos):
+        """World-space ray (origin, direction) through a window pixel"""
+        eye, target = self.camera_eye, self.camera_target
+        forward = np.subtract(target, eye, dtype=float)
+        forward /= np.linalg.norm(forward)
+        right = np.cross(forward, (0, 1, 0))
+        right /= np.linalg.norm(right)
+        up = np.cross(right, forward)
+        
+        # Same 60 degree vertical field of view as gluPerspective in _init_opengl
+        tan_half = math.tan(math.radians(60) / 2)
+        aspect = self.screen_width / self.screen_height
+        x = (2 * pos[0] / self.screen_width - 1) * tan_half * aspect
+        y = (1 - 2 * pos[1] / self.screen_height) * tan_half
+        direction = forward + x * right + y * up
+        return eye, tuple(direction / np.linalg.norm(direction))
+    
+    def _cursor_ray(self):
+        """World-space ray from the camera through the hand cursor"""
+        direction = np.subtract(self._cursor_world_position(), self.camera_eye, dtype=float)
+        return self.camera_eye, tuple(direction / max(np.linalg.norm(direction), 1e-6))
+    
+    def select_with_ray(self, ray):
+        """Select the nearest object along a ray (or clear the selection)"""
+        self._ensure_indexes('bvh')
+        hit = self.bvh.raycast(*ray)
+        self.selected_id = hit[0] if hit else None
+        if self.selected_id is not None:
+            name = self.scene.asset_name(self.selected_id) or self.scene.get(self.selected_id)['type']
+            print(f"🎯 Selected {name} (DEL to delete, M to move to cursor)")
+        return self.selected_id is not None
+    
+    def delete_selected(self):
+        """Remove the selected object"""
+        if self.selected_id is None:
+            print("🫥 Nothing selected")
+            return
+        name = self.scene.asset_name(self.selected_id) or self.scene.get(self.selected_id)['type']
+        self.remove_object(self.selected_id)
+        print(f"🧽 Deleted {name}")
+    
+    def move_selected_to_cursor(self):
+        """Move the selected object to the placement position under the cursor"""
+        object_id = self.selected_id
+        if object_id is None:
+            print("🫥 Nothing selected")
+            return
+        if not self._zone_ready():
+            return
+        self._ensure_indexes('occupancy', 'broad_phase')
+        block = self.scene.get(object_id)
+        old_cells = self.occupancy.object_cells.get(object_id)
+        before = (block['position'], block['zone'], bool(self.scene.snapped[object_id]))
+        
+        # Out of the indexes first so the object does not block its own move
+        self._unindex_object(object_id)
+        self.history.begin()
+        claimed = self._claim_space(self._cursor_world_position(), block['type'], block['asset_type'], block['size'])
+        if claimed is None:
+            self._index_object(object_id, old_cells)
+            self.history.end(self.scene)
+            return
+        position, cells = claimed
+        
+        self.scene.move(object_id, position, self.current_zone, cells is not None)
+        self._index_object(object_id, cells)
+        self.journal.moved(self.scene, object_id)
+        self.history.record(self.scene, ('move', object_id, before, (position, self.current_zone, cells is not None)))
+        self.history.end(self.scene)
+        self.scene_version += 1
+        if object_id in self.sun_ids:
+            self.lights_version += 1
+        print(f"↔️ Moved {block['asset_type'] or block['type']}")
+    
+    def clear_zone(self, zone_name):
+        """Remove only the objects placed in one zone"""
+        object_ids = self.scene.zone_object_ids(zone_name)
+        self._remove_objects(object_ids)
+        self.journal.removed_many(self.scene, object_ids)
+        self.history.record(self.scene, ('remove', object_ids))
+        streamed = self.streamer.on_disk.get(zone_name, 0)
+        self.streamer.discard(zone_name)
+        self.history.drop(zone_name)
+        print(f"🗑️ Cleared {len(object_ids) + streamed} objects from {config.ZONES[zone_name]['name']}")
+    
+    def clear_scene(self):
+        """Remove every placed object (undoable in memory: only their ids are recorded; zone files are deleted)"""
+        object_ids = self.scene.ids()
+        streamed = sum(self.streamer.on_disk.values())
+        self.scene.remove_many(object_ids, retain=True)
+        self.history.record(self.scene, ('remove', object_ids))
+        for zone in self.streamer.on_disk:
+            self.history.drop(zone)
+        self.streamer.discard_all()
+        self.journal.cleared(self.scene)
+        self.occupancy.clear()
+        self.broad_phase.clear()
+        self.bvh.clear()
+        self.magnet.clear()
+        self.index_dirty = {}
+        self.index_build = None
+        self.road_network.clear()
+        self.road_network_stale = False
+        self.route_start = None
+        self.route = []
+        self.selected_id = None
+        self.scene_version += 1
+        self.traffic_inputs_version += 1
+        if self.sun_ids:
+            self.sun_ids.clear()
+            self.lights_version += 1
+        if streamed:
+            # Undo only reaches objects that were in memory; streamed-out zone files are gone
+            print(f"🗑️ Scene cleared - Ctrl+Z brings back the {len(object_ids)} objects in memory, "
+                  f"the {streamed} streamed out to disk are deleted for good")
+        else:
+            print("🗑️ Scene cleared (Ctrl+Z to undo)")
     
     def _build_ui_buttons(self):
         self.ui_buttons = []
@@ -405,7 +1339,8 @@ class QuickStart3D:
             print(f"📍 Zone Selector: {'OPENED' if self.show_zone_selector else 'CLOSED'}")
             return True
         
-        return False
+        # Clicks that miss the UI pick objects in the scene
+        return self.select_with_ray(self._screen_ray(pos))
     
     def teleport_to_zone(self, zone_name):
         """Teleport the camera to a different zone/area"""
@@ -421,9 +1356,16 @@ class QuickStart3D:
         print(f"📍 Teleported to: {zone_data['name']}")
         print(f"   Position: {zone_data['position']}")
         
-        # Count blocks in this zone
-        blocks_in_zone = sum(1 for b in self.blocks if b.get('zone') == zone_name)
-        print(f"   ({blocks_in_zone} objects in this area)")
+        # Start streaming the zone in now rather than waiting for the camera to arrive
+        if not self.streamer.is_resident(zone_name):
+            self.streamer.request(zone_name)
+            print(f"   ⏳ Streaming in {self.streamer.on_disk[zone_name]} objects...")
+            return
+        
+        # Count blocks in this zone (counts only; bounds are not needed here)
+        stats = self.scene.zone_counts(zone_name)
+        breakdown = ', '.join(f"{count} {name}" for name, count in stats['by_type'].items())
+        print(f"   ({stats['count']} objects in this area{': ' + breakdown if breakdown else ''})")
     
     def handle_mouse_motion(self, pos):
         self.hovered_button = None
@@ -457,23 +1399,41 @@ class QuickStart3D:
             return
         glDisable(GL_LIGHTING)
         
-        # Draw zone boundaries and colored grids for each zone
-        zone_colors = {
-            'zone1': (0.3, 0.5, 0.9),   # Blue - Central Plaza
-            'zone2': (0.9, 0.5, 0.3),   # Orange - East District
-            'zone3': (0.5, 0.3, 0.9),   # Purple - West District
-            'zone4': (0.3, 0.9, 0.3),   # Green - North Park
-            'zone5': (0.9, 0.9, 0.3),   # Yellow - South Beach
-            'zone6': (0.9, 0.3, 0.3),   # Red - NE Industrial
-            'zone7': (0.3, 0.9, 0.9),   # Cyan - NW Residential
-            'zone8': (0.5, 0.9, 0.5),   # Light Green - SE Harbor
-            'zone9': (0.7, 0.5, 0.3)    # Brown - SW Mountain
-        }
+        # Static zone/grid geometry is baked and only re-baked when its inputs change
+        self.grid_geometry.draw((self.current_zone, self.grid_size, self.show_placement_grid))
         
+        # Draw current grid cell highlight
+        if self.show_placement_grid and hasattr(self, 'display_cursor_pos'):
+            cx, cy, cz = self.display_cursor_pos
+            half_grid = self.grid_size / 2
+            
+            # Highlight the cell where cursor is
+            glColor4f(0.2, 0.8, 0.2, 0.3)  # Green transparent
+            glBegin(GL_QUADS)
+            glVertex3f(cx - half_grid, cy + 0.01, cz - half_grid)
+            glVertex3f(cx + half_grid, cy + 0.01, cz - half_grid)
+            glVertex3f(cx + half_grid, cy + 0.01, cz + half_grid)
+            glVertex3f(cx - half_grid, cy + 0.01, cz + half_grid)
+            glEnd()
+            
+            # Border of highlighted cell
+            glColor3f(0.2, 1.0, 0.2)
+            glLineWidth(3)
+            glBegin(GL_LINE_LOOP)
+            glVertex3f(cx - half_grid, cy + 0.02, cz - half_grid)
+            glVertex3f(cx + half_grid, cy + 0.02, cz - half_grid)
+            glVertex3f(cx + half_grid, cy + 0.02, cz + half_grid)
+            glVertex3f(cx - half_grid, cy + 0.02, cz + half_grid)
+            glEnd()
+        
+        glEnable(GL_LIGHTING)
+    
+    def _bake_grid(self):
+        """Emit zone floors, grids, axes and zone markers (compiled into a display list)"""
         # Draw colored zone areas
         for zone_id, zone_data in config.ZONES.items():
             pos = zone_data['position']
-            color = zone_colors.get(zone_id, (0.3, 0.3, 0.3))
+            color = config.ZONE_COLORS.get(zone_id, (0.3, 0.3, 0.3))
             
             # Brighten current zone
             if zone_id == self.current_zone:
@@ -526,30 +1486,6 @@ class QuickStart3D:
                 glVertex3f(zone_x + i, 0.001, zone_z - grid_range)
                 glVertex3f(zone_x + i, 0.001, zone_z + grid_range)
             glEnd()
-            
-            # Draw current grid cell highlight
-            if hasattr(self, 'display_cursor_pos'):
-                cx, cy, cz = self.display_cursor_pos
-                half_grid = self.grid_size / 2
-                
-                # Highlight the cell where cursor is
-                glColor4f(0.2, 0.8, 0.2, 0.3)  # Green transparent
-                glBegin(GL_QUADS)
-                glVertex3f(cx - half_grid, cy + 0.01, cz - half_grid)
-                glVertex3f(cx + half_grid, cy + 0.01, cz - half_grid)
-                glVertex3f(cx + half_grid, cy + 0.01, cz + half_grid)
-                glVertex3f(cx - half_grid, cy + 0.01, cz + half_grid)
-                glEnd()
-                
-                # Border of highlighted cell
-                glColor3f(0.2, 1.0, 0.2)
-                glLineWidth(3)
-                glBegin(GL_LINE_LOOP)
-                glVertex3f(cx - half_grid, cy + 0.02, cz - half_grid)
-                glVertex3f(cx + half_grid, cy + 0.02, cz - half_grid)
-                glVertex3f(cx + half_grid, cy + 0.02, cz + half_grid)
-                glVertex3f(cx - half_grid, cy + 0.02, cz + half_grid)
-                glEnd()
         
         # Draw fine grid lines (faded) - original background grid
         glColor3f(0.15, 0.15, 0.15)
@@ -570,23 +1506,13 @@ class QuickStart3D:
         
         # Draw zone labels as 3D text markers
         self.draw_zone_labels()
-        
-        glEnable(GL_LIGHTING)
     
     def draw_zone_labels(self):
-        """Draw 3D markers and labels for each zone"""
-        zone_icons = {
-            'zone1': '🏛️', 'zone2': '🏙️', 'zone3': '🌆',
-            'zone4': '🌳', 'zone5': '🏖️', 'zone6': '⚓',
-            'zone7': '🏘️', 'zone8': '🏭', 'zone9': '⛰️'
-        }
-        
+        """Draw 3D markers for each zone (baked with the grid, lighting already off)"""
         for zone_id, zone_data in config.ZONES.items():
             pos = zone_data['position']
             
             # Draw a tall pole marker at zone center
-            glDisable(GL_LIGHTING)
-            
             # Make current zone marker brighter and taller
             if zone_id == self.current_zone:
                 glColor3f(1.0, 1.0, 0.0)  # Bright yellow
@@ -622,8 +1548,6 @@ class QuickStart3D:
             glVertex3f(pos[0] - 0.5, marker_height, pos[2] + 0.5)
             glVertex3f(pos[0] - 0.5, marker_height, pos[2] - 0.5)
             glEnd()
-            
-            glEnable(GL_LIGHTING)
     
     def draw_cursor(self):
         # Use snapped position for cursor display
@@ -702,25 +1626,201 @@ class QuickStart3D:
         glEnd()
     
     def draw_blocks(self):
-        for block in self.blocks:
+        ids = self.scene.ids()
+        if self.traffic.enabled:
+            # Moving cars and people are drawn from the simulation's instance buffer instead
+            ids = ids[~self.traffic.is_agent(ids)]
+            self.draw_traffic()
+        if self.orbits.enabled and len(self.orbits.ids):
+            # Orbiting bodies are drawn at their simulated positions
+            ids = ids[~self.orbits.is_body(ids)]
+            self._draw_objects(self.scene, self.orbits.ids, self.orbits.instances)
+        self._draw_objects(self.scene, ids)
+    
+    def draw_traffic(self):
+        """Draw the agents of each kind in one call, from the simulation's instance buffer"""
+        if len(self.traffic.ids) == 0:
+            return
+        # Agents grouped by kind
+        order = np.argsort(self.traffic.kinds, kind='stable')
+        instances = self.traffic.instances[order]
+        colors = self.scene.colors[self.traffic.ids[order]]
+        starts = np.searchsorted(self.traffic.kinds[order], np.arange(len(AGENTS) + 1)).tolist()
+        attributes = self.sun_lighting.instance_attributes()
+        if attributes is None:
+            # No shader instancing: place the copies on the CPU and draw each kind as one vertex array
+            for kind, name in enumerate(AGENTS):
+                if starts[kind] < starts[kind + 1]:
+                    rows = slice(starts[kind], starts[kind + 1])
+                    self._draw_mesh_array(place_mesh(self._agent_mesh(name), instances[rows], colors[rows]))
+            return
+        
+        # One row per agent: x, y, z, yaw, r, g, b
+        data = np.ascontiguousarray(np.hstack([instances, colors]), dtype=np.float32)
+        stride = data.shape[1] * 4
+        instance_buffer = self._traffic_buffer(data.nbytes)
+        glBindBuffer(GL_ARRAY_BUFFER, instance_buffer)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        
+        self.sun_lighting.set_instanced(True)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        for location in attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribDivisor(location, 1)
+        for kind, name in enumerate(AGENTS):
+            count = starts[kind + 1] - starts[kind]
+            if count == 0:
+                continue
+            mesh = self._agent_mesh(name)
+            glBindBuffer(GL_ARRAY_BUFFER, self.gpu_resources.cache(
+                ('agent_mesh', name), 'buffer', lambda: self._create_buffer(mesh.nbytes, mesh, GL_STATIC_DRAW),
+                mesh.nbytes))
+            vertex_stride = MESH_FLOATS * 4
+            glVertexPointer(3, GL_FLOAT, vertex_stride, ctypes.c_void_p(0))
+            glNormalPointer(GL_FLOAT, vertex_stride, ctypes.c_void_p(MESH_NORMAL * 4))
+            glColorPointer(4, GL_FLOAT, vertex_stride, ctypes.c_void_p(MESH_COLOR * 4))
+            glBindBuffer(GL_ARRAY_BUFFER, instance_buffer)
+            offset = starts[kind] * stride
+            glVertexAttribPointer(attributes[0], 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset))
+            glVertexAttribPointer(attributes[1], 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset + 16))
+            glDrawArraysInstanced(GL_TRIANGLES, 0, len(mesh), count)
+        for location in attributes:
+            glVertexAttribDivisor(location, 0)
+            glDisableVertexAttribArray(location)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.sun_lighting.set_instanced(False)
+    
+    def _agent_mesh(self, name):
+        """Mesh vertex array of a car or person, built on first use"""
+        mesh = self.agent_meshes.get(name)
+        if mesh is None:
+            mesh = self.agent_meshes[name] = agent_mesh(name)
+        return mesh
+    
+    def _create_buffer(self, nbytes, data, usage):
+        """New GL array buffer of nbytes, filled from data (None leaves it uninitialized)"""
+        buffer = int(glGenBuffers(1))
+        glBindBuffer(GL_ARRAY_BUFFER, buffer)
+        glBufferData(GL_ARRAY_BUFFER, nbytes, data, usage)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        return buffer
+    
+    def _traffic_buffer(self, nbytes):
+        """Per-frame agent instance buffer, regrown (at least doubling) when the agents outgrow it"""
+        key = ('traffic', 'instances')
+        if nbytes > self.traffic_buffer_bytes:
+            self.gpu_resources.discard(key)
+            self.traffic_buffer_bytes = max(nbytes, self.traffic_buffer_bytes * 2)
+        size = self.traffic_buffer_bytes
+        return self.gpu_resources.cache(key, 'buffer', lambda: self._create_buffer(size, None, GL_STREAM_DRAW), size)
+    
+    def _draw_mesh_array(self, vertices):
+        """Draw mesh vertices (n, MESH_FLOATS) as triangles from client-side arrays"""
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, np.ascontiguousarray(vertices[:, :MESH_NORMAL]))
+        glNormalPointer(GL_FLOAT, 0, np.ascontiguousarray(vertices[:, MESH_NORMAL:MESH_COLOR]))
+        glColorPointer(4, GL_FLOAT, 0, np.ascontiguousarray(vertices[:, MESH_COLOR:]))
+        glDrawArrays(GL_TRIANGLES, 0, len(vertices))
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+    
+    def draw_road_network(self):
+        """In City mode: outline roads cut off from the main network (red) and the planned route"""
+        if self.build_mode != 'city':
+            return
+        self._ensure_road_network()
+        disconnected = self.road_network.disconnected()
+        self.route = [road_id for road_id in self.route if road_id in self.road_network]
+        if not disconnected and not self.route:
+            return
+        glDisable(GL_LIGHTING)
+        glLineWidth(2)
+        if disconnected:
+            ids = np.fromiter(disconnected, dtype=np.int64)
+            centers, half = self.scene.boxes(ids)
+            low = (centers - half).tolist()
+            high = (centers + half).tolist()
+            glColor3f(1, 0.2, 0.2)
+            glBegin(GL_LINES)
+            for (x0, _, z0), (x1, y1, z1) in zip(low, high):
+                y = y1 + 0.05
+                for a, b in (((x0, z0), (x1, z0)), ((x1, z0), (x1, z1)), ((x1, z1), (x0, z1)), ((x0, z1), (x0, z0))):
+                    glVertex3f(a[0], y, a[1]); glVertex3f(b[0], y, b[1])
+            glEnd()
+        if len(self.route) > 1:
+            glColor3f(1, 0.85, 0.1)
+            glBegin(GL_LINE_STRIP)
+            for x, y, z in self.scene.positions[self.route].tolist():
+                glVertex3f(x, y + 0.3, z)
+            glEnd()
+        glLineWidth(1)
+        glEnable(GL_LIGHTING)
+    
+    def _draw_objects(self, scene, ids, positions=None):
+        """Draw stored objects by type (optionally at other positions, e.g. simulated ones)"""
+        # Pull the live rows out as plain lists once instead of indexing arrays per object
+        positions = (scene.positions[ids] if positions is None else positions).tolist()
+        sizes = scene.sizes[ids].tolist()
+        colors = scene.colors[ids].tolist()
+        types = scene.types[ids].tolist()
+        assets = scene.assets[ids].tolist()
+        
+        for position, size, color, type_code, asset_code in zip(positions, sizes, colors, types, assets):
             glPushMatrix()
-            glTranslatef(*block['position'])
-            glColor3fv(block['color'])
+            glTranslatef(*position)
+            glColor3fv(color)
+            self.lod.focus(position)
             
-            if block['type'] == 'building' and block.get('asset_type'):
-                self.draw_building_part(block['asset_type'], block['size'])
-            elif block['type'] == 'city' and block.get('asset_type'):
-                self.draw_city_asset(block['asset_type'], block['size'])
-            elif block['type'] == 'sphere':
-                quadric = gluNewQuadric()
-                gluSphere(quadric, block['size'][0], 20, 20)
-                gluDeleteQuadric(quadric)
+            if type_code == TYPE_BUILDING and asset_code:
+                self.draw_building_part(ASSETS[TYPE_BUILDING][asset_code], size)
+            elif type_code == TYPE_CITY and asset_code:
+                self.draw_city_asset(ASSETS[TYPE_CITY][asset_code], size)
+            elif type_code == TYPE_SPHERE:
+                self.lod.sphere(size[0], 20, 20)
+            elif type_code == TYPE_PREFAB and asset_code:
+                # One call replays the prefab's shared geometry at this instance's transform
+                if not self.prefabs.draw(ASSETS[TYPE_PREFAB][asset_code], self._record_prefab):
+                    self.draw_cube(size[0])
             else:
-                size = block['size'][0] if len(block['size']) == 1 else block['size'][0]
-                self.draw_cube(size)
+                self.draw_cube(size[0])
             
             glPopMatrix()
     
+    def _record_prefab(self, parts, ids):
+        """Draw a prefab's parts into the display list being recorded"""
+        self.lod.recording = True
+        try:
+            self._draw_objects(parts, ids)
+        finally:
+            self.lod.recording = False
+    
+    def draw_selection(self):
+        """Outline the selected object's bounding box"""
+        if self.selected_id is None:
+            return
+        centers, half = self.scene.boxes([self.selected_id])
+        low, high = centers[0] - half[0], centers[0] + half[0]
+        glDisable(GL_LIGHTING)
+        glLineWidth(2)
+        glColor3f(1, 0.4, 1)
+        glBegin(GL_LINES)
+        for a, b in ((0, 1), (1, 3), (3, 2), (2, 0), (4, 5), (5, 7), (7, 6), (6, 4), (0, 4), (1, 5), (2, 6), (3, 7)):
+            for corner in (a, b):
+                glVertex3f(high[0] if corner & 1 else low[0],
+                           high[1] if corner & 2 else low[1],
+                           high[2] if corner & 4 else low[2])
+        glEnd()
+        glLineWidth(1)
+        glEnable(GL_LIGHTING)
+    
     def draw_building_part(self, part_name, size):
         """Draw specific 3D shape for each building part"""
         if part_name == 'wall':
@@ -847,9 +1947,7 @@ class QuickStart3D:
         glColor3f(0.8, 0.7, 0.1)
         glPushMatrix()
         glTranslatef(w/2-0.2, h/2, d/2+0.05)
-        quadric = gluNewQuadric()
-        gluSphere(quadric, 0.08, 10, 10)
-        gluDeleteQuadric(quadric)
+        self.lod.sphere(0.08, 10, 10)
         glPopMatrix()
     
     def draw_roof(self, size):
@@ -915,20 +2013,18 @@ class QuickStart3D:
         
         glPushMatrix()
         glRotatef(-90, 1, 0, 0)
-        quadric = gluNewQuadric()
-        gluCylinder(quadric, radius, radius, height, slices, 1)
+        self.lod.cylinder(radius, radius, height, slices, 1)
         
         # Top cap
         glPushMatrix()
         glTranslatef(0, 0, height)
-        gluDisk(quadric, 0, radius, slices, 1)
+        self.lod.disk(0, radius, slices, 1)
         glPopMatrix()
         
         # Bottom cap
         glRotatef(180, 1, 0, 0)
-        gluDisk(quadric, 0, radius, slices, 1)
+        self.lod.disk(0, radius, slices, 1)
         
-        gluDeleteQuadric(quadric)
         glPopMatrix()
     
     def draw_stairs(self, size):
@@ -1139,17 +2235,15 @@ class QuickStart3D:
         """Draw a street light"""
         w, h, d = size
         # Pole
-        quadric = gluNewQuadric()
         glPushMatrix()
         glRotatef(-90, 1, 0, 0)
-        gluCylinder(quadric, 0.1, 0.1, h, 8, 1)
+        self.lod.cylinder(0.1, 0.1, h, 8, 1)
         glPopMatrix()
         # Light (sphere on top)
         glPushMatrix()
         glTranslatef(0, h, 0)
-        gluSphere(quadric, 0.3, 10, 10)
+        self.lod.sphere(0.3, 10, 10)
         glPopMatrix()
-        gluDeleteQuadric(quadric)
     
     def draw_bench(self, size):
         """Draw a park bench"""
@@ -1171,18 +2265,16 @@ class QuickStart3D:
         w, h, d = size
         # Trunk (brown)
         glColor3f(0.4, 0.25, 0.1)
-        quadric = gluNewQuadric()
         glPushMatrix()
         glRotatef(-90, 1, 0, 0)
-        gluCylinder(quadric, 0.2, 0.15, h*0.6, 8, 1)
+        self.lod.cylinder(0.2, 0.15, h*0.6, 8, 1)
         glPopMatrix()
         # Foliage (green sphere)
         glColor3f(0.13, 0.55, 0.13)
         glPushMatrix()
         glTranslatef(0, h*0.7, 0)
-        gluSphere(quadric, 0.8, 12, 12)
+        self.lod.sphere(0.8, 12, 12)
         glPopMatrix()
-        gluDeleteQuadric(quadric)
     
     def draw_grass(self, size):
         """Draw grass patch"""
@@ -1197,23 +2289,21 @@ class QuickStart3D:
         """Draw a fountain"""
         w, h, d = size
         # Base
-        quadric = gluNewQuadric()
         glPushMatrix()
         glRotatef(-90, 1, 0, 0)
-        gluCylinder(quadric, w/2, w/2, h*0.3, 16, 1)
+        self.lod.cylinder(w/2, w/2, h*0.3, 16, 1)
         glPopMatrix()
         # Central column
         glPushMatrix()
         glTranslatef(0, h*0.3, 0)
         glRotatef(-90, 1, 0, 0)
-        gluCylinder(quadric, 0.2, 0.2, h*0.5, 8, 1)
+        self.lod.cylinder(0.2, 0.2, h*0.5, 8, 1)
         glPopMatrix()
         # Top sphere
         glPushMatrix()
         glTranslatef(0, h, 0)
-        gluSphere(quadric, 0.4, 12, 12)
+        self.lod.sphere(0.4, 12, 12)
         glPopMatrix()
-        gluDeleteQuadric(quadric)
     
     def draw_car(self, size):
         """Draw a simple car"""
@@ -1234,41 +2324,36 @@ class QuickStart3D:
         glEnd()
         # Wheels (black)
         glColor3f(0.1, 0.1, 0.1)
-        quadric = gluNewQuadric()
         for pos in [(-w/3, 0.2, d/2+0.1), (w/3, 0.2, d/2+0.1), (-w/3, 0.2, -d/2-0.1), (w/3, 0.2, -d/2-0.1)]:
             glPushMatrix()
             glTranslatef(*pos)
-            gluSphere(quadric, 0.2, 8, 8)
+            self.lod.sphere(0.2, 8, 8)
             glPopMatrix()
-        gluDeleteQuadric(quadric)
     
     def draw_person(self, size):
         """Draw a simple person figure"""
         w, h, d = size
-        quadric = gluNewQuadric()
         # Body (cylinder)
         glPushMatrix()
         glRotatef(-90, 1, 0, 0)
-        gluCylinder(quadric, w/2, w/2, h*0.6, 8, 1)
+        self.lod.cylinder(w/2, w/2, h*0.6, 8, 1)
         glPopMatrix()
         # Head (sphere)
         glPushMatrix()
         glTranslatef(0, h*0.85, 0)
-        gluSphere(quadric, w/2, 10, 10)
+        self.lod.sphere(w/2, 10, 10)
         glPopMatrix()
-        gluDeleteQuadric(quadric)
     
     def draw_sun(self, size):
         """Draw a bright sun with rays"""
         w, h, d = size
-        quadric = gluNewQuadric()
         
         # Enable emission for glowing effect
         glMaterialfv(GL_FRONT_AND_BACK, GL_EMISSION, (0.8, 0.7, 0.2, 1.0))
         
         # Main sun sphere (bright yellow/orange)
         glPushMatrix()
-        gluSphere(quadric, w, 20, 20)
+        self.lod.sphere(w, 20, 20)
         glPopMatrix()
         
         # Reset emission
@@ -1276,6 +2361,7 @@ class QuickStart3D:
         
         # Sun rays (lines radiating outward)
         glDisable(GL_LIGHTING)
+        self.sun_lighting.set_lit(False)
         glColor3f(1.0, 0.95, 0.3)
         glLineWidth(3)
         glBegin(GL_LINES)
@@ -1289,26 +2375,27 @@ class QuickStart3D:
             glVertex3f(0, w * 1.8 * math.cos(rad), w * 1.8 * math.sin(rad))
         glEnd()
         glEnable(GL_LIGHTING)
-        
-        gluDeleteQuadric(quadric)
+        self.sun_lighting.set_lit(True)
     
     def _update_dynamic_lighting(self):
-        """Update lighting based on sun positions"""
-        # Find all sun objects
-        sun_blocks = [b for b in self.blocks if b.get('asset_type') == 'sun']
+        """Update fixed-function lights from the sun index"""
+        # Light positions are transformed by the current view, so they follow the camera each frame
+        for i, sun_id in enumerate(self.sun_ids[:7]):
+            sun_pos = self.scene.positions[sun_id]
+            glLightfv(GL_LIGHT0 + i + 1, GL_POSITION, (sun_pos[0], sun_pos[1], sun_pos[2], 1.0))
+        
+        # Enable/disable and colors only change when suns are added or removed
+        if self.pushed_lights_version == self.lights_version:
+            return
+        self.pushed_lights_version = self.lights_version
         
-        # Disable additional lights first
+        active = min(len(self.sun_ids), 7)
         for i in range(1, 8):
-            glDisable(GL_LIGHT0 + i)
-        
-        # Enable lights for each sun (up to 7 additional lights)
-        for i, sun in enumerate(sun_blocks[:7]):
-            light_id = GL_LIGHT0 + i + 1  # Use LIGHT1-LIGHT7
-            sun_pos = sun['position']
-            
+            light_id = GL_LIGHT0 + i  # Use LIGHT1-LIGHT7
+            if i > active:
+                glDisable(light_id)
+                continue
             glEnable(light_id)
-            # Position the light at the sun's location
-            glLightfv(light_id, GL_POSITION, (sun_pos[0], sun_pos[1], sun_pos[2], 1.0))
             # Bright yellow/orange light
             glLightfv(light_id, GL_AMBIENT, (0.3, 0.25, 0.1, 1.0))
             glLightfv(light_id, GL_DIFFUSE, (1.0, 0.9, 0.5, 1.0))
@@ -1323,7 +2410,11 @@ class QuickStart3D:
             self.cursor_pos[i] += (self.target_pos[i] - self.cursor_pos[i]) * 0.15
         
         # Snap cursor to grid if enabled (for visual feedback)
-        if self.snap_to_grid:
+        if self.magnet_snap:
+            # Show where a magnetically snapped placement will land
+            world_pos = self._cursor_world_position()
+            self.display_cursor_pos = [w - o for w, o in zip(world_pos, self.zone_offset)]
+        elif self.snap_to_grid:
             self.display_cursor_pos = [
                 round(self.cursor_pos[0] / self.grid_size) * self.grid_size,
                 self.placement_height * self.grid_size,
@@ -1344,19 +2435,63 @@ class QuickStart3D:
         cam_z = zone_pos[2] + math.cos(self.camera_rotation_y) * self.camera_distance
         cam_y = 5 + math.sin(self.camera_rotation_x) * 5
         gluLookAt(cam_x, cam_y, cam_z, zone_pos[0], 0, zone_pos[2], 0, 1, 0)
+        self.camera_eye = (cam_x, cam_y, cam_z)
+        self.camera_target = (zone_pos[0], 0, zone_pos[2])
+        self.lod.set_eye((cam_x, cam_y, cam_z))
         
-        # Dynamic lighting from sun objects
-        self._update_dynamic_lighting()
+        # Light buffer is refreshed only when the sun index changed
+        if self.uploaded_lights_version != self.lights_version:
+            self.sun_lighting.set_lights(self.scene.positions[self.sun_ids])
+            self.uploaded_lights_version = self.lights_version
         
         self.draw_grid()
-        self.draw_blocks()
+        
+        # Per-pixel sun lighting, or fixed-function GL_LIGHT1-7 when shaders are unavailable
+        if self.sun_lighting.begin():
+            self.draw_blocks()
+            self.sun_lighting.end()
+        else:
+            self._update_dynamic_lighting()
+            self.draw_blocks()
+        self.draw_selection()
+        self.draw_road_network()
         # Always show cursor (even during rotation for better visibility)
         self.draw_cursor()
     
     def draw_ui_overlay(self, camera_frame):
         glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        # Separate alpha blending keeps offscreen layers correctly premultiplied
+        glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        
+        hovered = None
+        if self.hovered_button:
+            hovered = (self.hovered_button.get('type'), self.hovered_button.get('value'))
+        
+        # Retained panels: re-rendered only when mode, selection, hover or settings change
+        panel_key = (self.build_mode, self.selected_building_part, self.selected_city_asset,
+                     self.selected_solar_object, hovered, self.snap_to_grid,
+                     self.placement_height, self.current_zone)
+        self.ui_layer.draw(panel_key, self._draw_ui_panels)
+        
+        # Camera preview: BGR frame streamed into a persistent texture, scaled by the sampler
+        cam_x = self.screen_width - 330
+        cam_y = self.screen_height - 280
+        self.camera_preview.update(camera_frame, self.frame_id)
+        self.camera_preview.draw(cam_x, cam_y, 320, 240)
+        self._draw_preview_overlay(cam_x, cam_y)
+        
+        # Live tracking status drawn every frame on top of the panels
+        self._draw_ui_status()
         
+        # Zone selector overlay
+        if self.show_zone_selector:
+            selector_key = (self.current_zone, hovered, self.scene_version)
+            self.zone_selector_layer.draw(selector_key, self._draw_zone_selector)
+        
+        glDisable(GL_BLEND)
+    
+    def _draw_ui_panels(self):
+        """Draw the retained part of the UI (panels, buttons, labels and help)"""
         # Left panel background
         glColor4f(0.059, 0.090, 0.165, 0.85)
         glBegin(GL_QUADS)
@@ -1366,11 +2501,6 @@ class QuickStart3D:
         glVertex2f(0, self.screen_height)
         glEnd()
         
-        # Camera preview
-        camera_frame_rgb = cv2.cvtColor(camera_frame, cv2.COLOR_BGR2RGB)
-        camera_preview = cv2.resize(camera_frame_rgb, (320, 240))
-        # Don't flip - let texture coordinates handle orientation
-        
         cam_x = self.screen_width - 330
         cam_y = self.screen_height - 280
         
@@ -1392,26 +2522,6 @@ class QuickStart3D:
         glVertex2f(cam_x - 5, cam_y + 245)
         glEnd()
         
-        # Draw camera frame as texture
-        glEnable(GL_TEXTURE_2D)
-        texture_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture_id)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        texture_data = camera_preview.tobytes()
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, 320, 240, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
-        
-        glColor4f(1, 1, 1, 1)
-        glBegin(GL_QUADS)
-        glTexCoord2f(0, 0); glVertex2f(cam_x, cam_y)
-        glTexCoord2f(1, 0); glVertex2f(cam_x + 320, cam_y)
-        glTexCoord2f(1, 1); glVertex2f(cam_x + 320, cam_y + 240)
-        glTexCoord2f(0, 1); glVertex2f(cam_x, cam_y + 240)
-        glEnd()
-        
-        glDeleteTextures([texture_id])
-        glDisable(GL_TEXTURE_2D)
-        
         # Bottom help panel
         glColor4f(0.059, 0.090, 0.165, 0.85)
         glBegin(GL_QUADS)
@@ -1509,23 +2619,9 @@ class QuickStart3D:
         glEnd()
         y_offset += 15
         
-        if self.detection_confidence > 0:
-            status_color = (34, 197, 94) if self.detection_confidence > 0.6 else (239, 68, 68)
-            status_text = "✋ Hand Detected" if not self.is_rotating_camera else "🔄 Rotate & Zoom Mode"
-        else:
-            status_color = (239, 68, 68)
-            status_text = "❌ No Hand Detected"
-        self._draw_text(status_text, 10, y_offset, self.font_small, status_color)
-        y_offset += 25
-        
-        # Show zoom level
-        zoom_pct = int((25 - self.camera_distance) / 20 * 100)
-        self._draw_text(f"Zoom: {zoom_pct}%", 10, y_offset, self.font_small, (148, 163, 184))
-        y_offset += 5
-        
-        lighting_color = {"Good": (34, 197, 94), "Fair": (234, 179, 8), "Poor": (239, 68, 68)}.get(self.lighting_quality, (255, 255, 255))
-        self._draw_text(f"Light: {self.lighting_quality} ({int(self.avg_brightness)})", 10, y_offset, self.font_small, lighting_color)
-        y_offset += 30
+        # Status, zoom and light lines are drawn per frame by _draw_ui_status
+        self.status_y = y_offset
+        y_offset += 60
         
         # Grid and height info
         grid_status = "✅ ON" if self.snap_to_grid else "❌ OFF"
@@ -1534,7 +2630,7 @@ class QuickStart3D:
         y_offset += 20
         
         height_text = f"Height: Lvl {self.placement_height} ({self.placement_height * self.grid_size:.0f}m)"
-        self._draw_text(height_text, 10, y_offset, self.font_small, (255, 200, 50))
+        self._draw_text(height_text, 10, y_offset, self.font_small, (255, 200, 50), dynamic=True)
         y_offset += 25
         
         # Zone info and button
@@ -1744,11 +2840,32 @@ class QuickStart3D:
             self._draw_text(text, 10, y_offset, self.font_small, (200, 200, 200))
             y_offset += 25
         
-        # Zone selector overlay
-        if self.show_zone_selector:
-            self._draw_zone_selector()
+    def _draw_preview_overlay(self, cam_x, cam_y):
+        """Draw hand skeletons and tracking text over the camera preview"""
+        self.camera_preview.draw_landmarks(self.hand_landmarks, self.hand_connections, cam_x, cam_y, 320, 240)
+        title, title_color, detail, detail_color = self.preview_status
+        self._draw_text(title, cam_x + 5, cam_y + 5, self.font_small, title_color)
+        self._draw_text(detail, cam_x + 5, cam_y + 22, self.font_tiny, detail_color, dynamic=True)
+    
+    def _draw_ui_status(self):
+        """Draw the per-frame status lines (hand detection, zoom, lighting)"""
+        y_offset = self.status_y
+        if self.detection_confidence > 0:
+            status_color = (34, 197, 94) if self.detection_confidence > 0.6 else (239, 68, 68)
+            status_text = "✋ Hand Detected" if not self.is_rotating_camera else "🔄 Rotate & Zoom Mode"
+        else:
+            status_color = (239, 68, 68)
+            status_text = "❌ No Hand Detected"
+        self._draw_text(status_text, 10, y_offset, self.font_small, status_color)
+        y_offset += 25
         
-        glDisable(GL_BLEND)
+        # Show zoom level
+        zoom_pct = int((25 - self.camera_distance) / 20 * 100)
+        self._draw_text(f"Zoom: {zoom_pct}%", 10, y_offset, self.font_small, (148, 163, 184), dynamic=True)
+        y_offset += 5
+        
+        lighting_color = {"Good": (34, 197, 94), "Fair": (234, 179, 8), "Poor": (239, 68, 68)}.get(self.lighting_quality, (255, 255, 255))
+        self._draw_text(f"Light: {self.lighting_quality} ({int(self.avg_brightness)})", 10, y_offset, self.font_small, lighting_color, dynamic=True)
     
     def _draw_zone_selector(self):
         """Draw the zone selector overlay"""
@@ -1789,19 +2906,6 @@ class QuickStart3D:
         self._draw_text("SELECT ZONE TO TELEPORT", panel_x + 20, panel_y + 20, self.font, (56, 189, 248))
         self._draw_text(f"Current: {config.ZONES[self.current_zone]['name']}", panel_x + 20, panel_y + 50, self.font_small, (34, 197, 94))
         
-        # Zone colors matching the 3D world
-        zone_colors = {
-            'zone1': (0.3, 0.5, 0.9),   # Blue - Central Plaza
-            'zone2': (0.9, 0.5, 0.3),   # Orange - East District
-            'zone3': (0.5, 0.3, 0.9),   # Purple - West District
-            'zone4': (0.3, 0.9, 0.3),   # Green - North Park
-            'zone5': (0.9, 0.9, 0.3),   # Yellow - South Beach
-            'zone6': (0.9, 0.3, 0.3),   # Red - NE Industrial
-            'zone7': (0.3, 0.9, 0.9),   # Cyan - NW Residential
-            'zone8': (0.5, 0.9, 0.5),   # Light Green - SE Harbor
-            'zone9': (0.7, 0.5, 0.3)    # Brown - SW Mountain
-        }
-        
         # Build zone buttons in 3x3 grid
         self.zone_buttons = []
         button_size = 180
@@ -1832,7 +2936,7 @@ class QuickStart3D:
             zone_data = config.ZONES[zone_id]
             is_current = zone_id == self.current_zone
             is_hovered = self.hovered_button and self.hovered_button.get('value') == zone_id
-            zone_color = zone_colors.get(zone_id, (0.3, 0.3, 0.3))
+            zone_color = config.ZONE_COLORS.get(zone_id, (0.3, 0.3, 0.3))
             
             # Color indicator bar at top of button
             glColor4f(*zone_color, 1.0)
@@ -1883,7 +2987,7 @@ class QuickStart3D:
                 self._draw_text(zone_data['name'], x + 10, y + 95, self.font_small, text_color)
             
             # Count blocks in zone
-            blocks_count = sum(1 for b in self.blocks if b.get('zone') == zone_id)
+            blocks_count = self.streamer.object_count(self.scene, zone_id)
             count_text = f"{blocks_count} objects"
             self._draw_text(count_text, x + 10, y + button_size - 30, self.font_tiny, text_color)
             
@@ -1897,33 +3001,22 @@ class QuickStart3D:
         # Close instruction
         self._draw_text("Press Z to close | Click zone to teleport", panel_x + 20, panel_y + panel_height - 30, self.font_small, (148, 163, 184))
     
-    def _draw_text(self, text, x, y, font, color):
-        """Helper to draw text using OpenGL"""
-        text_surface = font.render(text, True, color)
-        text_data = pygame.image.tostring(text_surface, "RGBA", True)
-        
-        glEnable(GL_TEXTURE_2D)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        
-        texture_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture_id)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, text_surface.get_width(), text_surface.get_height(), 
-                     0, GL_RGBA, GL_UNSIGNED_BYTE, text_data)
-        
-        glColor4f(1, 1, 1, 1)
-        glBegin(GL_QUADS)
-        glTexCoord2f(0, 1); glVertex2f(x, y)
-        glTexCoord2f(1, 1); glVertex2f(x + text_surface.get_width(), y)
-        glTexCoord2f(1, 0); glVertex2f(x + text_surface.get_width(), y + text_surface.get_height())
-        glTexCoord2f(0, 0); glVertex2f(x, y + text_surface.get_height())
-        glEnd()
-        
-        glDeleteTextures([texture_id])
-        glDisable(GL_TEXTURE_2D)
-        glDisable(GL_BLEND)
+    def print_gpu_stats(self):
+        """Print live GPU resources per kind and the cache counters"""
+        stats = self.gpu_resources.stats()
+        print(f"🎮 GPU: {stats['live']} live resources, {stats['used_bytes'] / 1048576:.1f} / "
+              f"{stats['budget_bytes'] / 1048576:.0f} MB ({stats['referenced']} in use)")
+        for kind, (count, nbytes) in sorted(stats['kinds'].items()):
+            print(f"   {kind}: {count} ({nbytes / 1048576:.2f} MB)")
+        print(f"   hits {stats['hits']}, misses {stats['misses']}, evictions {stats['evictions']}")
+    
+    def _draw_text(self, text, x, y, font, color, dynamic=False):
+        """Helper to draw text using OpenGL (cached textures, atlas for changing strings)"""
+        # Blending is set up once by draw_ui_overlay for the whole 2D pass
+        if dynamic and self.glyph_atlas.can_draw(text):
+            self.glyph_atlas.draw(text, x, y, font, color)
+        else:
+            self.text_cache.draw(text, x, y, font, color)
     
     def run(self):
         clock = pygame.time.Clock()
@@ -1943,8 +3036,67 @@ class QuickStart3D:
                     elif event.key == K_g:
                         self.show_grid = not self.show_grid
                     elif event.key == K_c:
-                        self.blocks.clear()
-                        print("🗑️ Scene cleared")
+                        if event.mod & KMOD_SHIFT:
+                            self.clear_zone(self.current_zone)
+                        else:
+                            self.clear_scene()
+                    elif event.key == K_b:
+                        if event.mod & KMOD_SHIFT:
+                            # Cycle the shape the next fill produces
+                            self.fill_shape = SHAPES[(SHAPES.index(self.fill_shape) + 1) % len(SHAPES)]
+                            print(f"📐 Fill Shape: {self.fill_shape.upper()}")
+                        else:
+                            self.set_fill_anchor()
+                    elif event.key == K_p:
+                        if event.mod & KMOD_CTRL:
+                            # Ctrl+P recaptures the active prefab, Ctrl+Shift+P deletes it
+                            if event.mod & KMOD_SHIFT:
+                                self.delete_prefab()
+                            else:
+                                self.capture_prefab(replace=True)
+                        elif event.mod & KMOD_SHIFT:
+                            self.cycle_prefab()
+                        else:
+                            self.capture_prefab()
+                    elif event.key == K_r:
+                        self.plan_route()
+                    elif event.key == K_t:
+                        self.toggle_traffic()
+                    elif event.key == K_v:
+                        self.toggle_orbits()
+                    elif event.key == K_LEFTBRACKET:
+                        self.scale_orbit_time(0.5)
+                    elif event.key == K_RIGHTBRACKET:
+                        self.scale_orbit_time(2)
+                    elif event.key == K_k:
+                        self.generate_city_zone()
+                    elif event.key == K_x:
+                        self.erase_at_cursor()
+                    elif event.key in [K_DELETE, K_BACKSPACE]:
+                        self.delete_selected()
+                    elif event.key == K_m:
+                        self.move_selected_to_cursor()
+                    elif event.key == K_F5:
+                        self.save_scene()
+                    elif event.key == K_F9:
+                        self.load_scene()
+                    elif event.key == K_F3:
+                        self.print_gpu_stats()
+                    elif event.key == K_n:
+                        # Toggle magnetic snapping to the faces of placed objects
+                        self.magnet_snap = not self.magnet_snap
+                        print(f"🧲 Magnetic Snap: {'ON' if self.magnet_snap else 'OFF'}")
+                    elif event.key == K_o:
+                        # Toggle what placing into an occupied cell does
+                        self.occupied_policy = 'replace' if self.occupied_policy == 'reject' else 'reject'
+                        print(f"🧱 Occupied Cells: {self.occupied_policy.upper()}")
+                    elif event.key == K_z and event.mod & KMOD_CTRL:
+                        if event.mod & KMOD_SHIFT:
+                            self.redo()
+                        else:
+                            self.undo()
+                    elif event.key == K_y and event.mod & KMOD_CTRL:
+                        self.redo()
                     elif event.key == K_z:
                         self.show_zone_selector = not self.show_zone_selector
                         print(f"📍 Zone Selector: {'ON' if self.show_zone_selector else 'OFF'}")
@@ -1987,8 +3139,16 @@ class QuickStart3D:
             if not ret:
                 print("❌ Failed to capture frame")
                 break
+            # Backends that hand back the previous buffer keep its timestamp (0 means none reported)
+            frame_stamp = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if not frame_stamp or frame_stamp != self.frame_stamp:
+                self.frame_id += 1
+                self.frame_stamp = frame_stamp
             
             frame = self.process_hand_tracking(frame)
+            self.stream_zones()
+            self._indexes_ready()
+            self.update_simulations()
             self.render_3d_scene()
             
             glMatrixMode(GL_PROJECTION)
@@ -2013,6 +3173,17 @@ class QuickStart3D:
             pygame.display.flip()
             clock.tick(30)
         
+        self.lod.release()
+        self.grid_geometry.release()
+        self.camera_preview.release()
+        self.text_cache.release()
+        self.glyph_atlas.release()
+        self.ui_layer.release()
+        self.zone_selector_layer.release()
+        self.sun_lighting.release()
+        self.gpu_resources.release_all()
+        self.streamer.close()
+        self.journal.close()
         self.cap.release()
         self.hands.close()
         pygame.quit()
@@ -0,0 +1,144 @@
+"""
+Render caches for AI Hand Builder
+Precompiled unit-size display lists for quadric assets with distance-based level of detail,
+scaled at draw time and held in the GPU resource manager
+"""
+
+import math
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+import config
+
+
+class QuadricLOD:
+    def __init__(self, resources, viewport_height, fov_y=60):
+        """Create a LOD cache matching a gluPerspective projection"""
+        self.resources = resources
+        # Pixels covered by one world unit seen from one unit away
+        self.pixels_per_unit = viewport_height / (2 * math.tan(math.radians(fov_y) / 2))
+        self.quadric = None
+        # While another display list is being recorded, quadrics are drawn inline at full detail
+        self.recording = False
+        self.eye = (0.0, 0.0, 0.0)
+        self.distance = 1.0
+
+    def set_eye(self, eye):
+        """Set the camera position used for this frame's LOD selection"""
+        self.eye = tuple(eye)
+
+    def focus(self, position):
+        """Measure the distance to the object about to be drawn"""
+        dx = position[0] - self.eye[0]
+        dy = position[1] - self.eye[1]
+        dz = position[2] - self.eye[2]
+        self.distance = max(math.sqrt(dx * dx + dy * dy + dz * dz), 0.1)
+
+    def level_for(self, radius):
+        """Pick a detail level (0 = full) from the projected radius in pixels"""
+        if self.recording:
+            return 0
+        pixels = radius * self.pixels_per_unit / self.distance
+        for level, threshold in enumerate(config.LOD_PIXEL_THRESHOLDS):
+            if pixels >= threshold:
+                return level
+        return len(config.LOD_PIXEL_THRESHOLDS)
+
+    def _tessellation(self, slices, stacks, level):
+        """Halve the full-detail tessellation once per level"""
+        slices = max(min(slices, config.LOD_MIN_SLICES), slices >> level)
+        stacks = max(min(stacks, 2), stacks >> level)
+        return slices, stacks
+
+    def _quadric(self):
+        """Shared GLU quadric, acquired on first use"""
+        if self.quadric is None:
+            self.quadric = self.resources.acquire(('quadric',), 'quadric', gluNewQuadric, keep=True)
+        return self.quadric
+
+    def _compile(self, draw):
+        """Record a quadric draw into a new display list"""
+        display_list = glGenLists(1)
+        glNewList(display_list, GL_COMPILE)
+        draw(self._quadric())
+        glEndList()
+        return display_list
+
+    def _call(self, key, draw, slices, stacks, scale):
+        """Replay a unit-size display list (compiled on first use or after eviction) scaled to size"""
+        glPushMatrix()
+        glScalef(*scale)
+        if self.recording:
+            # Display lists cannot be compiled while another is being recorded
+            draw(self._quadric())
+        else:
+            display_list = self.resources.get(key)
+            if display_list is None:
+                # Approximate size: one position + normal per tessellation vertex
+                nbytes = (slices + 1) * (stacks + 1) * 24
+                display_list = self.resources.cache(key, 'display_list', lambda: self._compile(draw), nbytes)
+            glCallList(display_list)
+        glPopMatrix()
+
+    def sphere(self, radius, slices, stacks):
+        """Draw a sphere; slices/stacks are the full-detail tessellation"""
+        slices, stacks = self._tessellation(slices, stacks, self.level_for(radius))
+        self._call(('lod', 'sphere', slices, stacks),
+                   lambda quadric: gluSphere(quadric, 1, slices, stacks), slices, stacks, (radius, radius, radius))
+
+    def cylinder(self, base, top, height, slices, stacks):
+        """Draw a cylinder along +Z; slices/stacks are the full-detail tessellation"""
+        level = self.level_for(max(base, top, height / 2))
+        slices, stacks = self._tessellation(slices, stacks, level)
+        # Lists are shared per taper: the wider end has radius 1 and the height is 1
+        width = max(base, top) or 1.0
+        taper = (round(base / width, 3), round(top / width, 3))
+        self._call(('lod', 'cylinder') + taper + (slices, stacks),
+                   lambda quadric: gluCylinder(quadric, taper[0], taper[1], 1, slices, stacks), slices, stacks,
+                   (width, width, height))
+
+    def disk(self, inner, outer, slices, loops):
+        """Draw a disk in the XY plane; slices/loops are the full-detail tessellation"""
+        slices, loops = self._tessellation(slices, loops, self.level_for(outer))
+        # Lists are shared per hole size: the outer radius is 1
+        hole = round(inner / outer, 3) if outer else 0.0
+        self._call(('lod', 'disk', hole, slices, loops),
+                   lambda quadric: gluDisk(quadric, hole, 1, slices, loops), slices, loops, (outer, outer, 1))
+
+    def release(self):
+        """Drop the shared quadric (cached display lists are evicted by the manager)"""
+        if self.quadric is not None:
+            self.resources.release(('quadric',))
+            self.quadric = None
+
+
+class BakedGeometry:
+    def __init__(self, resources, build):
+        """Wrap a draw function whose output depends only on a state key"""
+        self.resources = resources
+        self.build = build
+        self.key = None
+        self.display_list = None
+
+    def draw(self, key):
+        """Replay the baked geometry, re-baking first if the key changed"""
+        if self.display_list is None:
+            self.display_list = self.resources.acquire((self, 'display_list'), 'display_list',
+                                                       lambda: glGenLists(1))
+        if key != self.key:
+            glNewList(self.display_list, GL_COMPILE)
+            self.build()
+            glEndList()
+            self.key = key
+        glCallList(self.display_list)
+
+    def invalidate(self):
+        """Force a re-bake on the next draw"""
+        self.key = None
+
+    def release(self):
+        """Delete the display list"""
+        if self.display_list is not None:
+            self.resources.release((self, 'display_list'))
+            self.display_list = None
+        self.key = None
@@ -0,0 +1,259 @@
+"""
+Road network for AI Hand Builder
+Connectivity graph of placed road tiles kept up to date edit by edit: a cell index finds
+touching tiles, union-find tracks connected components, and A* answers route queries
+"""
+
+from collections import deque
+import heapq
+import math
+
+
+# Cells sharing an edge with a cell (and the cell itself: overlapping tiles touch too)
+TOUCHING = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class RoadNetwork:
+    def __init__(self):
+        """Empty network; roads are added with their x/z cells and center"""
+        self.cell_roads = {}   # (x, z) cell -> ids of the roads covering it
+        self.road_cells = {}   # road id -> its cells
+        self.centers = {}      # road id -> (x, z) world center
+        self.neighbours = {}   # road id -> ids of touching roads
+        # Union-find forest over node numbers; removed dead ends stay behind as inner nodes, so
+        # nodes are never reused even when a road id is
+        self.nodes = {}        # road id -> node
+        self.parent = {}       # node -> parent node
+        self.members = {}      # root node -> ids of the roads in its component
+        self.next_node = 0
+        self.retired = 0       # Inner nodes left by removed roads
+        self.version = 0       # Bumped on every change (for cached queries)
+        self._disconnected = (None, set())
+
+    def __len__(self):
+        return len(self.road_cells)
+
+    def __contains__(self, road_id):
+        return road_id in self.road_cells
+
+    def clear(self):
+        """Forget every road"""
+        self.__init__()
+
+    def _root(self, node):
+        """Root of a node (with path halving)"""
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def find(self, road_id):
+        """Component of a road (its root node)"""
+        return self._root(self.nodes[road_id])
+
+    def _union(self, a, b):
+        """Merge the components of two roads (smaller under larger)"""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if len(self.members[a]) < len(self.members[b]):
+            a, b = b, a
+        self.parent[b] = a
+        self.members[a] |= self.members.pop(b)
+
+    def add(self, road_id, cells, center):
+        """Add a road covering the given cells; it joins every component it touches"""
+        if road_id in self.road_cells:
+            self.remove(road_id)
+        cells = set(cells)
+        touching = set()
+        for x, z in cells:
+            for dx, dz in TOUCHING:
+                touching.update(self.cell_roads.get((x + dx, z + dz), ()))
+        for cell in cells:
+            self.cell_roads.setdefault(cell, set()).add(road_id)
+        self.road_cells[road_id] = cells
+        self.centers[road_id] = center
+        self.neighbours[road_id] = touching
+        node = self.next_node
+        self.next_node += 1
+        self.nodes[road_id] = node
+        self.parent[node] = node
+        self.members[node] = {road_id}
+        for other in touching:
+            self.neighbours[other].add(road_id)
+            self._union(road_id, other)
+        self.version += 1
+
+    def remove(self, road_id):
+        """Remove a road; only pieces of its component that it was the last link to are re-labelled"""
+        cells = self.road_cells.pop(road_id, None)
+        if cells is None:
+            return False
+        for cell in cells:
+            roads = self.cell_roads[cell]
+            roads.discard(road_id)
+            if not roads:
+                del self.cell_roads[cell]
+        del self.centers[road_id]
+        touching = self.neighbours.pop(road_id)
+        for other in touching:
+            self.neighbours[other].discard(road_id)
+        self.version += 1
+
+        node = self.nodes.pop(road_id)
+        root = self._root(node)
+        self.members[root].discard(road_id)
+        if not touching:
+            del self.members[root]
+            del self.parent[node]
+            return True
+
+        # The removed road's node stays as an inner node of the forest; a dead end cannot split anything
+        self.retired += 1
+        if len(touching) > 1:
+            for piece in self._split_off(touching):
+                # Its old nodes stay behind as inner nodes of the remaining component
+                self.members[root].difference_update(piece)
+                self.retired += len(piece)
+                self._new_component(piece)
+        if self.retired > len(self.road_cells):
+            self._reunion()
+        return True
+
+    def _split_off(self, starts):
+        """
+        Pieces cut off from each other after a removal, searching from each of the removed road's
+        neighbours in turn: searches that meet merge, and one that runs out of roads has walked a piece
+        that split off. The search left last is the remaining component and is never walked in full.
+        """
+        owner = {}      # road id -> search that reached it
+        merged = {}     # search -> search it merged into
+        found = {}      # search -> roads it reached
+        frontier = {}   # search -> roads still to expand
+        for search, road_id in enumerate(starts):
+            owner[road_id] = search
+            merged[search] = search
+            found[search] = [road_id]
+            frontier[search] = deque([road_id])
+
+        def leader(search):
+            while merged[search] != search:
+                search = merged[search]
+            return search
+
+        pieces = []
+        while len(frontier) > 1:
+            for search in list(frontier):
+                if len(frontier) == 1:
+                    break
+                if search not in frontier:
+                    continue
+                if not frontier[search]:
+                    del frontier[search]
+                    pieces.append(found.pop(search))
+                    continue
+                for other in self.neighbours[frontier[search].popleft()]:
+                    reached = owner.get(other)
+                    if reached is None:
+                        owner[other] = search
+                        found[search].append(other)
+                        frontier[search].append(other)
+                        continue
+                    reached = leader(reached)
+                    if reached != search:
+                        # The two searches meet: same piece, continue as one (smaller into larger)
+                        if len(found[reached]) > len(found[search]):
+                            search, reached = reached, search
+                        merged[reached] = search
+                        found[search].extend(found.pop(reached))
+                        frontier[search].extend(frontier.pop(reached))
+        return pieces
+
+    def _new_component(self, roads):
+        """Give roads forming one component fresh nodes under a single new root"""
+        root = None
+        for road_id in roads:
+            node = self.next_node
+            self.next_node += 1
+            self.nodes[road_id] = node
+            if root is None:
+                root = node
+            self.parent[node] = root
+        self.members[root] = set(roads)
+
+    def _reunion(self):
+        """Re-label every component from the edges, dropping retired inner nodes"""
+        self.parent = {}
+        self.members = {}
+        self.retired = 0
+        seen = set()
+        for road_id in self.road_cells:
+            if road_id in seen:
+                continue
+            component = {road_id}
+            stack = [road_id]
+            while stack:
+                for other in self.neighbours[stack.pop()]:
+                    if other not in component:
+                        component.add(other)
+                        stack.append(other)
+            seen |= component
+            self._new_component(component)
+
+    def connected(self, a, b):
+        """True if two roads are in the same component"""
+        return a in self.road_cells and b in self.road_cells and self.find(a) == self.find(b)
+
+    def component_count(self):
+        """Number of separate road networks"""
+        return len(self.members)
+
+    def disconnected(self):
+        """Ids of roads outside the largest component (cached until the next edit)"""
+        version, roads = self._disconnected
+        if version != self.version:
+            roads = set()
+            if len(self.members) > 1:
+                # Gathered from the per-component member sets, without walking the main network
+                main = max(self.members, key=lambda root: len(self.members[root]))
+                roads = roads.union(*(members for root, members in self.members.items() if root != main))
+            self._disconnected = (self.version, roads)
+        return roads
+
+    def road_at(self, cell):
+        """Id of a road covering a cell, or None"""
+        roads = self.cell_roads.get(cell)
+        return min(roads) if roads else None
+
+    def shortest_path(self, start, goal):
+        """Roads from `start` to `goal` along touching tiles (A* on center distance), or None"""
+        if not self.connected(start, goal):
+            return None
+        centers = self.centers
+        gx, gz = centers[goal]
+
+        def estimate(road_id):
+            x, z = centers[road_id]
+            return math.hypot(gx - x, gz - z)
+
+        best = {start: 0.0}
+        came_from = {}
+        frontier = [(estimate(start), start)]
+        while frontier:
+            _, road_id = heapq.heappop(frontier)
+            if road_id == goal:
+                path = [goal]
+                while path[-1] != start:
+                    path.append(came_from[path[-1]])
+                return path[::-1]
+            x, z = centers[road_id]
+            for other in self.neighbours[road_id]:
+                ox, oz = centers[other]
+                cost = best[road_id] + math.hypot(ox - x, oz - z)
+                if cost < best.get(other, math.inf):
+                    best[other] = cost
+                    came_from[other] = road_id
+                    heapq.heappush(frontier, (cost + estimate(other), other))
+        return None
@@ -0,0 +1,160 @@
+"""
+Scene files for AI Hand Builder
+Versioned binary format: interned name tables, then one section of quantized records per zone.
+Loading memory-maps the file and decodes each section straight into the scene store columns
+"""
+
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+import config
+from scene_store import TYPES, ASSETS, ASSET_CODES, MODES, MODE_CODES, ZONES, ZONE_CODES, TYPE_CODES
+
+
+MAGIC = b'AHBS'
+VERSION = 1
+
+# magic, version, flags, object count, section count, name table length
+HEADER = struct.Struct('<4sHHIII')
+# zone code, object count, position scale, byte offset of the records
+SECTION = struct.Struct('<BxxxIfQ')
+
+# Positions are zone-relative fixed point (int16 * 1/scale), sizes half floats, colors bytes
+RECORD = np.dtype([
+    ('position', '<i2', 3),
+    ('size', '<f2', 3),
+    ('color', 'u1', 3),
+    ('type', 'u1'),
+    ('asset', 'u1'),
+    ('mode', 'u1'),
+    ('flags', 'u1')
+])
+FLAG_SNAPPED = 1
+
+# Finest position step is 1/64 world unit; coarser only for zones that spread very wide
+MAX_POSITION_SCALE = 64.0
+
+
+def name_tables():
+    """Name tables written into the file so codes survive config changes"""
+    return {
+        'types': list(TYPES),
+        'assets': [list(ASSETS[code]) for code in range(len(TYPES))],
+        'zones': list(ZONES),
+        'modes': list(MODES)
+    }
+
+
+def _position_scale(relative):
+    """Largest power-of-two scale (<= MAX_POSITION_SCALE) that fits positions into int16"""
+    extent = float(np.abs(relative).max()) if len(relative) else 0.0
+    scale = MAX_POSITION_SCALE
+    while scale > 2 ** -16 and extent * scale > 32767:
+        scale /= 2
+    return scale
+
+
+def save_scene(path, store):
+    """Write every live object to `path` (atomically); returns their ids in file order"""
+    tables = json.dumps(name_tables(), separators=(',', ':')).encode('utf-8')
+    sections = []
+    written = []
+    for zone in ZONES:
+        ids = store.zone_object_ids(zone)
+        if len(ids) == 0:
+            continue
+        origin = np.array(config.ZONES[zone]['position'], dtype=np.float32)
+        relative = store.positions[ids] - origin
+        scale = _position_scale(relative)
+
+        records = np.zeros(len(ids), dtype=RECORD)
+        records['position'] = np.round(relative * scale)
+        records['size'] = store.sizes[ids]
+        records['color'] = np.round(np.clip(store.colors[ids], 0, 1) * 255)
+        records['type'] = store.types[ids]
+        records['asset'] = store.assets[ids]
+        records['mode'] = store.modes[ids]
+        records['flags'] = np.where(store.snapped[ids], FLAG_SNAPPED, 0)
+        sections.append((ZONE_CODES[zone], scale, records))
+        written.append(ids)
+
+    count = sum(len(records) for _, _, records in sections)
+    offset = HEADER.size + len(tables) + SECTION.size * len(sections)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, count, len(sections), len(tables)))
+        f.write(tables)
+        for zone_code, scale, records in sections:
+            f.write(SECTION.pack(zone_code, len(records), scale, offset))
+            offset += records.nbytes
+        for _, _, records in sections:
+            f.write(records.tobytes())
+    os.replace(temp_path, path)
+    return np.concatenate(written) if written else np.zeros(0, dtype=np.int64)
+
+
+def code_maps(tables):
+    """Lookup arrays from the file's codes to this build's codes"""
+    try:
+        type_map = np.array([TYPE_CODES[name] for name in tables['types']], dtype=np.uint8)
+        zone_map = [ZONE_CODES[name] for name in tables['zones']]
+        mode_map = np.array([MODE_CODES[name] for name in tables['modes']], dtype=np.uint8)
+        asset_map = np.zeros((len(tables['types']), 256), dtype=np.uint8)
+        for file_type, names in enumerate(tables['assets']):
+            codes = ASSET_CODES[type_map[file_type]]
+            asset_map[file_type, :len(names)] = [codes[name] for name in names]
+    except KeyError as e:
+        raise ValueError(f"scene uses unknown name {e}")
+    return type_map, zone_map, mode_map, asset_map
+
+
+def object_count(path):
+    """Number of objects in a scene file, from its header only"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size or header[:4] != MAGIC:
+        raise ValueError("not a scene file")
+    return HEADER.unpack(header)[3]
+
+
+def load_scene(path, store):
+    """Memory-map a scene file and add its objects to the store; returns the new ids"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < HEADER.size:
+            raise ValueError("not a scene file")
+        magic, version, _, count, section_count, table_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a scene file")
+        if version > VERSION:
+            raise ValueError(f"scene file version {version} is newer than supported ({VERSION})")
+
+        tables = json.loads(bytes(data[HEADER.size:HEADER.size + table_length]).decode('utf-8'))
+        type_map, zone_map, mode_map, asset_map = code_maps(tables)
+
+        ids = []
+        section_at = HEADER.size + table_length
+        for index in range(section_count):
+            zone_code, object_count, scale, offset = SECTION.unpack_from(data, section_at + index * SECTION.size)
+            zone = zone_map[zone_code]
+            # Zero-copy view of the section; decoding writes directly into the store columns
+            records = np.frombuffer(data, dtype=RECORD, count=object_count, offset=offset)
+            origin = np.array(config.ZONES[ZONES[zone]]['position'], dtype=np.float32)
+            file_types = records['type']
+            ids.append(store.add_many(
+                records['position'].astype(np.float32) / scale + origin,
+                records['size'].astype(np.float32),
+                records['color'].astype(np.float32) / 255,
+                type_map[file_types],
+                asset_map[file_types, records['asset']],
+                np.full(object_count, zone, dtype=np.uint8),
+                mode_map[records['mode']],
+                (records['flags'] & FLAG_SNAPPED) != 0
+            ))
+            del records, file_types
+    ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+    if len(ids) != count:
+        raise ValueError(f"scene file is damaged ({len(ids)} of {count} objects)")
+    return ids
@@ -0,0 +1,391 @@
+"""
+Scene store for AI Hand Builder
+Struct-of-arrays storage for placed objects with integer-coded type, asset, zone and mode
+"""
+
+import time
+import numpy as np
+
+import config
+
+
+# Object types (block 'type' field)
+TYPES = ('cube', 'building', 'city', 'sphere', 'prefab')
+TYPE_CUBE, TYPE_BUILDING, TYPE_CITY, TYPE_SPHERE, TYPE_PREFAB = range(len(TYPES))
+
+# Asset names are interned per type; code 0 means "no asset"
+ASSETS = {
+    TYPE_CUBE: ('',),
+    TYPE_BUILDING: ('',) + tuple(config.BUILDING_PARTS),
+    TYPE_CITY: ('',) + tuple(config.CITY_ASSETS),
+    TYPE_SPHERE: ('',) + tuple(config.SOLAR_OBJECTS),
+    TYPE_PREFAB: ('',) + tuple(f"prefab{slot}" for slot in range(1, config.PREFAB_SLOTS + 1))
+}
+ASSET_CODES = {
+    type_code: {name: code for code, name in enumerate(names)}
+    for type_code, names in ASSETS.items()
+}
+
+MODES = tuple(config.BUILD_MODES)
+ZONES = tuple(config.ZONES)
+MODE_CODES = {name: code for code, name in enumerate(MODES)}
+ZONE_CODES = {name: code for code, name in enumerate(ZONES)}
+TYPE_CODES = {name: code for code, name in enumerate(TYPES)}
+
+# Column name, per-row shape, dtype
+COLUMNS = (
+    ('positions', (3,), np.float32),
+    ('sizes', (3,), np.float32),
+    ('colors', (3,), np.float32),
+    ('types', (), np.uint8),
+    ('assets', (), np.uint8),
+    ('zones', (), np.uint8),
+    ('modes', (), np.uint8),
+    ('snapped', (), np.bool_),
+    ('alive', (), np.bool_)
+)
+
+
+def _anchor_lifts():
+    """
+    Share of an object's height between its position and its box center, per type and asset code:
+    0.5 for assets drawn upwards from their position ('anchor': 'base'), 0 for centered ones
+    """
+    lifts = np.zeros((len(TYPES), max(len(names) for names in ASSETS.values())), dtype=np.float32)
+    for type_code, assets in ((TYPE_BUILDING, config.BUILDING_PARTS), (TYPE_CITY, config.CITY_ASSETS)):
+        for name, data in assets.items():
+            if data.get('anchor') == 'base':
+                lifts[type_code, ASSET_CODES[type_code][name]] = 0.5
+    return lifts
+
+
+ANCHOR_LIFT = _anchor_lifts()
+
+# Zone centers on the ground plane (x, z), in zone code order
+ZONE_CENTERS = np.array([config.ZONES[zone]['position'] for zone in ZONES], dtype=np.float32)[:, [0, 2]]
+
+
+def zone_codes_at(positions):
+    """Code of the zone each world position falls in (the one with the nearest center on x/z)"""
+    offsets = np.asarray(positions, dtype=np.float32)[:, None, [0, 2]] - ZONE_CENTERS[None]
+    return np.argmin((offsets ** 2).sum(axis=2), axis=1).astype(np.uint8)
+
+
+def object_extents(type_name, size):
+    """Full box extents of an object (spheres store their radius as the size)"""
+    if type_name == 'sphere':
+        return [size[0] * 2] * 3
+    return list(size)
+
+
+def object_lift(type_name, asset_name):
+    """Share of the height an object's box center sits above its position"""
+    type_code = TYPE_CODES[type_name]
+    return float(ANCHOR_LIFT[type_code, ASSET_CODES[type_code][asset_name or '']])
+
+
+def object_box(type_name, asset_name, position, size):
+    """Box center and full extents of an object placed at `position`"""
+    extents = object_extents(type_name, size)
+    center = list(position)
+    center[1] += object_lift(type_name, asset_name) * extents[1]
+    return center, extents
+
+
+def anchored_boxes(positions, sizes, types, assets):
+    """Box centers and half extents (n, 3) of objects given as coded columns"""
+    half = np.asarray(sizes, dtype=np.float32) / 2
+    half[types == TYPE_SPHERE] *= 2
+    centers = np.array(positions, dtype=np.float32)
+    centers[:, 1] += ANCHOR_LIFT[types, assets] * half[:, 1] * 2
+    return centers, half
+
+
+class SceneStore:
+    def __init__(self, capacity=1024):
+        """Create an empty store with room for `capacity` objects before growing"""
+        self.capacity = 0
+        self.high_water = 0   # Slots [0, high_water) have been used at least once
+        self.count = 0
+        self.free_slots = []
+        self._allocate(capacity)
+        self._reset_zones()
+
+    def _reset_zones(self):
+        """Empty per-zone statistics (membership itself is the zones column)"""
+        self.zone_type_counts = np.zeros((len(ZONES), len(TYPES)), dtype=np.int64)
+        self.zone_modified = [0.0] * len(ZONES)
+        # Bounds grow on add; only a removal touching them drops them until zone_stats() recomputes
+        self.zone_bounds = [None] * len(ZONES)
+
+    def _zone_added(self, zone_code, object_id):
+        """Record an object joining a zone"""
+        self.zone_type_counts[zone_code, self.types[object_id]] += 1
+        self.zone_modified[zone_code] = time.time()
+        self._grow_bounds(zone_code, [object_id])
+
+    def _zone_removed(self, zone_code, object_id):
+        """Record an object leaving a zone"""
+        self.zone_type_counts[zone_code, self.types[object_id]] -= 1
+        self.zone_modified[zone_code] = time.time()
+        self._shrink_bounds(zone_code, [object_id])
+
+    def _grow_bounds(self, zone_code, ids):
+        """Extend a zone's bounds by objects that joined it (unknown bounds stay unknown)"""
+        bounds = self.zone_bounds[zone_code]
+        if bounds is None and self.zone_type_counts[zone_code].sum() != len(ids):
+            return
+        centers, half = self.boxes(ids)
+        low, high = (centers - half).min(axis=0), (centers + half).max(axis=0)
+        if bounds is not None:
+            low, high = np.minimum(bounds[0], low), np.maximum(bounds[1], high)
+        self.zone_bounds[zone_code] = (low, high)
+
+    def _shrink_bounds(self, zone_code, ids):
+        """Drop a zone's bounds only if a leaving object touched them"""
+        bounds = self.zone_bounds[zone_code]
+        if bounds is None:
+            return
+        if not self.zone_type_counts[zone_code].any():
+            self.zone_bounds[zone_code] = None
+            return
+        centers, half = self.boxes(ids)
+        if ((centers - half <= bounds[0]).any() or (centers + half >= bounds[1]).any()):
+            self.zone_bounds[zone_code] = None
+
+    def _allocate(self, capacity):
+        """Grow every column to the new capacity, keeping existing rows"""
+        for name, shape, dtype in COLUMNS:
+            column = np.zeros((capacity,) + shape, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                column[:len(old)] = old
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def _take_slot(self):
+        """Reuse a freed slot or append one, growing geometrically"""
+        if self.free_slots:
+            return self.free_slots.pop()
+        if self.high_water == self.capacity:
+            self._allocate(self.capacity * 2)
+        slot = self.high_water
+        self.high_water += 1
+        return slot
+
+    def add(self, position, size, color, type_name, asset_name, zone, mode, snapped=False):
+        """Add one object and return its id (stable until it is removed)"""
+        type_code = TYPE_CODES[type_name]
+        slot = self._take_slot()
+        self.positions[slot] = position
+        self.sizes[slot] = size
+        self.colors[slot] = color
+        self.types[slot] = type_code
+        self.assets[slot] = ASSET_CODES[type_code][asset_name or '']
+        self.zones[slot] = ZONE_CODES[zone]
+        self.modes[slot] = MODE_CODES[mode]
+        self.snapped[slot] = snapped
+        self.alive[slot] = True
+        self.count += 1
+        self._zone_added(self.zones[slot], slot)
+        return slot
+
+    def add_many(self, positions, sizes, colors, types, assets, zones, modes, snapped):
+        """Add objects from already-coded column arrays; returns their ids"""
+        count = len(positions)
+        reused = self.free_slots[-count:] if count else []
+        del self.free_slots[len(self.free_slots) - len(reused):]
+        fresh = count - len(reused)
+        if self.high_water + fresh > self.capacity:
+            capacity = self.capacity
+            while capacity < self.high_water + fresh:
+                capacity *= 2
+            self._allocate(capacity)
+        ids = np.concatenate([np.array(reused, dtype=np.int64),
+                              np.arange(self.high_water, self.high_water + fresh, dtype=np.int64)])
+        self.high_water += fresh
+
+        self.positions[ids] = positions
+        self.sizes[ids] = sizes
+        self.colors[ids] = colors
+        self.types[ids] = types
+        self.assets[ids] = assets
+        self.zones[ids] = zones
+        self.modes[ids] = modes
+        self.snapped[ids] = snapped
+        self.alive[ids] = True
+        self.count += count
+        self._zones_changed(ids, 1)
+        return ids
+
+    def _zones_changed(self, ids, sign):
+        """Zone statistics and bounds in bulk for objects added (+1) or removed (-1)"""
+        zones = self.zones[ids]
+        np.add.at(self.zone_type_counts, (zones, self.types[ids]), sign)
+        now = time.time()
+        for zone_code in np.unique(zones).tolist():
+            members = ids[zones == zone_code]
+            if sign > 0:
+                self._grow_bounds(zone_code, members)
+            else:
+                self._shrink_bounds(zone_code, members)
+            self.zone_modified[zone_code] = now
+
+    def remove(self, object_id, retain=False):
+        """Remove an object; its slot is recycled by a later add unless retained for restore()"""
+        if not self.alive[object_id]:
+            return False
+        self.alive[object_id] = False
+        if not retain:
+            self.free_slots.append(object_id)
+        self.count -= 1
+        self._zone_removed(self.zones[object_id], object_id)
+        return True
+
+    def remove_many(self, ids, retain=False):
+        """Remove several live objects at once (slots kept for restore() if retained)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        self.alive[ids] = False
+        if not retain:
+            self.free_slots.extend(ids.tolist())
+        self.count -= len(ids)
+        self._zones_changed(ids, -1)
+
+    def restore(self, ids):
+        """Bring back objects removed with retain=True, with their old ids and data"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        self.alive[ids] = True
+        self.count += len(ids)
+        self._zones_changed(ids, 1)
+
+    def release_slots(self, ids):
+        """Let later adds reuse the slots of retained objects that stayed removed"""
+        ids = np.asarray(ids, dtype=np.int64)
+        self.free_slots.extend(ids[~self.alive[ids]].tolist())
+
+    def subset(self, ids):
+        """New store holding copies of the given objects"""
+        other = SceneStore(max(len(ids), 1))
+        other.add_many(self.positions[ids], self.sizes[ids], self.colors[ids], self.types[ids],
+                       self.assets[ids], self.zones[ids], self.modes[ids], self.snapped[ids])
+        return other
+
+    def absorb(self, other):
+        """Add every live object of another store; returns the new ids"""
+        ids = other.ids()
+        return self.add_many(other.positions[ids], other.sizes[ids], other.colors[ids], other.types[ids],
+                             other.assets[ids], other.zones[ids], other.modes[ids], other.snapped[ids])
+
+    def move(self, object_id, position, zone, snapped):
+        """Set an object's position and the zone it belongs to"""
+        self._zone_removed(self.zones[object_id], object_id)
+        self.positions[object_id] = position
+        self.zones[object_id] = ZONE_CODES[zone]
+        self.snapped[object_id] = snapped
+        self._zone_added(self.zones[object_id], object_id)
+
+    def clear(self):
+        """Remove every object (capacity is kept)"""
+        self.alive[:self.high_water] = False
+        self.high_water = 0
+        self.count = 0
+        self.free_slots = []
+        now = time.time()
+        self._reset_zones()
+        self.zone_modified = [now] * len(ZONES)
+
+    def copy(self):
+        """Independent copy of the store (e.g. to write a snapshot on another thread)"""
+        other = SceneStore.__new__(SceneStore)
+        other.__dict__.update(self.__dict__)
+        for name, _, _ in COLUMNS:
+            setattr(other, name, getattr(self, name).copy())
+        other.free_slots = list(self.free_slots)
+        other.zone_type_counts = self.zone_type_counts.copy()
+        other.zone_modified = list(self.zone_modified)
+        other.zone_bounds = list(self.zone_bounds)
+        return other
+
+    def ids(self):
+        """Ids of all live objects, in slot order"""
+        return np.flatnonzero(self.alive[:self.high_water])
+
+    def asset_name(self, object_id):
+        """Asset name of an object ('' if none)"""
+        return ASSETS[int(self.types[object_id])][int(self.assets[object_id])]
+
+    def get(self, object_id):
+        """Return one object as a dict (same keys as the old block dicts)"""
+        type_code = int(self.types[object_id])
+        return {
+            'position': self.positions[object_id].tolist(),
+            'size': self.sizes[object_id].tolist(),
+            'color': self.colors[object_id].tolist(),
+            'type': TYPES[type_code],
+            'asset_type': self.asset_name(object_id) or None,
+            'zone': ZONES[self.zones[object_id]],
+            'mode': MODES[self.modes[object_id]]
+        }
+
+    def ids_of(self, type_name, asset_name):
+        """Ids of live objects with a given type and asset"""
+        type_code = TYPE_CODES[type_name]
+        live = self.alive[:self.high_water]
+        return np.flatnonzero(live & (self.types[:self.high_water] == type_code)
+                              & (self.assets[:self.high_water] == ASSET_CODES[type_code][asset_name]))
+
+    def half_extents(self, ids):
+        """Half box extents of several objects, as an (n, 3) array"""
+        half = self.sizes[ids] / 2
+        spheres = self.types[ids] == TYPE_SPHERE
+        half[spheres] *= 2
+        return half
+
+    def boxes(self, ids):
+        """Anchored boxes of several objects as (centers, half extents), each (n, 3)"""
+        return anchored_boxes(self.positions[ids], self.sizes[ids], self.types[ids], self.assets[ids])
+
+    def count_in_zone(self, zone):
+        """Number of live objects in a zone"""
+        return int(self.zone_type_counts[ZONE_CODES[zone]].sum())
+
+    def zone_counts(self, zone):
+        """Object count and counts by type of a zone, without touching its bounds"""
+        type_counts = self.zone_type_counts[ZONE_CODES[zone]]
+        return {
+            'count': int(type_counts.sum()),
+            'by_type': {name: int(n) for name, n in zip(TYPES, type_counts) if n}
+        }
+
+    def zone_code(self, zone):
+        """Integer code of a zone name"""
+        return ZONE_CODES[zone]
+
+    def zone_object_ids(self, zone):
+        """Ids of a zone's live objects, in slot order"""
+        return np.flatnonzero(self.alive[:self.high_water] & (self.zones[:self.high_water] == ZONE_CODES[zone]))
+
+    def zone_stats(self, zone):
+        """Object count, counts by type, bounding box and last-modified time of a zone"""
+        zone_code = ZONE_CODES[zone]
+        stats = self.zone_counts(zone)
+        bounds = self.zone_bounds[zone_code]
+        if bounds is None and stats['count']:
+            # Recompute from the zone's own objects only
+            centers, half = self.boxes(self.zone_object_ids(zone))
+            bounds = ((centers - half).min(axis=0), (centers + half).max(axis=0))
+            self.zone_bounds[zone_code] = bounds
+        stats['bounds'] = None if bounds is None else (bounds[0].tolist(), bounds[1].tolist())
+        stats['modified'] = self.zone_modified[zone_code]
+        return stats
+
+    def nbytes(self):
+        """Memory used by the column arrays"""
+        return sum(getattr(self, name).nbytes for name, _, _ in COLUMNS)
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,227 @@
+"""
+Magnetic snapping for AI Hand Builder
+Bulk-loaded point trees over the attachment points of placed objects (side and top face centers)
+"""
+
+import itertools
+import numpy as np
+
+from picking import morton_order
+
+
+# Face normals of the attachment points on each object: +x, -x, +z, -z, top
+NORMALS = np.array([(1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, 0, -1), (0, 1, 0)], dtype=np.float32)
+
+# Points per tree leaf (searched with one vectorised distance pass)
+LEAF_SIZE = 16
+
+
+def attachment_points(position, half_extents):
+    """Face-center attachment points of one box, as (points, normals)"""
+    position = np.asarray(position, dtype=np.float32)
+    half = np.asarray(half_extents, dtype=np.float32)
+    return position + NORMALS * half, NORMALS
+
+
+def _gap(low, high, query):
+    """Squared distance from a point to a box (0 inside; inf for an empty box)"""
+    total = 0.0
+    for axis in range(3):
+        if query[axis] < low[axis]:
+            total += (low[axis] - query[axis]) ** 2
+        elif query[axis] > high[axis]:
+            total += (query[axis] - high[axis]) ** 2
+    return total
+
+
+class PointTree:
+    def __init__(self, points):
+        """
+        Build a static tree over an (n, 3) array of points, bulk-loaded in NumPy: points are
+        ordered along a Z-order curve, cut into leaves, and node boxes are merged up a binary heap
+        """
+        self.points = np.asarray(points, dtype=np.float32)
+        self.order = morton_order(self.points)
+        count = len(self.points)
+        leaves = max(1, -(-count // LEAF_SIZE))
+        # Heap layout: node i has children 2i and 2i + 1; leaves start at `first_leaf`
+        self.first_leaf = 1 << (leaves - 1).bit_length()
+        lows = np.full((2 * self.first_leaf, 3), np.inf)
+        highs = np.full((2 * self.first_leaf, 3), -np.inf)
+        if count:
+            ordered = self.points[self.order]
+            starts = np.arange(0, count, LEAF_SIZE)
+            lows[self.first_leaf:self.first_leaf + leaves] = np.minimum.reduceat(ordered, starts, axis=0)
+            highs[self.first_leaf:self.first_leaf + leaves] = np.maximum.reduceat(ordered, starts, axis=0)
+        width = self.first_leaf // 2
+        while width:
+            nodes = np.arange(width, 2 * width)
+            lows[nodes] = np.minimum(lows[2 * nodes], lows[2 * nodes + 1])
+            highs[nodes] = np.maximum(highs[2 * nodes], highs[2 * nodes + 1])
+            width //= 2
+        # Python lists: the search reads one box at a time
+        self.lows = list(zip(*lows.T.tolist()))
+        self.highs = list(zip(*highs.T.tolist()))
+
+    def nearest(self, query, max_distance, skip=None):
+        """Index of the nearest point within max_distance (ignoring `skip` mask), or None"""
+        if len(self.points) == 0:
+            return None
+        query = np.asarray(query, dtype=np.float32)
+        point = query.tolist()
+        best_index, best_sq = None, max_distance * max_distance
+
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if _gap(self.lows[node], self.highs[node], point) >= best_sq:
+                continue
+            if node >= self.first_leaf:
+                start = (node - self.first_leaf) * LEAF_SIZE
+                indices = self.order[start:start + LEAF_SIZE]
+                delta = self.points[indices] - query
+                distances = np.einsum('ij,ij->i', delta, delta)
+                if skip is not None:
+                    distances[skip[indices]] = np.inf
+                closest = int(np.argmin(distances))
+                if distances[closest] < best_sq:
+                    best_index, best_sq = int(indices[closest]), float(distances[closest])
+                continue
+
+            # Nearer child last so it is searched first; the other is skipped once it is too far
+            left, right = 2 * node, 2 * node + 1
+            if _gap(self.lows[left], self.highs[left], point) <= _gap(self.lows[right], self.highs[right], point):
+                stack.extend((right, left))
+            else:
+                stack.extend((left, right))
+        return best_index
+
+
+class _Segment:
+    def __init__(self, points, normals, owners):
+        """One point tree over a batch of attachment points; each object's points are consecutive"""
+        self.points = points
+        self.normals = normals
+        self.owners = owners
+        self.dead = np.zeros(len(points), dtype=bool)
+        self.dead_count = 0
+        self.tree = PointTree(points)
+        # Object ids in sorted order with their first point, found by binary search on removal
+        firsts = np.arange(0, len(owners), len(NORMALS))
+        order = np.argsort(owners[firsts], kind='stable')
+        self.sorted_ids = owners[firsts][order]
+        self.sorted_firsts = firsts[order]
+
+    def first_point(self, object_id):
+        """Index of an object's first point"""
+        return int(self.sorted_firsts[np.searchsorted(self.sorted_ids, object_id)])
+
+    def live(self):
+        """(points, normals, owners) of the points still in use"""
+        keep = ~self.dead
+        return self.points[keep], self.normals[keep], self.owners[keep]
+
+
+class MagneticSnap:
+    def __init__(self, rebuild_threshold=256):
+        """
+        Attachment points in a few point trees (segments) plus a small unindexed buffer of recent
+        additions; a batch becomes a segment of its own, so adding never rebuilds the whole index
+        """
+        self.rebuild_threshold = rebuild_threshold
+        self.clear()
+
+    def clear(self):
+        """Forget every object"""
+        self.segments = []  # Largest first; each at least twice the size of the next
+        self.indexed = {}   # Object id -> segment
+        self.pending = {}   # Object id -> (points, normals) not yet in a tree
+        self.pending_arrays = None
+
+    def add(self, object_id, position, half_extents):
+        """Register an object's attachment points"""
+        self.pending[object_id] = attachment_points(position, half_extents)
+        self.pending_arrays = None
+        # Index once the linear buffer costs more than a tree descent would
+        if len(self.pending) * len(NORMALS) > self.rebuild_threshold:
+            pending, self.pending = self.pending, {}
+            self.pending_arrays = None
+            self._add_segment(np.concatenate([points for points, _ in pending.values()]),
+                              np.concatenate([normals for _, normals in pending.values()]),
+                              np.repeat(np.fromiter(pending, dtype=np.int64, count=len(pending)), len(NORMALS)))
+
+    def add_many(self, object_ids, positions, half_extents):
+        """Register many objects; a large batch is indexed on its own rather than merged into the rest"""
+        object_ids = np.asarray(object_ids, dtype=np.int64)
+        if len(object_ids) * len(NORMALS) <= self.rebuild_threshold:
+            for object_id, position, half in zip(object_ids.tolist(), np.asarray(positions).tolist(),
+                                                 np.asarray(half_extents).tolist()):
+                self.add(object_id, position, half)
+            return
+        self._add_segment(*self._points(object_ids, positions, half_extents))
+
+    def _points(self, object_ids, positions, half_extents):
+        """(points, normals, owners) of many boxes, each object's points consecutive"""
+        positions = np.asarray(positions, dtype=np.float32)
+        points = positions[:, None, :] + NORMALS * np.asarray(half_extents, dtype=np.float32)[:, None, :]
+        return (points.reshape(-1, 3), np.tile(NORMALS, (len(positions), 1)),
+                np.repeat(np.asarray(object_ids, dtype=np.int64), len(NORMALS)))
+
+    def remove(self, object_id):
+        """Drop an object's attachment points"""
+        if self.pending.pop(object_id, None) is not None:
+            self.pending_arrays = None
+            return
+        segment = self.indexed.pop(object_id, None)
+        if segment is None:
+            return
+        first = segment.first_point(object_id)
+        segment.dead[first:first + len(NORMALS)] = True
+        segment.dead_count += len(NORMALS)
+        if segment.dead_count > len(segment.points) // 2:
+            # Only this segment is rebuilt, from its live points
+            self.segments.remove(segment)
+            if segment.dead_count < len(segment.points):
+                self._add_segment(*segment.live())
+
+    def build(self, object_ids, positions, half_extents):
+        """Replace the contents with many objects at once"""
+        self.clear()
+        if len(object_ids):
+            self._add_segment(*self._points(object_ids, positions, half_extents))
+
+    def _add_segment(self, points, normals, owners):
+        """Index points as a new segment, merging segments of similar size (cost stays proportional to the batch)"""
+        while self.segments and len(self.segments[-1].points) - self.segments[-1].dead_count < 2 * len(points):
+            live = self.segments.pop().live()
+            points, normals, owners = (np.concatenate(pair) for pair in zip(live, (points, normals, owners)))
+        segment = _Segment(points, normals, owners)
+        self.segments.append(segment)
+        self.segments.sort(key=lambda other: -len(other.points))
+        self.indexed.update(zip(segment.sorted_ids.tolist(), itertools.repeat(segment)))
+
+    def nearest(self, query, max_distance):
+        """Nearest attachment point within max_distance as (point, normal), or None"""
+        query = np.asarray(query, dtype=np.float32)
+        best = None
+        for segment in self.segments:
+            index = segment.tree.nearest(query, max_distance, skip=segment.dead if segment.dead_count else None)
+            if index is not None:
+                distance = float(np.sum((segment.points[index] - query) ** 2))
+                if best is None or distance < best[0]:
+                    best = (distance, segment.points[index], segment.normals[index])
+
+        if self.pending:
+            if self.pending_arrays is None:
+                self.pending_arrays = (np.concatenate([p for p, _ in self.pending.values()]),
+                                       np.concatenate([n for _, n in self.pending.values()]))
+            points, normals = self.pending_arrays
+            delta = points - query
+            distances = np.einsum('ij,ij->i', delta, delta)
+            closest = int(np.argmin(distances))
+            if distances[closest] <= max_distance * max_distance and (best is None or distances[closest] < best[0]):
+                best = (float(distances[closest]), points[closest], normals[closest])
+
+        if best is None:
+            return None
+        return best[1].tolist(), best[2].tolist()
@@ -0,0 +1,137 @@
+"""
+Text rendering caches for AI Hand Builder
+Label textures cached in the GPU resource manager plus a glyph atlas for frequently changing strings
+"""
+
+import pygame
+from OpenGL.GL import *
+
+
+def _upload_rgba(surface):
+    """Upload a pygame surface as a new RGBA texture (rows flipped for GL)"""
+    data = pygame.image.tostring(surface, "RGBA", True)
+    texture = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, surface.get_width(), surface.get_height(),
+                 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+    return texture
+
+
+class TextCache:
+    def __init__(self, resources):
+        """Cache of rendered strings keyed by (text, font, color); evicted LRU by the manager"""
+        self.resources = resources
+        self.sizes = {}   # key -> (width, height) of labels currently cached
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, font, color):
+        """Return (texture, width, height), rendering the string on a miss"""
+        key = ('text', text, font, tuple(color))
+        size = self.sizes.get(key)
+        if size is not None:
+            self.hits += 1
+            return (self.resources.get(key),) + size
+
+        self.misses += 1
+        surface = font.render(text, True, color)
+        width, height = surface.get_width(), surface.get_height()
+        texture = self.resources.cache(key, 'texture', lambda: _upload_rgba(surface), width * height * 4,
+                                       on_evict=lambda: self.sizes.pop(key, None))
+        self.sizes[key] = (width, height)
+        return texture, width, height
+
+    def draw(self, text, x, y, font, color):
+        """Draw a string with its top-left corner at (x, y)"""
+        texture, width, height = self.get(text, font, color)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glColor4f(1, 1, 1, 1)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 1); glVertex2f(x, y)
+        glTexCoord2f(1, 1); glVertex2f(x + width, y)
+        glTexCoord2f(1, 0); glVertex2f(x + width, y + height)
+        glTexCoord2f(0, 0); glVertex2f(x, y + height)
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
+
+    def release(self):
+        """Forget the cached labels (their textures are freed with the manager)"""
+        self.sizes.clear()
+
+
+class GlyphAtlas:
+    # Printable ASCII covers numbers, percentages and status words
+    CHARACTERS = ''.join(chr(c) for c in range(32, 127))
+    ATLAS_WIDTH = 512
+
+    def __init__(self, resources):
+        """Per-font atlases of white glyphs, tinted with glColor when drawn"""
+        self.resources = resources
+        self.atlases = {}
+
+    def _build(self, font):
+        """Render every glyph of a font into a single texture"""
+        line_height = font.get_height()
+        glyphs = {}
+        x, y = 0, 0
+        for char in self.CHARACTERS:
+            advance = font.size(char)[0]
+            if x + advance > self.ATLAS_WIDTH:
+                x, y = 0, y + line_height
+            glyphs[char] = (x, y, advance)
+            x += advance
+
+        atlas_height = y + line_height
+        # White transparent background keeps anti-aliased edges white
+        surface = pygame.Surface((self.ATLAS_WIDTH, atlas_height), pygame.SRCALPHA)
+        surface.fill((255, 255, 255, 0))
+        for char, (gx, gy, advance) in glyphs.items():
+            surface.blit(font.render(char, True, (255, 255, 255)), (gx, gy))
+
+        atlas = {
+            'texture': self.resources.acquire(('glyph_atlas', font), 'texture', lambda: _upload_rgba(surface),
+                                              self.ATLAS_WIDTH * atlas_height * 4, keep=True),
+            'glyphs': glyphs,
+            'line_height': line_height,
+            'height': atlas_height
+        }
+        self.atlases[font] = atlas
+        return atlas
+
+    def can_draw(self, text):
+        """True if every character of the string is in the atlas"""
+        return all(' ' <= char <= '~' for char in text)
+
+    def draw(self, text, x, y, font, color):
+        """Draw a string glyph by glyph from the font's atlas"""
+        atlas = self.atlases.get(font) or self._build(font)
+        glyphs = atlas['glyphs']
+        line_height = atlas['line_height']
+        atlas_height = atlas['height']
+
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, atlas['texture'])
+        glColor4f(color[0] / 255, color[1] / 255, color[2] / 255, 1)
+        glBegin(GL_QUADS)
+        for char in text:
+            gx, gy, advance = glyphs[char]
+            u0 = gx / self.ATLAS_WIDTH
+            u1 = (gx + advance) / self.ATLAS_WIDTH
+            v_top = 1 - gy / atlas_height
+            v_bottom = 1 - (gy + line_height) / atlas_height
+            glTexCoord2f(u0, v_top); glVertex2f(x, y)
+            glTexCoord2f(u1, v_top); glVertex2f(x + advance, y)
+            glTexCoord2f(u1, v_bottom); glVertex2f(x + advance, y + line_height)
+            glTexCoord2f(u0, v_bottom); glVertex2f(x, y + line_height)
+            x += advance
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
+
+    def release(self):
+        """Drop the atlas textures"""
+        for font in self.atlases:
+            self.resources.release(('glyph_atlas', font))
+        self.atlases.clear()
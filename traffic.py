@@ -0,0 +1,301 @@
+"""
+Traffic simulation for AI Hand Builder
+Cars drive along placed road tiles and people walk the sidewalks beside them. Every agent is
+updated together in NumPy on a fixed timestep, and each frame reads an interpolated
+instance buffer (x, y, z, yaw per agent)
+"""
+
+import numpy as np
+
+import config
+from occupancy import OccupancyGrid
+from scene_store import ZONES
+
+
+AGENTS = ('car', 'person')
+KIND_CAR, KIND_PERSON = range(len(AGENTS))
+
+# Headings as (dx, dz) cell steps; heading + 2 is the reverse
+DIRECTIONS = np.array([(1, 0), (0, 1), (-1, 0), (0, -1)], dtype=np.int64)
+
+# Instance buffer fields
+X, Y, Z, YAW = range(4)
+
+# Agent mesh vertex fields: position, normal, RGBA; alpha 1 takes the agent's own color instead
+MESH_NORMAL, MESH_COLOR, MESH_FLOATS = 3, 6, 10
+
+# Fixed (untinted) car wheel color
+WHEEL_COLOR = (0.1, 0.1, 0.1, 0.0)
+TINTED = (1.0, 1.0, 1.0, 1.0)
+
+
+def _grid_triangles(points, normals, color):
+    """Two triangles per cell of (rows, cols, 3) grids of points and normals, as mesh vertices"""
+    def corners(grid):
+        cells = [grid[:-1, :-1], grid[1:, :-1], grid[1:, 1:], grid[:-1, :-1], grid[1:, 1:], grid[:-1, 1:]]
+        return np.stack(cells, axis=2).reshape(-1, 3)
+    points, normals = corners(points), corners(normals)
+    return np.hstack([points, normals, np.broadcast_to(color, (len(points), 4))])
+
+
+def _quad(corners, normal, color):
+    """Mesh vertices of one quad given as 4 corners in drawing order"""
+    corners = np.array(corners, dtype=np.float64)
+    grid = np.stack([corners[[0, 3]], corners[[1, 2]]])
+    return _grid_triangles(grid, np.broadcast_to(normal, grid.shape), color)
+
+
+def _sphere(center, radius, slices, stacks, color):
+    """Mesh vertices of a sphere (same tessellation as gluSphere)"""
+    theta = np.linspace(0, np.pi, stacks + 1)[:, None]
+    phi = np.linspace(0, 2 * np.pi, slices + 1)[None, :]
+    normals = np.stack(np.broadcast_arrays(np.sin(theta) * np.cos(phi), np.cos(theta),
+                                           np.sin(theta) * np.sin(phi)), axis=-1)
+    return _grid_triangles(np.asarray(center) + normals * radius, normals, color)
+
+
+def _tube(radius, height, slices, color):
+    """Mesh vertices of an open cylinder standing on y = 0 (gluCylinder turned upright)"""
+    phi = np.linspace(0, 2 * np.pi, slices + 1)[None, :]
+    y = np.array([0.0, height])[:, None]
+    normals = np.stack(np.broadcast_arrays(np.cos(phi), y * 0, np.sin(phi)), axis=-1)
+    points = normals * radius
+    points[..., 1] = np.broadcast_to(y, points.shape[:2])
+    return _grid_triangles(points, normals, color)
+
+
+def agent_mesh(name):
+    """Triangle mesh (n, MESH_FLOATS) of a car or person at its configured size, facing +z"""
+    w, h, d = config.CITY_ASSETS[name]['size']
+    if name == 'car':
+        parts = [
+            _quad([(-w/2, 0, -d/2), (w/2, 0, -d/2), (w/2, 0, d/2), (-w/2, 0, d/2)], (0, -1, 0), TINTED),
+            _quad([(-w/2, h, -d/2), (-w/2, h, d/2), (w/2, h, d/2), (w/2, h, -d/2)], (0, 1, 0), TINTED),
+            _quad([(-w/2, 0, d/2), (w/2, 0, d/2), (w/2, h, d/2), (-w/2, h, d/2)], (0, 0, 1), TINTED),
+            _quad([(-w/2, 0, -d/2), (-w/2, h, -d/2), (w/2, h, -d/2), (w/2, 0, -d/2)], (0, 0, -1), TINTED)
+        ]
+        for wheel in [(-w/3, 0.2, d/2+0.1), (w/3, 0.2, d/2+0.1), (-w/3, 0.2, -d/2-0.1), (w/3, 0.2, -d/2-0.1)]:
+            parts.append(_sphere(wheel, 0.2, 8, 8, WHEEL_COLOR))
+    else:
+        parts = [_tube(w/2, h*0.6, 8, TINTED), _sphere((0, h*0.85, 0), w/2, 10, 10, TINTED)]
+    return np.concatenate(parts).astype(np.float32)
+
+
+def place_mesh(mesh, instances, colors):
+    """
+    Copies of a mesh at each instance (x, y, z, yaw) tinted by each agent's color, as one (n * len(mesh),
+    MESH_FLOATS) vertex array (the same transform as glTranslatef + glRotatef(yaw, 0, 1, 0))
+    """
+    yaw = np.radians(instances[:, YAW])[:, None]
+    cos, sin = np.cos(yaw), np.sin(yaw)
+    placed = np.empty((len(instances), len(mesh), MESH_FLOATS), dtype=np.float32)
+    for offset in (0, MESH_NORMAL):
+        x, z = mesh[:, offset], mesh[:, offset + 2]
+        placed[..., offset] = cos * x + sin * z
+        placed[..., offset + 1] = mesh[:, offset + 1]
+        placed[..., offset + 2] = cos * z - sin * x
+    placed[..., :3] += instances[:, None, :YAW]
+    tint = mesh[:, MESH_COLOR + 3, None]
+    placed[..., MESH_COLOR:MESH_COLOR + 3] = mesh[:, MESH_COLOR:MESH_COLOR + 3] * (1 - tint) + colors[:, None, :] * tint
+    placed[..., MESH_COLOR + 3] = 1
+    return placed.reshape(-1, MESH_FLOATS)
+
+
+class _Raster:
+    """Boolean x/z cell raster over a bounding box of cells"""
+
+    def __init__(self, cells):
+        """Raster with the given (n, 2) cells set"""
+        if len(cells) == 0:
+            self.origin = np.zeros(2, dtype=np.int64)
+            self.cells = np.zeros((0, 0), dtype=bool)
+            return
+        self.origin = cells.min(axis=0) - 1
+        shape = cells.max(axis=0) - self.origin + 2
+        self.cells = np.zeros(tuple(shape), dtype=bool)
+        self.cells[cells[:, 0] - self.origin[0], cells[:, 1] - self.origin[1]] = True
+
+    def lookup(self, cells):
+        """Values at cells of any leading shape (..., 2); False outside the raster"""
+        local = cells - self.origin
+        inside = ((local >= 0) & (local < self.cells.shape)).all(axis=-1)
+        values = np.zeros(inside.shape, dtype=bool)
+        values[inside] = self.cells[local[inside][:, 0], local[inside][:, 1]]
+        return values
+
+    def around(self):
+        """Cells next to a set cell (8 neighbours) that are not set themselves"""
+        padded = np.pad(self.cells, 1)
+        grown = np.zeros_like(padded)
+        for dx in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                grown[1 + dx:grown.shape[0] - 1 + dx, 1 + dz:grown.shape[1] - 1 + dz] |= self.cells
+        grown[1:-1, 1:-1] &= ~self.cells
+        return np.argwhere(grown) + self.origin - 1
+
+
+class TrafficSim:
+    def __init__(self, grid_size, seed=0):
+        """Empty simulation on a grid of `grid_size` cells; call rebuild() with a scene"""
+        self.grid_size = grid_size
+        self.grid = OccupancyGrid(grid_size)
+        self.rng = np.random.default_rng(seed)
+        self.enabled = False
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.roads = _Raster(np.zeros((0, 2), dtype=np.int64))
+        self.sidewalks = self.roads
+        self.agent_mask = np.zeros(0, dtype=bool)
+        # Snapped placements sit on each zone's own lattice (zone position + whole cells), which is
+        # offset from the cell indices by up to half a cell; per zone x/z shift of cell centers
+        zones = np.array([config.ZONES[zone]['position'] for zone in ZONES], dtype=np.float64)[:, [0, 2]]
+        self.zone_shifts = zones - grid_size * np.floor(zones / grid_size + 0.5)
+        self._set_agents(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros((0, 3)),
+                         np.zeros((0, 2)))
+
+    def _set_agents(self, ids, kinds, positions, shifts):
+        """Reset per-agent state arrays"""
+        count = len(ids)
+        self.ids = ids
+        self.kinds = kinds
+        self.heights = positions[:, 1].astype(np.float64)
+        self.positions = positions[:, [0, 2]].astype(np.float64)
+        self.previous = self.positions.copy()
+        self.targets = self.positions.copy()
+        self.shifts = shifts
+        self.headings = self.rng.integers(0, len(DIRECTIONS), count)
+        speeds = np.array([config.CAR_SPEED, config.PERSON_SPEED])[kinds]
+        # A little spread so agents do not move in lockstep
+        self.speeds = speeds * self.rng.uniform(0.8, 1.2, count)
+        self.instances = np.zeros((count, 4), dtype=np.float32)
+
+    def _cells(self, positions):
+        """Cells (n, 2) under x/z world positions"""
+        return np.floor(positions / self.grid_size + 0.5).astype(np.int64)
+
+    def _footprints(self, scene, ids):
+        """Every x/z cell covered by the given objects"""
+        if len(ids) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        sizes, group = np.unique(scene.sizes[ids], axis=0, return_inverse=True)
+        group = group.ravel()
+        cells = []
+        for index, size in enumerate(sizes.tolist()):
+            rows = ids[group == index]
+            cells.append(self.grid.cells_for_many(scene.positions[rows], size)[:, :, [0, 2]].reshape(-1, 2))
+        return np.unique(np.concatenate(cells), axis=0)
+
+    def rebuild(self, scene):
+        """Re-read roads and agents after the scene changed; agents already moving keep their state"""
+        self.roads = _Raster(self._footprints(scene, scene.ids_of('city', 'road')))
+        self.sidewalks = _Raster(self.roads.around())
+
+        cars = scene.ids_of('city', 'car')
+        people = scene.ids_of('city', 'person')
+        ids = np.concatenate([cars, people])
+        kinds = np.concatenate([np.full(len(cars), KIND_CAR), np.full(len(people), KIND_PERSON)])
+        positions = scene.positions[ids].astype(np.float64)
+        shifts = self.zone_shifts[scene.zones[ids]]
+        # Only agents standing on a road (cars) or sidewalk (people) take part; others stay parked
+        cells = self._cells(positions[:, [0, 2]])
+        active = np.where(kinds == KIND_CAR, self.roads.lookup(cells), self.sidewalks.lookup(cells))
+        order = np.argsort(ids[active])
+        ids, kinds = ids[active][order], kinds[active][order]
+        positions, shifts = positions[active][order], shifts[active][order]
+        # Cars drive along road-cell centers; _write_instances() puts them in their lane
+        car = kinds == KIND_CAR
+        positions[np.ix_(car, [0, 2])] = self._cells(positions[car][:, [0, 2]]) * self.grid_size + shifts[car]
+
+        old = self.ids, self.positions, self.previous, self.targets, self.headings, self.speeds
+        self._set_agents(ids, kinds, positions, shifts)
+        if len(old[0]) and len(ids):
+            found = np.searchsorted(old[0], ids).clip(0, len(old[0]) - 1)
+            kept = old[0][found] == ids
+            for current, previous in zip((self.positions, self.previous, self.targets, self.headings, self.speeds),
+                                         old[1:]):
+                current[kept] = previous[found[kept]]
+            # Moved objects start over from their stored position
+            stay = self._rasters_at(self._cells(self.targets), self.kinds)
+            reset = ~stay
+            self.positions[reset] = self.previous[reset] = self.targets[reset] = positions[reset][:, [0, 2]]
+
+        self.agent_mask = np.zeros(scene.capacity, dtype=bool)
+        self.agent_mask[ids] = True
+        self._write_instances(1.0)
+
+    def _rasters_at(self, cells, kinds):
+        """Whether each agent's kind may stand at its cell (cells shaped (n, ..., 2))"""
+        expand = kinds.reshape((-1,) + (1,) * (cells.ndim - 2))
+        return np.where(expand == KIND_CAR, self.roads.lookup(cells), self.sidewalks.lookup(cells))
+
+    def advance(self, elapsed):
+        """Run the fixed-timestep steps that fit in `elapsed` seconds and refresh the instances"""
+        if not self.enabled or len(self.ids) == 0:
+            return 0
+        self.accumulator = min(self.accumulator + elapsed, config.TRAFFIC_TICK * config.TRAFFIC_MAX_STEPS)
+        steps = 0
+        while self.accumulator >= config.TRAFFIC_TICK:
+            self.step(config.TRAFFIC_TICK)
+            self.accumulator -= config.TRAFFIC_TICK
+            steps += 1
+        self._write_instances(self.accumulator / config.TRAFFIC_TICK)
+        return steps
+
+    def step(self, dt):
+        """Move every agent towards its target cell; those that arrive choose the next one"""
+        self.previous[:] = self.positions
+        self.ticks += 1
+        offset = self.targets - self.positions
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        reach = self.speeds * dt
+        arrived = distance <= reach
+        moving = ~arrived
+        self.positions[moving] += offset[moving] * (reach[moving] / distance[moving])[:, None]
+        self.positions[arrived] = self.targets[arrived]
+        rows = np.flatnonzero(arrived)
+        if len(rows):
+            self._choose(rows)
+
+    def _choose(self, rows):
+        """Pick the next cell for agents at a cell center: mostly straight on, never back unless stuck"""
+        cells = self._cells(self.targets[rows])
+        candidates = cells[:, None, :] + DIRECTIONS[None, :, :]
+        valid = self._rasters_at(candidates, self.kinds[rows])
+        headings = self.headings[rows]
+        directions = np.arange(len(DIRECTIONS))[None, :]
+        score = self.rng.random(valid.shape)
+        score += (directions == headings[:, None]) * (self.rng.random(len(rows)) >= config.TRAFFIC_TURN_CHANCE)[:, None] * 2
+        score[directions == (headings[:, None] + 2) % len(DIRECTIONS)] = -1
+        score[~valid] = -np.inf
+        choice = score.argmax(axis=1)
+        free = valid.any(axis=1)
+        rows, choice = rows[free], choice[free]
+        self.headings[rows] = choice
+        self.targets[rows] = (cells[free] + DIRECTIONS[choice]) * self.grid_size + self.shifts[rows]
+
+    def _write_instances(self, alpha):
+        """Fill the instance buffer with positions interpolated `alpha` of the way into the next tick"""
+        if len(self.ids) == 0:
+            return
+        positions = self.previous + (self.positions - self.previous) * alpha
+        forward = DIRECTIONS[self.headings].astype(np.float64)
+        # Cars keep to the right-hand lane of their road
+        lane = np.where(self.kinds == KIND_CAR, self.grid_size / 4, 0.0)[:, None]
+        positions = positions + np.stack([-forward[:, 1], forward[:, 0]], axis=1) * lane
+        self.instances[:, X] = positions[:, 0]
+        self.instances[:, Y] = self.heights
+        self.instances[:, Z] = positions[:, 1]
+        self.instances[:, YAW] = np.degrees(np.arctan2(forward[:, 0], forward[:, 1]))
+
+    def is_agent(self, ids):
+        """Mask of the given object ids that the simulation draws (instead of the static path)"""
+        if not self.enabled:
+            return np.zeros(len(ids), dtype=bool)
+        mask = np.zeros(len(ids), dtype=bool)
+        inside = ids < len(self.agent_mask)
+        mask[inside] = self.agent_mask[ids[inside]]
+        return mask
+
+    def counts(self):
+        """Active cars and people"""
+        return int((self.kinds == KIND_CAR).sum()), int((self.kinds == KIND_PERSON).sum())
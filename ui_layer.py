@@ -0,0 +1,87 @@
+"""
+Retained UI layers for AI Hand Builder
+2D overlay content rendered into an offscreen framebuffer and re-used until its state changes
+"""
+
+from OpenGL.GL import *
+
+
+class UILayer:
+    def __init__(self, resources, width, height):
+        """Create a screen-sized layer; GL objects are allocated on first draw"""
+        self.resources = resources
+        self.width = width
+        self.height = height
+        self.fbo = None
+        self.texture = None
+        self.key = None
+        self.supported = True
+        self.renders = 0
+
+    def _allocate(self):
+        """Create the color texture and framebuffer object"""
+        self.texture = self.resources.acquire((self, 'texture'), 'texture', lambda: glGenTextures(1),
+                                              self.width * self.height * 4)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, self.width, self.height, 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, None)
+
+        self.fbo = self.resources.acquire((self, 'framebuffer'), 'framebuffer', lambda: glGenFramebuffers(1))
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.texture, 0)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"framebuffer incomplete (0x{status:x})")
+
+    def draw(self, key, build):
+        """Composite the layer, re-rendering it with build() when the key changed"""
+        if self.supported and self.fbo is None:
+            try:
+                self._allocate()
+            except Exception as e:
+                print(f"⚠️ Offscreen UI layer unavailable, drawing directly: {e}")
+                self.release()
+                self.supported = False
+        if not self.supported:
+            build()
+            return
+
+        if key != self.key:
+            glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+            glClearColor(0, 0, 0, 0)
+            glClear(GL_COLOR_BUFFER_BIT)
+            build()
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+            self.key = key
+            self.renders += 1
+
+        # Layer colors are premultiplied by the separate alpha blend used while building
+        glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glColor4f(1, 1, 1, 1)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 1); glVertex2f(0, 0)
+        glTexCoord2f(1, 1); glVertex2f(self.width, 0)
+        glTexCoord2f(1, 0); glVertex2f(self.width, self.height)
+        glTexCoord2f(0, 0); glVertex2f(0, self.height)
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
+        glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+
+    def invalidate(self):
+        """Force a re-render on the next draw"""
+        self.key = None
+
+    def release(self):
+        """Delete the framebuffer and its texture"""
+        if self.fbo is not None:
+            self.resources.release((self, 'framebuffer'))
+            self.fbo = None
+        if self.texture is not None:
+            self.resources.release((self, 'texture'))
+            self.texture = None
+        self.key = None
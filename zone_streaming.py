@@ -0,0 +1,197 @@
+"""
+Zone streaming for AI Hand Builder
+Each zone can live in its own scene file on disk; zones near the camera are loaded on a
+background thread and distant ones are written out and evicted to keep memory bounded
+"""
+
+import math
+import os
+import queue
+import threading
+import time
+
+import config
+import scene_io
+from scene_store import SceneStore, ZONES
+
+
+def zone_path(directory, zone):
+    """Path of a zone's scene file in `directory`"""
+    return os.path.join(directory, f"{zone}.ahbs")
+
+
+class ZoneStreamer:
+    def __init__(self, directory, journal):
+        """Streamer for zone files in `directory`; disk writes go through the journal's writer"""
+        self.directory = directory
+        self.journal = journal
+        os.makedirs(directory, exist_ok=True)
+        # Zone -> object count for zones whose objects are only on disk
+        self.on_disk = {}
+        for zone in ZONES:
+            path = self.zone_path(zone)
+            if os.path.exists(path):
+                try:
+                    self.on_disk[zone] = scene_io.object_count(path)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Ignoring damaged zone file {path}: {e}")
+        self.loading = set()
+        # Bumped when zone files are discarded so loads already in flight are dropped
+        self.epoch = 0
+        # Zone -> journal generation it was merged in; its file backs that journal's merge record
+        self.merged_in = {}
+        self.compact_at = None
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._load_loop, daemon=True)
+        self.thread.start()
+
+    def zone_path(self, zone):
+        """Path of a zone's scene file"""
+        return zone_path(self.directory, zone)
+
+    def reconcile(self, scene):
+        """Drop zone files left behind for zones that are already in the scene"""
+        for zone in list(self.on_disk):
+            if scene.count_in_zone(zone):
+                # Recovery read the zone back in (or a snapshot already holds it); the file goes
+                # once the next snapshot does
+                del self.on_disk[zone]
+                self.journal.after_snapshot(lambda path=self.zone_path(zone): os.remove(path))
+
+    def is_resident(self, zone):
+        """True if a zone's objects are all in memory"""
+        return zone not in self.on_disk
+
+    def object_count(self, scene, zone):
+        """Objects in a zone, counting those that are only on disk"""
+        return scene.count_in_zone(zone) + self.on_disk.get(zone, 0)
+
+    def request(self, zone):
+        """Start loading a zone in the background (no-op if resident or already loading)"""
+        if zone in self.on_disk and zone not in self.loading:
+            self.loading.add(zone)
+            # Queued behind pending disk writes so a just-evicted zone's file is complete
+            self.journal.run_in_order(lambda item=(self.epoch, zone): self.requests.put(item))
+
+    def _load_loop(self):
+        """Loader thread: read requested zone files into standalone stores"""
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            epoch, zone = item
+            store = SceneStore()
+            try:
+                scene_io.load_scene(self.zone_path(zone), store)
+                self.results.put((epoch, zone, store, None))
+            except (OSError, ValueError) as e:
+                self.results.put((epoch, zone, None, e))
+
+    def poll(self, scene):
+        """Merge finished loads into the scene; returns (zone, new ids) of the zones that came in"""
+        merged = []
+        while True:
+            try:
+                epoch, zone, store, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if epoch != self.epoch or zone not in self.loading:
+                continue
+            self.loading.discard(zone)
+            if error is not None:
+                print(f"❌ Could not stream in {config.ZONES[zone]['name']}: {error}")
+                continue
+            ids = scene.absorb(store)
+            del self.on_disk[zone]
+            # The merge record replays from the zone file, so it stays until a snapshot holds the objects
+            self.journal.after_snapshot(lambda path=self.zone_path(zone): os.remove(path))
+            self.merged_in[zone] = self.journal.generation
+            self.journal.merged(scene, zone, ids)
+            merged.append((zone, ids))
+            print(f"📥 Streamed in {config.ZONES[zone]['name']} ({len(store)} objects)")
+
+        # Snapshot (a full scene copy) once streaming has been quiet for a while, not on every merge
+        if merged:
+            self.compact_at = time.time() + config.STREAM_COMPACT_DELAY
+        elif self.compact_at is not None and time.time() >= self.compact_at:
+            self.compact_at = None
+            if self.journal.snapshot_tasks:
+                self.journal.compact(scene)
+        return merged
+
+    def evict(self, scene, zone):
+        """
+        Write a resident zone to its file and drop it from the scene
+        Returns the evicted ids, in the order the file stores them (and poll() returns them back in)
+        """
+        ids = scene.zone_object_ids(zone)
+        if len(ids) == 0 or not self.is_resident(zone):
+            return ids[:0]
+        if self.merged_in.get(zone) == self.journal.generation:
+            # Its file still backs this journal's merge record; a snapshot has to take over first
+            self.journal.compact(scene)
+        subset = scene.subset(ids)
+        # The file is written before the eviction record, so recovery never loses the zone
+        self.journal.run_in_order(lambda path=self.zone_path(zone): scene_io.save_scene(path, subset))
+        scene.remove_many(ids)
+        self.journal.evicted(scene, zone)
+        self.on_disk[zone] = len(ids)
+        print(f"📤 Streamed out {config.ZONES[zone]['name']} ({len(ids)} objects)")
+        return ids
+
+    def update(self, scene, focus, current_zone):
+        """Load zones near `focus` (x, z) and evict distant ones; returns (zone, ids) of the zones evicted"""
+        distances = {}
+        for zone in ZONES:
+            x, _, z = config.ZONES[zone]['position']
+            distances[zone] = math.hypot(x - focus[0], z - focus[1])
+
+        self.request(current_zone)
+        for zone, distance in distances.items():
+            if distance <= config.STREAM_LOAD_DISTANCE:
+                self.request(zone)
+
+        # Farthest first: out-of-range zones always go, nearer ones only while over budget;
+        # zones in load range never do (they would be requested straight back)
+        evicted = []
+        for zone in sorted(ZONES, key=distances.get, reverse=True):
+            if zone == current_zone or distances[zone] <= config.STREAM_LOAD_DISTANCE:
+                continue
+            if not scene.count_in_zone(zone):
+                continue
+            if distances[zone] > config.STREAM_EVICT_DISTANCE or len(scene) > config.STREAM_BUDGET_OBJECTS:
+                ids = self.evict(scene, zone)
+                if len(ids):
+                    evicted.append((zone, ids))
+        return evicted
+
+    def discard(self, zone):
+        """Forget a zone's file and delete it after everything already queued"""
+        if zone not in self.on_disk:
+            return
+        self.epoch += 1
+        self.loading.discard(zone)
+        del self.on_disk[zone]
+        self.journal.run_in_order(lambda path=self.zone_path(zone): os.remove(path))
+
+    def discard_all(self):
+        """Forget every zone file (the scene was cleared or replaced)"""
+        for zone in list(self.on_disk):
+            self.discard(zone)
+
+    def save_all(self, scene, path):
+        """Queue a save of the scene plus every zone that is only on disk into one scene file"""
+        full = scene.copy()
+        paths = [self.zone_path(zone) for zone in self.on_disk]
+
+        def save():
+            for zone_path in paths:
+                scene_io.load_scene(zone_path, full)
+            print(f"💾 Saved {len(scene_io.save_scene(path, full))} objects to {path}")
+        self.journal.run_in_order(save)
+
+    def close(self):
+        """Stop the loader thread"""
+        self.requests.put(None)
+        self.thread.join()